@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import time
 import sys
 import os
 
@@ -44,42 +43,49 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- 🔄 AUTO REFRESH (Every 2s for "Real-time" feel) ---
-if 'last_refresh' not in st.session_state:
-    st.session_state.last_refresh = time.time()
+# --- 💻 THE LOGIC ---
+# One LogTail per browser session: each rerun transfers only the rows logged
+# since the previous one (keyset cursor on created_at, id) instead of
+# re-fetching the last 200. It holds BOTH Grid Alerts and Regular Logs,
+# since 'bot_operations' includes EVERYTHING.
+if 'log_tail' not in st.session_state:
+    st.session_state.log_tail = db_utils.LogTail(limit=200)
+tail = st.session_state.log_tail
+tail.poll()
 
-if time.time() - st.session_state.last_refresh > 2:
-    st.session_state.last_refresh = time.time()
-    st.rerun()
 
-# --- 💻 THE LOGIC ---
-# We fetch BOTH Grid Alerts and Regular Logs in one go
-# We need a custom query or just fetch raw logs if get_recent_logs handles it.
-# db_utils.get_recent_logs fetches from 'bot_operations' which includes EVERYTHING.
-raw_logs = db_utils.get_recent_logs(limit=200)
+def format_line(log):
+    # 1. Parse Timestamp
+    # Handle cases where created_at might be string or datetime
+    ts_val = log.get('created_at')
+    if isinstance(ts_val, pd.Timestamp) or hasattr(ts_val, 'strftime'):
+        ts = ts_val.strftime('%H:%M:%S')
+    else:
+        ts = str(ts_val).split('T')[-1].split('.')[0] # Fallback
+
+    # 2. Extract Fields
+    op = log.get('operation', 'UNKNOWN')
+    sym = log.get('symbol') or "---"
+    direction = log.get('direction') or "-"
+    reason = log.get('reason') or "No details"
+
+    # 3. Format the Line (Terminal Style)
+    # Example: [22:05:10] GRID_ALERT   | BTC    | PUMPED +15% ...
+    return f"[{ts}] {op:<12} | {sym:<6} | {direction:<4} | {reason}"
 
-if raw_logs:
+
+if tail.rows:
+    # Lines are formatted once and cached by id; newest first
+    lines = st.session_state.setdefault('log_lines', {})
     terminal_output = []
-    
-    for log in raw_logs:
-        # 1. Parse Timestamp
-        # Handle cases where created_at might be string or datetime
-        ts_val = log.get('created_at')
-        if isinstance(ts_val, pd.Timestamp) or hasattr(ts_val, 'strftime'):
-            ts = ts_val.strftime('%H:%M:%S')
-        else:
-            ts = str(ts_val).split('T')[-1].split('.')[0] # Fallback
-            
-        # 2. Extract Fields
-        op = log.get('operation', 'UNKNOWN')
-        sym = log.get('symbol') or "---"
-        direction = log.get('direction') or "-"
-        reason = log.get('reason') or "No details"
-        
-        # 3. Format the Line (Terminal Style)
-        # Example: [22:05:10] GRID_ALERT   | BTC    | PUMPED +15% ...
-        line = f"[{ts}] {op:<12} | {sym:<6} | {direction:<4} | {reason}"
-        terminal_output.append(line)
+    for log in reversed(tail.rows):
+        if log['id'] not in lines:
+            lines[log['id']] = format_line(log)
+        terminal_output.append(lines[log['id']])
+    # Drop cached lines that scrolled out of the tail
+    visible = {log['id'] for log in tail.rows}
+    for op_id in [op_id for op_id in lines if op_id not in visible]:
+        del lines[op_id]
 
     # Join with newlines
     full_log_text = "\n".join(terminal_output)
@@ -89,3 +95,10 @@ if raw_logs:
 
 else:
     st.text("root@happy-harbor:~# Waiting for logs...")
+
+# --- 🔄 AUTO REFRESH ---
+# Wakes up on a Postgres NOTIFY for new operations (DB_NOTIFY_CHANNEL),
+# otherwise every 2s for "Real-time" feel. All sessions share the one
+# LISTEN connection of the process (db_utils.get_operation_notifier).
+tail.wait(2)
+st.rerun()
@@ -2,7 +2,6 @@ import streamlit as st
 import pandas as pd
 import psycopg2
 import os
-import json
 import plotly.express as px
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -17,6 +16,13 @@ ALLOCATION_BRUCE = 25.00
 ALLOCATION_BARRY = 25.00
 ALLOCATION_WALLY = 20.00
 ALLOCATION_HARRISON = 25.00 # Nuova allocazione
+AGENT_ALLOCATIONS = {"Bruce": ALLOCATION_BRUCE, "Barry": ALLOCATION_BARRY, "Wally": ALLOCATION_WALLY, "Harrison": ALLOCATION_HARRISON}
+
+# --- ROLLUP ---
+MAX_CHART_POINTS = 500  # punti massimi per grafico, qualunque sia la lunghezza dello storico
+ROLLUP_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+PNL_WINDOWS = {"12H": 12, "24H": 24, "3GG": 72, "7GG": 168, "14GG": 336, "30GG": 720}
+HISTORY_LIMIT = 50
 
 # --- PALETTE COLORI HAPPY HARBOR ---
 BG_COLOR = "#4B8056"      
@@ -71,76 +77,94 @@ st.markdown(f"""
 load_dotenv()
 
 # --- 1. CARICAMENTO DATI ---
+def pick_bucket(first_bucket, now):
+    """Granularità più fine dei rollup che copre lo storico con al massimo MAX_CHART_POINTS punti."""
+    span = (now - first_bucket).total_seconds()
+    for bucket, seconds in ROLLUP_SECONDS.items():
+        if span / seconds <= MAX_CHART_POINTS: return bucket
+    return "day"
+
+def load_equity(conn, now):
+    """Curve di equity virtuale per agente dai rollup di pnl realizzato (solo chiusure)."""
+    summary = pd.read_sql("""
+        SELECT agent, MIN(bucket_start) AS first_bucket, SUM(realized_pnl) AS total_pnl
+        FROM pnl_rollups WHERE bucket = 'day' GROUP BY agent
+    """, conn)
+    equity = {}
+    for _, row in summary.iterrows():
+        if row['agent'] not in AGENT_ALLOCATIONS: continue
+        bucket = pick_bucket(row['first_bucket'], now)
+        pts = pd.read_sql("""
+            SELECT bucket_start, realized_pnl FROM pnl_rollups
+            WHERE bucket = %(bucket)s AND agent = %(agent)s
+            ORDER BY bucket_start DESC LIMIT %(limit)s
+        """, conn, params={"bucket": bucket, "agent": row['agent'], "limit": MAX_CHART_POINTS}).iloc[::-1]
+        if pts.empty: continue
+
+        # oltre MAX_CHART_POINTS bucket giornalieri il pnl precedente entra come base di partenza
+        pnl = pts['realized_pnl'].astype(float)
+        base = AGENT_ALLOCATIONS[row['agent']] + float(row['total_pnl']) - pnl.sum()
+        start = pd.DataFrame([{"time": pts.iloc[0]['bucket_start'] - timedelta(seconds=ROLLUP_SECONDS[bucket]), "equity": base}])
+        points = pd.DataFrame({"time": pts['bucket_start'], "equity": base + pnl.cumsum()})
+        equity[row['agent']] = pd.concat([start, points], ignore_index=True)
+    return equity
+
 @st.cache_data(ttl=10)
 def load_data():
     try:
         with psycopg2.connect(os.getenv("DATABASE_URL")) as conn:
-            df_bal = pd.read_sql("SELECT created_at, balance_usd FROM account_snapshots ORDER BY created_at ASC", conn)
-            df_ops = pd.read_sql("SELECT * FROM bot_operations ORDER BY created_at DESC", conn)
+            now = pd.Timestamp.now(tz="UTC")
+            # saldo attuale e saldo all'inizio di ogni finestra dai rollup (al più lo snapshot più vecchio)
+            current = pd.read_sql("SELECT balance_close FROM balance_rollups WHERE bucket = 'minute' ORDER BY bucket_start DESC LIMIT 1", conn)
+            past = pd.read_sql("""
+                SELECT w.hours, COALESCE(
+                    (SELECT balance_close FROM balance_rollups
+                     WHERE bucket = 'hour' AND bucket_start <= now() - make_interval(hours => w.hours)
+                     ORDER BY bucket_start DESC LIMIT 1),
+                    (SELECT balance_open FROM balance_rollups WHERE bucket = 'day' ORDER BY bucket_start LIMIT 1)
+                ) AS balance
+                FROM unnest(%(hours)s::int[]) AS w(hours)
+            """, conn, params={"hours": list(PNL_WINDOWS.values())})
+            balances = {
+                "current": float(current.iloc[0]['balance_close']) if not current.empty else None,
+                "past": {int(r['hours']): float(r['balance']) for _, r in past.iterrows() if pd.notna(r['balance'])},
+            }
+
+            equity = load_equity(conn, now)
+
+            # ultime operazioni per agente: index scan su (agent, created_at)
+            df_ops = pd.read_sql("""
+                SELECT o.* FROM unnest(%(agents)s::text[]) AS a(agent)
+                CROSS JOIN LATERAL (
+                    SELECT created_at, operation, symbol, direction, leverage, agent, pnl,
+                           raw_payload->>'reason' AS reason
+                    FROM bot_operations WHERE agent = a.agent
+                    ORDER BY created_at DESC LIMIT %(limit)s
+                ) o
+            """, conn, params={"agents": list(AGENT_ALLOCATIONS), "limit": HISTORY_LIMIT})
             last_snap = pd.read_sql("SELECT id FROM account_snapshots ORDER BY created_at DESC LIMIT 1", conn)
             df_pos = pd.DataFrame()
             if not last_snap.empty:
                 sid = last_snap.iloc[0]['id']
                 df_pos = pd.read_sql(f"SELECT * FROM open_positions WHERE snapshot_id = {sid}", conn)
-            
-            def detect_agent(row):
-                if 'agent_name' in row and row['agent_name']: return row['agent_name']
-                try:
-                    p = row['raw_payload']
-                    if isinstance(p, str): p = json.loads(p)
-                    if isinstance(p, dict) and 'agent' in p: return p['agent']
-                except: pass
-
-                sym = row.get('symbol', '')
-                if sym == 'SUI': return 'Barry'
-                if sym == 'AVAX': return 'Wally'
-                if sym == 'DOGE': return 'Harrison' # Harrison su DOGE
-                if sym in ['BTC', 'ETH', 'SOL']: return 'Bruce'
-                return 'Bruce'
-
-            if not df_ops.empty:
-                df_ops['agent_clean'] = df_ops.apply(detect_agent, axis=1)
-            else:
-                df_ops['agent_clean'] = []
-
-            return df_bal, df_ops, df_pos
+
+            df_ops['agent_clean'] = df_ops['agent']
+
+            return balances, equity, df_ops, df_pos
 
     except Exception as e:
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return {"current": None, "past": {}}, {}, pd.DataFrame(), pd.DataFrame()
 
 # --- FUNZIONI ---
-def calculate_pnl_change(df, hours_ago):
-    if df.empty: return 0.0, 0.0
-    now = df.iloc[-1]['created_at']
-    target = now - timedelta(hours=hours_ago)
-    row = df.iloc[(df['created_at'] - target).abs().argsort()[:1]]
-    if row.empty: return 0.0, 0.0
-    past = row.iloc[0]['balance_usd']; curr = df.iloc[-1]['balance_usd']
+def calculate_pnl_change(balances, hours_ago):
+    curr = balances["current"]; past = balances["past"].get(hours_ago)
+    if curr is None or past is None: return 0.0, 0.0
     delta = curr - past; pct = (delta / past * 100) if past > 0 else 0
     return delta, pct
 
-def get_virtual_equity(agent_name, initial, df_ops):
-    if df_ops.empty: return pd.DataFrame()
-    ops = df_ops[df_ops['agent_clean'] == agent_name].sort_values('created_at')
-    points = []; curr = initial
-    if not ops.empty:
-        start_date = ops.iloc[0]['created_at'] - timedelta(hours=1)
-        points.append({"time": start_date, "equity": initial})
-    else:
-        points.append({"time": datetime.now(), "equity": initial})
-        return pd.DataFrame(points)
-    
-    for _, row in ops.iterrows():
-        pnl = 0.0
-        if 'CLOSE' in row['operation'].upper():
-            try:
-                raw = row['raw_payload']
-                if isinstance(raw, str): raw = json.loads(raw)
-                pnl = float(raw.get('pnl', raw.get('realized_pnl', 0.0)))
-            except: pass
-        curr += pnl
-        points.append({"time": row['created_at'], "equity": curr})
-    return pd.DataFrame(points)
+def get_virtual_equity(agent_name, initial, equity):
+    if agent_name in equity: return equity[agent_name]
+    return pd.DataFrame([{"time": datetime.now(), "equity": initial}])
 
 def render_metric_pill(label, val, delta, delta_pct):
     color = ACCENT_GREEN if delta >= 0 else ACCENT_RED
@@ -156,17 +180,12 @@ def render_history_list(df_ops_agent):
         elif "CLOSE" in op: bg = "#FF9800"; txt = "CLOSE"
         else: bg = "#9E9E9E"; txt = op
         
-        reason = "N/A"
-        try:
-            raw = row['raw_payload']; 
-            if isinstance(raw, str): raw = json.loads(raw)
-            reason = raw.get('reason', 'Nessun dettaglio')
-        except: pass
+        reason = row.get('reason') or 'Nessun dettaglio'
 
         st.markdown(f"""<details style="background: white; border: 1px solid #eee; border-radius: 8px; padding: 10px; margin-bottom: 8px;"><summary style="cursor: pointer; font-weight: 500; color: #333;"><span style="color: #888; font-size: 12px; margin-right: 10px;">{date}</span><strong style="color: #333;">{sym}</strong><span class="op-badge" style="background-color: {bg}; margin-left: 10px;">{txt}</span></summary><div style="padding: 10px; font-size: 13px; color: #555; background: #fafafa; margin-top: 5px; border-radius: 5px;"><em>"{reason}"</em><br><span style="font-size: 11px; color: #999;">Lev: x{row.get('leverage', 'N/A')}</span></div></details>""", unsafe_allow_html=True)
 
 # --- MAIN ---
-df_bal, df_ops, df_pos = load_data()
+balances, equity, df_ops, df_pos = load_data()
 
 col_L1, col_L2, col_L3 = st.columns([1, 2, 1])
 with col_L2:
@@ -177,25 +196,24 @@ st.sidebar.title("Navigazione")
 page = st.sidebar.radio("Vai a:", ["Overview 🌐", "Bruce 🦇", "Barry ⚡", "Wally 🧪", "Harrison 🌪️"])
 
 if page == "Overview 🌐":
-    curr_bal = df_bal.iloc[-1]['balance_usd'] if not df_bal.empty else TOTAL_DEPOSIT
+    curr_bal = balances["current"] if balances["current"] is not None else TOTAL_DEPOSIT
     total_pnl = curr_bal - TOTAL_DEPOSIT
     total_pct = (total_pnl / TOTAL_DEPOSIT * 100)
     st.markdown(f"""<div class="main-card" style="border-top: 5px solid {THEME['Global']['primary']};"><div style="font-size: 14px; color: #666;">TOTALE CONTO (Cross Margin)</div><div style="font-size: 42px; font-weight: bold; color: {TEXT_DARK};">${curr_bal:,.2f}</div><div style="font-size: 18px; color: {ACCENT_GREEN if total_pnl>=0 else ACCENT_RED}; font-weight: bold;">{total_pnl:+.2f} ({total_pct:+.2f}%)</div></div>""", unsafe_allow_html=True)
     
     st.subheader("⏱️ Andamento nel Tempo")
     cols = st.columns(6)
-    times = {"12H": 12, "24H": 24, "3GG": 72, "7GG": 168, "14GG": 336, "30GG": 720}
-    for i, (lab, h) in enumerate(times.items()):
-        d_val, d_pct = calculate_pnl_change(df_bal, h)
+    for i, (lab, h) in enumerate(PNL_WINDOWS.items()):
+        d_val, d_pct = calculate_pnl_change(balances, h)
         with cols[i]: render_metric_pill(lab, d_val, d_val, d_pct)
             
     st.subheader("🆚 Performance Bot a Confronto (%)")
     # Calcolo Multi-Agente
-    agents_list = [("Bruce", ALLOCATION_BRUCE), ("Barry", ALLOCATION_BARRY), ("Wally", ALLOCATION_WALLY), ("Harrison", ALLOCATION_HARRISON)]
+    agents_list = list(AGENT_ALLOCATIONS.items())
     all_data = []
     
     for ag_name, ag_alloc in agents_list:
-        eq = get_virtual_equity(ag_name, ag_alloc, df_ops)
+        eq = get_virtual_equity(ag_name, ag_alloc, equity)
         if not eq.empty:
             eq['pct_change'] = (eq['equity'] - ag_alloc) / ag_alloc * 100
             eq['Agent'] = ag_name
@@ -219,7 +237,7 @@ else:
     t = THEME[agent]
     st.markdown(f"<h2 style='color: {t['primary']} !important;'>{t['icon']} Agente {agent}</h2>", unsafe_allow_html=True)
     
-    df_equity = get_virtual_equity(agent, alloc, df_ops)
+    df_equity = get_virtual_equity(agent, alloc, equity)
     curr_virt_base = df_equity.iloc[-1]['equity'] if not df_equity.empty else alloc
 
     relevant_syms = []
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from typing import Callable, Dict, Iterator, Optional
+
+# Regole di Hyperliquid per i perpetual: size con al massimo szDecimals
+# decimali, prezzi con al massimo (6 - szDecimals) decimali e 5 cifre
+# significative, valore minimo di un ordine 10 USD
+MAX_PERP_DECIMALS = 6
+MAX_PRICE_SIG_FIGS = 5
+MIN_ORDER_NOTIONAL = Decimal("10")
+DEFAULT_MIN_SIZE = Decimal("0.001")  # se meta() non espone minSz
+
+_ONE = Decimal(1)
+
+ASSET_SPEC_REFRESH = float(os.getenv("ASSET_SPEC_REFRESH", "300"))      # (s) refresh in background di meta(), 0 = disattivo
+ASSET_SPEC_MISS_REFRESH = float(os.getenv("ASSET_SPEC_MISS_REFRESH", "30"))  # (s) minimo tra due refresh per simbolo sconosciuto
+
+
+@dataclass(frozen=True)
+class AssetSpec:
+    """Parametri di trading di un perpetual, precalcolati da meta()["universe"]."""
+
+    name: str
+    asset: int                  # indice nell'universe = asset id degli ordini
+    sz_decimals: int
+    px_decimals: int
+    min_size: Decimal
+    min_notional: Decimal
+    max_leverage: int
+    only_isolated: bool
+    size_quantum: Decimal       # 10 ** -sz_decimals
+    px_quantum: Decimal         # 10 ** -px_decimals
+    raw: Dict = field(compare=False, repr=False)
+
+    @classmethod
+    def from_meta(cls, asset: int, perp: Dict) -> "AssetSpec":
+        sz_decimals = int(perp.get("szDecimals", 8))
+        px_decimals = max(MAX_PERP_DECIMALS - sz_decimals, 0)
+        return cls(
+            name=perp["name"],
+            asset=asset,
+            sz_decimals=sz_decimals,
+            px_decimals=px_decimals,
+            min_size=Decimal(str(perp.get("minSz", DEFAULT_MIN_SIZE))),
+            min_notional=MIN_ORDER_NOTIONAL,
+            max_leverage=int(perp.get("maxLeverage", 100)),
+            only_isolated=bool(perp.get("onlyIsolated", False)),
+            size_quantum=_ONE.scaleb(-sz_decimals),
+            px_quantum=_ONE.scaleb(-px_decimals),
+            raw=perp,
+        )
+
+    def round_size(self, size: Decimal) -> Decimal:
+        """Size troncata ai decimali ammessi (mai per eccesso: non supera il margine)."""
+        return size.quantize(self.size_quantum, rounding=ROUND_DOWN)
+
+    def round_price(self, px: Decimal) -> Decimal:
+        """Prezzo a 5 cifre significative e px_decimals decimali (i prezzi interi sono sempre validi)."""
+        if not px:
+            return px
+        sig_quantum = _ONE.scaleb(px.adjusted() - MAX_PRICE_SIG_FIGS + 1)
+        return px.quantize(min(max(sig_quantum, self.px_quantum), _ONE), rounding=ROUND_HALF_UP)
+
+
+class AssetSpecTable:
+    """
+    Indice nome -> AssetSpec costruito una volta da meta(): le ricerche per
+    simbolo in ordini e sizing sono un lookup in dizionario invece di una
+    scansione dell'universe.
+
+    La tabella viene sostituita per intero a ogni refresh (le letture non
+    prendono lock): in background ogni `refresh_interval` secondi e, per un
+    simbolo sconosciuto (nuovo listing), subito ma al massimo ogni
+    ASSET_SPEC_MISS_REFRESH secondi.
+    """
+
+    def __init__(self, fetch_meta: Callable[[], Dict], refresh_interval: float = ASSET_SPEC_REFRESH):
+        self._fetch_meta = fetch_meta
+        self._refresh_guard = threading.Lock()
+        self._last_refresh = 0.0
+        self.meta: Dict = {}
+        self._specs: Dict[str, AssetSpec] = {}
+        self.stats = {"refreshes": 0, "listed": 0, "delisted": 0, "errors": 0}
+        self.refresh()
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if refresh_interval > 0:
+            self._thread = threading.Thread(
+                target=self._run, args=(refresh_interval,), name="asset-specs", daemon=True
+            )
+            self._thread.start()
+
+    def refresh(self) -> None:
+        """Riscarica meta() e ricostruisce la tabella."""
+        with self._refresh_guard:
+            meta = self._fetch_meta()
+            specs = {perp["name"]: AssetSpec.from_meta(i, perp) for i, perp in enumerate(meta["universe"])}
+            if self._specs:
+                listed = specs.keys() - self._specs.keys()
+                delisted = self._specs.keys() - specs.keys()
+                if listed or delisted:
+                    print(f"[AssetSpecs] Universe aggiornato: +{sorted(listed)} -{sorted(delisted)}")
+                self.stats["listed"] += len(listed)
+                self.stats["delisted"] += len(delisted)
+            self.meta, self._specs = meta, specs
+            self._last_refresh = time.monotonic()
+            self.stats["refreshes"] += 1
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[AssetSpecs] Refresh meta fallito: {e}")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def get(self, symbol: str) -> Optional[AssetSpec]:
+        spec = self._specs.get(symbol)
+        if spec is None and time.monotonic() - self._last_refresh >= ASSET_SPEC_MISS_REFRESH:
+            try:
+                self.refresh()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[AssetSpecs] Refresh meta fallito: {e}")
+            spec = self._specs.get(symbol)
+        return spec
+
+    def __getitem__(self, symbol: str) -> AssetSpec:
+        spec = self.get(symbol)
+        if spec is None:
+            raise KeyError(symbol)
+        return spec
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._specs
+
+    def __iter__(self) -> Iterator[AssetSpec]:
+        return iter(self._specs.values())
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+
+_SHARED_TABLES: Dict[str, AssetSpecTable] = {}
+_SHARED_GUARD = threading.Lock()
+
+
+def get_shared_specs(base_url: str, fetch_meta: Callable[[], Dict]) -> AssetSpecTable:
+    """
+    Tabella condivisa a livello di processo per un endpoint (mainnet/testnet):
+    main.py ricrea HyperLiquidTrader ad ogni ciclo, meta() si scarica una volta
+    e poi si aggiorna in background.
+    """
+    with _SHARED_GUARD:
+        if base_url not in _SHARED_TABLES:
+            _SHARED_TABLES[base_url] = AssetSpecTable(fetch_meta)
+        return _SHARED_TABLES[base_url]
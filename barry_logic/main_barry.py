@@ -275,7 +275,7 @@ def manage_asset(bot, ticker, mode, price, pnl_trigger=None):
 
                     
 
-                    db_utils.log_bot_operation({"operation": "OPEN", "symbol": ticker, "direction": mode, "reason": "Trailing Entry", "agent": AGENT_NAME})
+                    db_utils.log_bot_operation_async({"operation": "OPEN", "symbol": ticker, "direction": mode, "reason": "Trailing Entry", "agent": AGENT_NAME})
 
 
 
@@ -0,0 +1,316 @@
+"""
+Benchmark offline della pipeline di analisi su fixture registrate o sintetiche.
+
+Per ogni scenario (coin x candele) misura tempo, allocazioni e picco di
+memoria (tracemalloc) di:
+  - analysis      CryptoTechnicalAnalysisHL.get_complete_analysis su tutte le coin
+                  (ciclo "cold" con cache vuota e ciclo "warm" successivo, per backend)
+  - forecaster    HyperliquidForecaster.forecast_many (saltato senza prophet)
+  - grid_scanner  harvest_logic.main_grid_scanner.analyze_candles sull'intera serie 15m
+
+analysis e forecaster scaricano una finestra fissa (FIXED_WINDOWS): non
+dipendono da --candles e girano una volta per numero di coin, con "candles"
+pari alla finestra.
+
+Uso (dalla root del repo):
+    python benchmarks/bench_analysis.py                          # matrice completa
+    python benchmarks/bench_analysis.py --quick                  # 3 coin x 200 candele, fixture sample
+    python benchmarks/bench_analysis.py --fixtures benchmarks/fixtures/recorded
+    python benchmarks/bench_analysis.py --compare benchmarks/results/bench_abc1234.json
+
+Senza --fixtures le fixture sintetiche deterministiche vengono generate (una
+volta) in benchmarks/fixtures/synthetic; --quick usa il set piccolo versionato in
+benchmarks/fixtures/sample, uguale su ogni macchina. I risultati vanno in un
+JSON per commit da confrontare con --compare.
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(REPO_DIR)
+
+import numpy as np
+import pandas as pd
+
+from candle_cache import MAX_CANDLES, CandleCache
+from fixtures import FixtureInfo, generate_synthetic_fixtures, read_meta
+from pivots import PivotPointProvider
+
+DEFAULT_COINS = [3, 50, 200]
+DEFAULT_CANDLES = [200, 5_000, 50_000]
+TARGETS = ("analysis", "forecaster", "grid_scanner")
+# candele scaricate per coin indipendentemente da --candles: 15m di
+# get_complete_analysis (indicators.py) e 1h di FORECAST_LIMITS (forecaster.py)
+FIXED_WINDOWS = {"analysis": 200, "forecaster": 500}
+SYNTHETIC_DIR = os.path.join(BENCH_DIR, "fixtures", "synthetic")
+SAMPLE_DIR = os.path.join(BENCH_DIR, "fixtures", "sample")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+# ==============================
+#           MISURA
+# ==============================
+def measure(setup: Callable, run: Callable, repeat: int) -> Dict:
+    """
+    Esegue run(setup()) `repeat` volte per il tempo, poi una volta sotto
+    tracemalloc (più lenta) per allocazioni e picco. setup non è misurato.
+    """
+    walls = []
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(state)
+        walls.append(time.perf_counter() - start)
+        del state
+
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    run(state)
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+    del state, snapshot
+
+    return {
+        "wall_s_best": min(walls),
+        "wall_s_mean": sum(walls) / len(walls),
+        "peak_bytes": peak,
+        "alloc_bytes_net": current,
+        "alloc_blocks_net": blocks,
+        "rss_max_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+# ==============================
+#            TARGET
+# ==============================
+def bench_analysis(info: FixtureInfo, coins: List[str], repeat: int, backends: List[str]) -> List[Dict]:
+    from indicators import CryptoTechnicalAnalysisHL
+
+    def make(backend: str):
+        # cache e pivot isolati: niente stato condiviso tra scenari
+        return CryptoTechnicalAnalysisHL(
+            candle_cache=CandleCache(),
+            pivot_provider=PivotPointProvider(cache_path=None),
+            indicator_backend=backend,
+            info=info,
+        )
+
+    def cycle(analyzer):
+        for coin in coins:
+            analyzer.get_complete_analysis(coin)
+
+    def warmed(backend: str):
+        analyzer = make(backend)
+        cycle(analyzer)
+        return analyzer
+
+    results = []
+    for backend in backends:
+        results.append({"target": "analysis", "variant": f"{backend}/cold",
+                        **measure(lambda: make(backend), cycle, repeat)})
+        results.append({"target": "analysis", "variant": f"{backend}/warm",
+                        **measure(lambda: warmed(backend), cycle, repeat)})
+    return results
+
+
+def bench_forecaster(info: FixtureInfo, coins: List[str], repeat: int) -> List[Dict]:
+    # prophet viene importato solo al primo fit: l'import di forecaster riesce comunque
+    if importlib.util.find_spec("prophet") is None:
+        return [{"target": "forecaster", "variant": "prophet", "skipped": "prophet non installato"}]
+    from forecaster import HyperliquidForecaster
+
+    def setup():
+        return HyperliquidForecaster(candle_cache=CandleCache(), info=info)
+
+    def run(forecaster):
+        results = forecaster.forecast_many(coins)
+        errors = [r["error"] for r in results if "error" in r]
+        if errors:
+            raise RuntimeError(f"forecast_many: {errors[0]}")
+
+    return [{"target": "forecaster", "variant": "prophet", **measure(setup, run, repeat)}]
+
+
+def bench_grid_scanner(info: FixtureInfo, coins: List[str], repeat: int) -> List[Dict]:
+    from harvest_logic.main_grid_scanner import analyze_candles
+
+    def setup():
+        # analyze_candles aggiunge colonne al DataFrame: copia fresca ad ogni run
+        return [info.ohlcv_frame(coin, "15m").copy() for coin in coins]
+
+    def run(frames):
+        for df in frames:
+            analyze_candles(df)
+
+    return [{"target": "grid_scanner", "variant": "analyze_candles", **measure(setup, run, repeat)}]
+
+
+# ==============================
+#           FIXTURE
+# ==============================
+def ensure_synthetic(coins: int, candles: int, seed: int) -> str:
+    meta = read_meta(SYNTHETIC_DIR)
+    if (
+        meta
+        and meta.get("seed") == seed
+        and len(meta.get("coins", [])) >= coins
+        and meta.get("candles", 0) >= candles
+    ):
+        return SYNTHETIC_DIR
+    print(f"Generazione fixture sintetiche: {coins} coin x {candles} candele in {SYNTHETIC_DIR}")
+    start = time.perf_counter()
+    generate_synthetic_fixtures(
+        SYNTHETIC_DIR, coins, candles, seed=seed,
+        intervals={"15m": candles, "1h": min(candles, MAX_CANDLES), "1d": 30},
+    )
+    print(f"  fatto in {time.perf_counter() - start:.1f}s")
+    return SYNTHETIC_DIR
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+# ==============================
+#          CONFRONTO
+# ==============================
+def _key(row: Dict):
+    return row["target"], row.get("variant"), row["coins"], row["candles"]
+
+
+def compare(old_path: str, new_rows: List[Dict]) -> None:
+    with open(old_path) as f:
+        old = {_key(r): r for r in json.load(f)["results"] if "wall_s_best" in r}
+    print(f"\nConfronto con {old_path} (nuovo / vecchio)")
+    print(f"{'target':<14}{'variant':<18}{'coins':>6}{'candles':>9}{'wall':>9}{'peak':>9}")
+    for row in new_rows:
+        prev = old.get(_key(row))
+        if prev is None or "wall_s_best" not in row:
+            continue
+        wall = row["wall_s_best"] / prev["wall_s_best"] if prev["wall_s_best"] else float("nan")
+        peak = row["peak_bytes"] / prev["peak_bytes"] if prev["peak_bytes"] else float("nan")
+        flag = "  ⚠️" if wall > 1.10 or peak > 1.10 else ""
+        print(f"{row['target']:<14}{row['variant']:<18}{row['coins']:>6}{row['candles']:>9}"
+              f"{wall:>8.2f}x{peak:>8.2f}x{flag}")
+
+
+def _ints(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--coins", type=_ints, default=DEFAULT_COINS)
+    parser.add_argument("--candles", type=_ints, default=DEFAULT_CANDLES)
+    parser.add_argument("--targets", default=",".join(TARGETS))
+    parser.add_argument("--backends", default="ta,fast", help="indicator_backend per il target analysis")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixtures", help="directory di fixture (default: sintetiche)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--quick", action="store_true", help="solo 3 coin x 200 candele")
+    parser.add_argument("--output", help="file JSON dei risultati (default: benchmarks/results/bench_<commit>.json)")
+    parser.add_argument("--compare", help="JSON di un run precedente da confrontare")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.coins, args.candles = [3], [200]
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"target sconosciuti: {sorted(unknown)} (disponibili: {TARGETS})")
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+
+    # un passaggio per ogni finestra fissa, poi l'asse --candles per gli altri target
+    passes = [(FIXED_WINDOWS[t], [t]) for t in targets if t in FIXED_WINDOWS]
+    scaled = [t for t in targets if t not in FIXED_WINDOWS]
+    if scaled:
+        passes += [(candles, scaled) for candles in args.candles]
+
+    if args.fixtures:
+        directory = args.fixtures
+    elif args.quick:
+        directory = SAMPLE_DIR
+    else:
+        directory = ensure_synthetic(max(args.coins), max(c for c, _ in passes), args.seed)
+    meta = read_meta(directory) or {}
+    commit = git_commit()
+    rows: List[Dict] = []
+
+    print(f"{'target':<14}{'variant':<18}{'coins':>6}{'candles':>9}{'wall ms':>11}{'peak MB':>10}{'blocks':>10}")
+    for candles, pass_targets in passes:
+        info = FixtureInfo(directory, max_candles=candles)
+        available = info.coins
+        for n_coins in args.coins:
+            if n_coins > len(available):
+                print(f"  (saltato {n_coins} coin: la fixture ne contiene {len(available)})")
+                continue
+            coins = available[:n_coins]
+            info.preload(coins)
+
+            scenario = []
+            if "analysis" in pass_targets:
+                scenario += bench_analysis(info, coins, args.repeat, backends)
+            if "forecaster" in pass_targets:
+                scenario += bench_forecaster(info, coins, args.repeat)
+            if "grid_scanner" in pass_targets:
+                scenario += bench_grid_scanner(info, coins, args.repeat)
+
+            for row in scenario:
+                row.update(coins=n_coins, candles=candles)
+                rows.append(row)
+                if "skipped" in row:
+                    print(f"{row['target']:<14}{row['variant']:<18}{n_coins:>6}{candles:>9}  skipped: {row['skipped']}")
+                    continue
+                print(f"{row['target']:<14}{row['variant']:<18}{n_coins:>6}{candles:>9}"
+                      f"{row['wall_s_best'] * 1e3:>11.1f}{row['peak_bytes'] / 2**20:>10.1f}"
+                      f"{row['alloc_blocks_net']:>10}")
+        del info
+        gc.collect()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {
+        "meta": {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "fixtures": directory,
+            "fixture_source": meta.get("source"),
+            "repeat": args.repeat,
+        },
+        "results": rows,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nRisultati salvati in {output}")
+
+    if args.compare:
+        compare(args.compare, rows)
+
+
+if __name__ == "__main__":
+    main()
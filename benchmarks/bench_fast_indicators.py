@@ -0,0 +1,196 @@
+"""
+Parità e benchmark del backend fast_indicators contro la libreria `ta`, più il
+replay di parità di streaming_indicators.IndicatorEngine.
+
+Uso (dalla root del repo):
+    python benchmarks/bench_fast_indicators.py [--coins 200] [--candles 200]
+    python benchmarks/bench_fast_indicators.py --replay-candles 2000 --window 200
+
+Il replay fa scorrere una finestra di `--window` candele 15m (come
+get_complete_analysis) e confronta ad ogni passo il valore dell'engine, che
+porta avanti lo stato, con `ta` ricalcolato sulla sola finestra. Al primo passo
+la storia è la stessa e i valori devono coincidere (tolleranza TOLERANCE); poi
+la differenza è lo stato iniziale diverso smorzato lungo la finestra e deve
+restare sotto il limite teorico (vedi replay_bounds).
+
+Esce con codice 1 se un indicatore differisce da `ta` oltre la tolleranza o il limite.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import ta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fast_indicators
+from candle_cache import INTERVAL_TO_MS
+from streaming_indicators import IndicatorEngine
+
+TOLERANCE = 1e-9
+
+
+def synthetic_ohlc(coins: int, candles: int, seed: int = 42):
+    """Random walk deterministico (coins x candles) con high/low coerenti."""
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.005, size=(coins, candles)), axis=1))
+    spread = np.abs(rng.normal(0, 0.003, size=(coins, candles))) * close
+    return close + spread, close - spread, close
+
+
+def ta_indicators(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> dict:
+    h, l, c = pd.Series(high), pd.Series(low), pd.Series(close)
+    return {
+        "ema_20": ta.trend.EMAIndicator(c, window=20).ema_indicator().to_numpy(),
+        "ema_50": ta.trend.EMAIndicator(c, window=50).ema_indicator().to_numpy(),
+        "macd": ta.trend.MACD(c).macd_diff().to_numpy(),
+        "rsi_7": ta.momentum.RSIIndicator(c, window=7).rsi().to_numpy(),
+        "rsi_14": ta.momentum.RSIIndicator(c, window=14).rsi().to_numpy(),
+        "atr_3": ta.volatility.AverageTrueRange(h, l, c, window=3).average_true_range().to_numpy(),
+        "atr_14": ta.volatility.AverageTrueRange(h, l, c, window=14).average_true_range().to_numpy(),
+    }
+
+
+def check_parity(high, low, close) -> list:
+    """Confronta riga per riga compute_universe con `ta`. Restituisce gli scostamenti."""
+    fast = fast_indicators.compute_universe(high, low, close)
+    failures = []
+    for i in range(close.shape[0]):
+        expected = ta_indicators(high[i], low[i], close[i])
+        single = {
+            "ema_20": fast_indicators.ema(close[i], 20),
+            "rsi_14": fast_indicators.rsi(close[i], 14),
+            "atr_14": fast_indicators.atr(high[i], low[i], close[i], 14),
+            "macd": fast_indicators.macd(close[i])[2],
+        }
+        for name, ref in expected.items():
+            candidates = [("batch", fast[name][i])]
+            if name in single:
+                candidates.append(("1d", single[name]))
+            for mode, got in candidates:
+                if not np.allclose(got, ref, rtol=TOLERANCE, atol=TOLERANCE, equal_nan=True):
+                    diff = np.nanmax(np.abs(got - ref))
+                    failures.append(f"{name} [{mode}] coin #{i}: max diff {diff:.3e}")
+    return failures
+
+
+def replay_bounds(high, low, close, window: int) -> dict:
+    """
+    Limite della differenza engine - `ta` su una finestra di `window` candele:
+    lo scarto dello stato iniziale si smorza di (1 - alpha) ad ogni candela
+    (alpha = 2/(p+1) per le EMA, 1/p per le medie di Wilder di RSI e ATR).
+    """
+    close_range = close.max() - close.min()
+    move = np.abs(np.diff(close))
+    tr = np.maximum(high[1:] - low[1:], np.maximum(np.abs(high[1:] - close[:-1]), np.abs(low[1:] - close[:-1])))
+
+    def ema(p):
+        return (1 - 2 / (p + 1)) ** (window - p) * close_range
+
+    def wilder(p, scale):
+        return (1 - 1 / p) ** (window - p) * scale
+
+    # RSI = 100 * up / (up + down): lo scarto sulle medie pesa in rapporto alla loro somma
+    rsi_scale = 100 * move.max() / move.mean()
+    return {
+        "ema_20": ema(20),
+        "ema_50": ema(50),
+        "macd": 2 * ema(26),
+        "rsi_7": wilder(7, rsi_scale),
+        "rsi_14": wilder(14, rsi_scale),
+        "atr_3": wilder(3, tr.max()),
+        "atr_14": wilder(14, tr.max()),
+    }
+
+
+def replay_streaming(high, low, close, window: int) -> tuple:
+    """
+    Finestra scorrevole di `window` candele 15m con l'ultima in formazione, come
+    get_complete_analysis: IndicatorEngine.sync contro `ta` sulla stessa finestra.
+    Restituisce (scarti al primo passo, scarti massimi) per indicatore.
+    """
+    step = INTERVAL_TO_MS["15m"]
+    ts = 1_700_000_000_000 // step * step + np.arange(len(close)) * step
+    frame = pd.DataFrame({
+        "timestamp": pd.to_datetime(ts, unit="ms", utc=True),
+        "open": close, "high": high, "low": low, "close": close,
+    })
+    engine = IndicatorEngine()
+    first, worst = None, {}
+    for end in range(window, len(close) + 1):
+        start = end - window
+        snapshot = engine.sync("SYN", "15m", frame.iloc[start:end], now_ms=int(ts[end - 1]) + 1)
+        expected = ta_indicators(high[start:end], low[start:end], close[start:end])
+        diff = {name: abs(snapshot[name]["current"] - ref[-1]) for name, ref in expected.items()}
+        if first is None:
+            first = diff
+        for name, value in diff.items():
+            worst[name] = max(worst.get(name, 0.0), value)
+    return first, worst
+
+
+def timeit(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--coins", type=int, default=200)
+    parser.add_argument("--candles", type=int, default=200)
+    parser.add_argument("--parity-coins", type=int, default=20)
+    parser.add_argument("--replay-candles", type=int, default=1000, help="candele del replay di IndicatorEngine (0 = salta)")
+    parser.add_argument("--window", type=int, default=200, help="finestra del replay (limit 15m di get_complete_analysis)")
+    args = parser.parse_args()
+
+    high, low, close = synthetic_ohlc(args.coins, args.candles)
+
+    # 1) Parità
+    n = min(args.parity_coins, args.coins)
+    failures = check_parity(high[:n], low[:n], close[:n])
+    if failures:
+        print("❌ Parità con ta FALLITA:")
+        for line in failures:
+            print(f"   {line}")
+        sys.exit(1)
+    print(f"✅ Parità con ta OK su {n} coin x {args.candles} candele (tol {TOLERANCE})")
+
+    # 1b) IndicatorEngine su finestra scorrevole
+    if args.replay_candles > args.window:
+        rh, rl, rc = (x[0] for x in synthetic_ohlc(1, args.replay_candles, seed=7))
+        first, worst = replay_streaming(rh, rl, rc, args.window)
+        bounds = replay_bounds(rh, rl, rc, args.window)
+        print(f"\nReplay IndicatorEngine ({args.replay_candles} candele, finestra {args.window}, prezzo ~{rc.mean():.0f})")
+        print(f"  {'indicatore':<10}{'primo passo':>14}{'max scarto':>14}{'limite':>14}")
+        failed = False
+        for name, value in worst.items():
+            ok = first[name] <= TOLERANCE and value <= max(bounds[name], TOLERANCE)
+            failed |= not ok
+            print(f"  {name:<10}{first[name]:>14.3e}{value:>14.3e}{bounds[name]:>14.3e}{'' if ok else '  ❌'}")
+        if failed:
+            print("❌ Replay di IndicatorEngine oltre il limite")
+            sys.exit(1)
+
+    # 2) Singola serie (il caso di get_complete_analysis)
+    t_ta = timeit(lambda: ta_indicators(high[0], low[0], close[0]))
+    t_fast = timeit(lambda: fast_indicators.compute_universe(high[0], low[0], close[0]))
+    print(f"\nSingola serie ({args.candles} candele)")
+    print(f"  ta   : {t_ta * 1e3:8.2f} ms")
+    print(f"  fast : {t_fast * 1e3:8.2f} ms  ({t_ta / t_fast:.1f}x)")
+
+    # 3) Universe intera (coins x candles)
+    t_ta = timeit(lambda: [ta_indicators(high[i], low[i], close[i]) for i in range(args.coins)], repeat=2)
+    t_fast = timeit(lambda: fast_indicators.compute_universe(high, low, close), repeat=2)
+    print(f"\nUniverse ({args.coins} coin x {args.candles} candele)")
+    print(f"  ta (loop per coin)  : {t_ta * 1e3:8.2f} ms")
+    print(f"  fast (batch 2D)     : {t_fast * 1e3:8.2f} ms  ({t_ta / t_fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Valutazione walk-forward dei backend di forecast su storico di candele.
+
+Per ogni coin, intervallo e backend il forecast viene ripetuto su `--origins`
+istanti consecutivi dello storico. Come in HyperliquidForecaster il backend vede
+solo candele chiuse (le 300 / 500 scaricate meno quella in formazione) e prevede
+la candela dopo quella in formazione, cioè `--horizon` = 2 passi dopo l'ultima
+chiusa; con --horizon 1 si valuta il forecast a un passo.
+
+Metriche per (backend, intervallo):
+  - mae / mape_pct   errore assoluto medio sul close previsto
+  - hit_rate         direzione (su/giù rispetto all'ultimo close) indovinata
+  - coverage         quota di close reali dentro [yhat_lower, yhat_upper] (nominale 0.8)
+  - fit_ms / predict_ms  tempo medio per forecast (i backend NumPy fanno fit e
+                     predict in un solo passaggio, vettorizzato su tutte le origini)
+
+Uso (dalla root del repo):
+    python benchmarks/eval_forecasts.py                      # fixture sintetiche
+    python benchmarks/eval_forecasts.py --fixtures benchmarks/fixtures/recorded --coins 3
+    python benchmarks/eval_forecasts.py --backends ewma_drift,ar --origins 500 --workers 4
+    python benchmarks/eval_forecasts.py --horizon 1
+
+Le coin vengono valutate in parallelo (un processo per coin). Tabella e JSON
+finiscono in benchmarks/results/.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+
+import numpy as np
+import pandas as pd
+
+from bench_analysis import RESULTS_DIR, ensure_synthetic, git_commit
+from fixtures import FixtureInfo
+from forecast_backends import FORECAST_BACKENDS, make_backend, make_prophet
+from forecaster import FORECAST_LIMITS
+from prophet_cache import fit_model, stan_init
+
+
+# ==============================
+#        WALK-FORWARD
+# ==============================
+def _windows(y: np.ndarray, window: int, origins: int, horizon: int) -> np.ndarray:
+    """Matrice (origins x window): la riga i termina `horizon` candele prima della target i."""
+    start = len(y) - origins
+    return np.stack([y[t - horizon - window + 1:t - horizon + 1] for t in range(start, len(y))])
+
+
+def _eval_numpy(backend, y: np.ndarray, window: int, origins: int, horizon: int) -> Dict:
+    matrix = _windows(y, window, origins, horizon)
+    started = time.perf_counter()
+    out = backend.forecast(matrix, horizon=horizon)
+    elapsed = time.perf_counter() - started
+    return {
+        "yhat": out["yhat"],
+        "lower": out["yhat_lower"],
+        "upper": out["yhat_upper"],
+        "fit_s": np.full(origins, elapsed / origins),
+        "predict_s": np.zeros(origins),
+    }
+
+
+def _eval_prophet(ds: np.ndarray, y: np.ndarray, window: int, origins: int, horizon: int) -> Dict:
+    # come in produzione: ogni fit parte dai parametri del fit precedente
+    yhat, lower, upper, fit_s, predict_s = [], [], [], [], []
+    previous = None
+    start = len(y) - origins
+    for t in range(start, len(y)):
+        end = t - horizon + 1
+        history = pd.DataFrame({"ds": ds[end - window:end], "y": y[end - window:end]})
+        began = time.perf_counter()
+        model, _ = fit_model(history, make_prophet, stan_init(previous) if previous is not None else None)
+        fit_s.append(time.perf_counter() - began)
+
+        began = time.perf_counter()
+        row = model.predict(pd.DataFrame({"ds": [ds[t]]})).iloc[0]
+        predict_s.append(time.perf_counter() - began)
+        yhat.append(row["yhat"])
+        lower.append(row["yhat_lower"])
+        upper.append(row["yhat_upper"])
+        previous = model
+    return {
+        "yhat": np.array(yhat), "lower": np.array(lower), "upper": np.array(upper),
+        "fit_s": np.array(fit_s), "predict_s": np.array(predict_s),
+    }
+
+
+def evaluate_coin(directory: str, coin: str, intervals: List[str], backends: List[str], origins: int,
+                  horizon: int) -> List[Dict]:
+    """Job di un processo worker: tutte le combinazioni (intervallo, backend) di una coin."""
+    info = FixtureInfo(directory, shift_to_now=False)
+    rows = []
+    for interval in intervals:
+        frame = info.ohlcv_frame(coin, interval)
+        # candele scaricate meno quella in formazione, che il forecast non usa
+        window = FORECAST_LIMITS[interval] - 1
+        y = frame["close"].to_numpy(dtype=np.float64)
+        ds = frame["timestamp"].dt.tz_convert(None).to_numpy()
+        n = min(origins, len(y) - window - horizon + 1)
+        if n <= 0:
+            rows.append({"coin": coin, "interval": interval, "error": f"storico troppo corto ({len(y)} candele)"})
+            continue
+        actual = y[-n:]
+        # ultimo close visto dal backend, riferimento per la direzione
+        previous_close = y[len(y) - n - horizon:len(y) - horizon]
+
+        for name in backends:
+            try:
+                if name == "prophet":
+                    out = _eval_prophet(ds, y, window, n, horizon)
+                else:
+                    out = _eval_numpy(make_backend(name, interval), y, window, n, horizon)
+            except Exception as e:
+                rows.append({"coin": coin, "interval": interval, "backend": name, "error": str(e)})
+                continue
+            rows.append({
+                "coin": coin,
+                "interval": interval,
+                "backend": name,
+                "origins": n,
+                "abs_err": np.abs(out["yhat"] - actual).tolist(),
+                "pct_err": (np.abs(out["yhat"] - actual) / actual * 100).tolist(),
+                "hit": (np.sign(out["yhat"] - previous_close) == np.sign(actual - previous_close)).tolist(),
+                "covered": ((actual >= out["lower"]) & (actual <= out["upper"])).tolist(),
+                "fit_s": out["fit_s"].tolist(),
+                "predict_s": out["predict_s"].tolist(),
+            })
+    return rows
+
+
+# ==============================
+#        AGGREGAZIONE
+# ==============================
+def summarize(rows: List[Dict]) -> List[Dict]:
+    """Media delle metriche su tutte le coin e le origini per (backend, intervallo)."""
+    groups: Dict[tuple, List[Dict]] = {}
+    for row in rows:
+        if "error" not in row:
+            groups.setdefault((row["backend"], row["interval"]), []).append(row)
+
+    summary = []
+    for (backend, interval), items in sorted(groups.items(), key=lambda kv: (kv[0][1], kv[0][0])):
+        def cat(field):
+            return np.concatenate([np.asarray(r[field], dtype=np.float64) for r in items])
+
+        summary.append({
+            "backend": backend,
+            "interval": interval,
+            "coins": len(items),
+            "forecasts": int(sum(r["origins"] for r in items)),
+            "mae": float(cat("abs_err").mean()),
+            "mape_pct": float(cat("pct_err").mean()),
+            "hit_rate": float(cat("hit").mean()),
+            "coverage": float(cat("covered").mean()),
+            "fit_ms": float(cat("fit_s").mean() * 1e3),
+            "predict_ms": float(cat("predict_s").mean() * 1e3),
+        })
+    return summary
+
+
+def render_table(summary: List[Dict]) -> str:
+    header = "| interval | backend | coins | forecasts | MAE | MAPE % | hit rate | coverage (0.8) | fit ms | predict ms |"
+    lines = [header, "|" + "---|" * 10]
+    for s in summary:
+        lines.append(
+            f"| {s['interval']} | {s['backend']} | {s['coins']} | {s['forecasts']} | {s['mae']:.6g} "
+            f"| {s['mape_pct']:.4f} | {s['hit_rate']:.3f} | {s['coverage']:.3f} "
+            f"| {s['fit_ms']:.3f} | {s['predict_ms']:.3f} |"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="directory di fixture (default: sintetiche)")
+    parser.add_argument("--coins", type=int, default=10, help="numero massimo di coin valutate")
+    parser.add_argument("--intervals", default="15m,1h")
+    parser.add_argument("--backends", default=",".join(FORECAST_BACKENDS))
+    parser.add_argument("--origins", type=int, default=200, help="forecast walk-forward per coin e intervallo")
+    parser.add_argument("--horizon", type=int, default=2,
+                        help="passi dopo l'ultima candela chiusa (default 2, come HyperliquidForecaster)")
+    parser.add_argument("--workers", type=int, default=None, help="processi (default: numero di CPU)")
+    parser.add_argument("--output", help="file JSON (default: benchmarks/results/forecast_eval_<commit>.json)")
+    args = parser.parse_args()
+
+    intervals = [i.strip() for i in args.intervals.split(",") if i.strip()]
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = set(backends) - set(FORECAST_BACKENDS)
+    if unknown:
+        parser.error(f"backend sconosciuti: {sorted(unknown)} (disponibili: {FORECAST_BACKENDS})")
+    if args.horizon < 1:
+        parser.error("--horizon deve essere >= 1")
+    if "prophet" in backends:
+        try:
+            import prophet  # noqa: F401
+        except ImportError:
+            print("prophet non installato: backend prophet saltato")
+            backends.remove("prophet")
+
+    # storico sufficiente per la finestra più lunga più tutte le origini
+    needed = max(FORECAST_LIMITS[i] for i in intervals) + args.origins + args.horizon
+    directory = args.fixtures or ensure_synthetic(args.coins, needed, seed=42)
+    coins = FixtureInfo(directory).coins[:args.coins]
+
+    print(f"Walk-forward su {len(coins)} coin, {intervals}, backend {backends}, "
+          f"{args.origins} origini, horizon {args.horizon}")
+    started = time.perf_counter()
+    rows: List[Dict] = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {coin: pool.submit(evaluate_coin, directory, coin, intervals, backends, args.origins,
+                                   args.horizon) for coin in coins}
+        for coin, future in futures.items():
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                rows.append({"coin": coin, "error": str(e)})
+    elapsed = time.perf_counter() - started
+
+    for row in rows:
+        if "error" in row:
+            print(f"  ❌ {row.get('coin')} {row.get('interval', '')} {row.get('backend', '')}: {row['error']}")
+
+    summary = summarize(rows)
+    table = render_table(summary)
+    print()
+    print(table)
+    print(f"\nTempo totale: {elapsed:.1f}s")
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"forecast_eval_{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {
+        "meta": {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "fixtures": directory,
+            "coins": coins,
+            "intervals": intervals,
+            "backends": backends,
+            "origins": args.origins,
+            "horizon": args.horizon,
+            "elapsed_s": elapsed,
+        },
+        "summary": summary,
+        "errors": [r for r in rows if "error" in r],
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    table_path = os.path.splitext(output)[0] + ".md"
+    with open(table_path, "w") as f:
+        f.write(table + "\n")
+    print(f"Risultati salvati in {output} e {table_path}")
+
+
+if __name__ == "__main__":
+    main()
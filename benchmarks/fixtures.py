@@ -0,0 +1,249 @@
+"""
+Fixture su disco per i benchmark: sostituiscono hyperliquid Info senza rete.
+
+Una directory di fixture contiene:
+    meta.json          {"source": "recorded"|"synthetic", "coins": [...], ...}
+    <COIN>.json        {"coin", "recorded_at_ms",
+                        "candles": {interval: {"t": [...], "o": [...], "h", "l", "c", "v"}},
+                        "l2": <risposta di l2_snapshot>}
+
+Le candele sono salvate per colonne (molto più compatte della lista di dict
+dell'API) e riconvertite nel formato di candles_snapshot al momento del replay.
+"""
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from candle_cache import INTERVAL_TO_MS, MAX_CANDLES
+
+CANDLE_FIELDS = ("o", "h", "l", "c", "v")
+
+
+def now_ms() -> int:
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+# ==============================
+#        SCRITTURA FIXTURE
+# ==============================
+def candles_to_columns(raw: List[dict]) -> Dict[str, list]:
+    """Risposta di candles_snapshot -> colonne {"t", "o", "h", "l", "c", "v"}."""
+    columns = {"t": [int(c["t"]) for c in raw]}
+    for field in CANDLE_FIELDS:
+        columns[field] = [float(c[field]) for c in raw]
+    return columns
+
+
+def write_coin_fixture(directory: str, coin: str, candles: Dict[str, Dict[str, list]],
+                       l2: dict, recorded_at_ms: Optional[int] = None) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{coin}.json")
+    payload = {
+        "coin": coin,
+        "recorded_at_ms": recorded_at_ms or now_ms(),
+        "candles": candles,
+        "l2": l2,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    return path
+
+
+def write_meta(directory: str, **meta) -> None:
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_meta(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# ==============================
+#      GENERATORE SINTETICO
+# ==============================
+def synthetic_coin_names(count: int) -> List[str]:
+    return [f"SYN{i:03d}" for i in range(count)]
+
+
+def synthetic_candles(candles: int, interval: str, end_ms: int, seed: int,
+                      start_price: float = 100.0) -> Dict[str, list]:
+    """Random walk deterministico in formato colonne; l'ultima candela è quella di end_ms."""
+    rng = np.random.default_rng(seed)
+    step = INTERVAL_TO_MS[interval]
+    last_t = end_ms - end_ms % step
+    t = last_t - step * np.arange(candles - 1, -1, -1, dtype=np.int64)
+    vol = 0.002 * np.sqrt(step / INTERVAL_TO_MS["15m"])
+    close = start_price * np.exp(np.cumsum(rng.normal(0, vol, candles)))
+    open_ = np.r_[start_price, close[:-1]]
+    wick = np.abs(rng.normal(0, vol / 2, candles)) * close
+    high = np.maximum(open_, close) + wick
+    low = np.minimum(open_, close) - wick
+    volume = rng.gamma(2.0, 50.0, candles)
+    return {
+        "t": t.tolist(),
+        "o": np.round(open_, 6).tolist(),
+        "h": np.round(high, 6).tolist(),
+        "l": np.round(low, 6).tolist(),
+        "c": np.round(close, 6).tolist(),
+        "v": np.round(volume, 4).tolist(),
+    }
+
+
+def synthetic_l2(coin: str, mid: float, levels: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    tick = mid * 1e-4
+    sizes = np.round(rng.gamma(2.0, 1.0, (2, levels)), 4)
+    bids = [{"px": f"{mid - tick * (i + 1):.6f}", "sz": str(sizes[0, i]), "n": 1} for i in range(levels)]
+    asks = [{"px": f"{mid + tick * (i + 1):.6f}", "sz": str(sizes[1, i]), "n": 1} for i in range(levels)]
+    return {"coin": coin, "time": now_ms(), "levels": [bids, asks]}
+
+
+def generate_synthetic_fixtures(directory: str, coins: int, candles: int, seed: int = 42,
+                                intervals: Optional[Dict[str, int]] = None) -> List[str]:
+    """
+    Scrive una directory di fixture sintetiche deterministiche.
+
+    Args:
+        intervals: candele per intervallo; default 15m e 1h = candles, 1d = 30
+    """
+    intervals = intervals or {"15m": candles, "1h": candles, "1d": 30}
+    end = now_ms()
+    names = synthetic_coin_names(coins)
+    for i, coin in enumerate(names):
+        series = {
+            interval: synthetic_candles(n, interval, end, seed=seed * 100_003 + i * 7 + k)
+            for k, (interval, n) in enumerate(intervals.items())
+        }
+        mid = series[next(iter(intervals))]["c"][-1]
+        write_coin_fixture(directory, coin, series, synthetic_l2(coin, mid, 20, seed + i), end)
+    write_meta(directory, source="synthetic", coins=names, candles=candles,
+               intervals=intervals, seed=seed, generated_at_ms=end)
+    return names
+
+
+# ==============================
+#            REPLAY
+# ==============================
+class _Series:
+    __slots__ = ("t", "o", "h", "l", "c", "v")
+
+    def __init__(self, columns: Dict[str, list], shift_ms: int, max_candles: Optional[int]):
+        t = np.asarray(columns["t"], dtype=np.int64) + shift_ms
+        sl = slice(-max_candles, None) if max_candles else slice(None)
+        self.t = t[sl]
+        for field in CANDLE_FIELDS:
+            setattr(self, field, np.asarray(columns[field], dtype=np.float64)[sl])
+
+
+class FixtureInfo:
+    """
+    Sostituto offline di hyperliquid Info: candles_snapshot e l2_snapshot
+    leggono le fixture da disco invece che dall'API.
+
+    Con shift_to_now=True ogni serie viene traslata di un multiplo del proprio
+    intervallo in modo che l'ultima candela sia quella in formazione adesso:
+    le finestre calcolate da CandleCache sull'ora corrente restano piene
+    anche per fixture registrate giorni prima.
+
+    Args:
+        directory: directory di fixture (vedi docstring del modulo)
+        max_candles: tiene solo le ultime N candele di ogni serie
+        max_loaded: coin tenute in memoria contemporaneamente (LRU)
+    """
+
+    def __init__(self, directory: str, max_candles: Optional[int] = None,
+                 shift_to_now: bool = True, max_loaded: Optional[int] = None):
+        self.directory = directory
+        self.max_candles = max_candles
+        self.shift_to_now = shift_to_now
+        self.max_loaded = max_loaded
+        self.meta = read_meta(directory) or {}
+        self._coins: "OrderedDict[str, dict]" = OrderedDict()
+        self.calls = {"candles_snapshot": 0, "l2_snapshot": 0}
+
+    @property
+    def coins(self) -> List[str]:
+        if "coins" in self.meta:
+            return list(self.meta["coins"])
+        return sorted(f[:-5] for f in os.listdir(self.directory) if f.endswith(".json") and f != "meta.json")
+
+    def preload(self, coins: Iterable[str]) -> None:
+        for coin in coins:
+            self._load(coin)
+
+    def _load(self, coin: str) -> dict:
+        entry = self._coins.get(coin)
+        if entry is not None:
+            self._coins.move_to_end(coin)
+            return entry
+        path = os.path.join(self.directory, f"{coin}.json")
+        if not os.path.exists(path):
+            raise RuntimeError(f"Nessuna fixture per {coin} in {self.directory}")
+        with open(path) as f:
+            payload = json.load(f)
+
+        current = now_ms()
+        series = {}
+        for interval, columns in payload["candles"].items():
+            shift = 0
+            if self.shift_to_now and columns["t"]:
+                step = INTERVAL_TO_MS[interval]
+                shift = (current - current % step) - int(columns["t"][-1])
+            series[interval] = _Series(columns, shift, self.max_candles)
+        entry = {"candles": series, "l2": payload.get("l2")}
+
+        self._coins[coin] = entry
+        if self.max_loaded and len(self._coins) > self.max_loaded:
+            self._coins.popitem(last=False)
+        return entry
+
+    def candles_snapshot(self, name: str, interval: str, startTime: int, endTime: int) -> List[dict]:
+        self.calls["candles_snapshot"] += 1
+        series = self._load(name)["candles"].get(interval)
+        if series is None:
+            return []
+        lo = int(np.searchsorted(series.t, startTime, side="left"))
+        hi = int(np.searchsorted(series.t, endTime, side="right"))
+        # come l'API: al massimo le ultime MAX_CANDLES candele per richiesta
+        lo = max(lo, hi - MAX_CANDLES)
+        step = INTERVAL_TO_MS[interval]
+        return [
+            {
+                "t": t, "T": t + step - 1, "s": name, "i": interval,
+                "o": str(o), "c": str(c), "h": str(h), "l": str(l), "v": str(v), "n": 0,
+            }
+            for t, o, h, l, c, v in zip(
+                series.t[lo:hi].tolist(), series.o[lo:hi].tolist(), series.h[lo:hi].tolist(),
+                series.l[lo:hi].tolist(), series.c[lo:hi].tolist(), series.v[lo:hi].tolist(),
+            )
+        ]
+
+    def l2_snapshot(self, name: str) -> dict:
+        self.calls["l2_snapshot"] += 1
+        l2 = self._load(name)["l2"]
+        if l2 is None:
+            raise RuntimeError(f"Nessun l2 registrato per {name}")
+        return {**l2, "time": int(time.time() * 1000)}
+
+    def ohlcv_frame(self, coin: str, interval: str):
+        """Intera serie della fixture come DataFrame OHLCV (per chi non passa da Info)."""
+        series = self._load(coin)["candles"][interval]
+        return pd.DataFrame({
+            "timestamp": pd.to_datetime(series.t, unit="ms", utc=True),
+            "open": series.o,
+            "high": series.h,
+            "low": series.l,
+            "close": series.c,
+            "volume": series.v,
+        })
@@ -0,0 +1,63 @@
+"""
+Registra candele e book L2 reali di Hyperliquid in una directory di fixture,
+da riprodurre offline con bench_analysis.py --fixtures DIR.
+
+Uso (dalla root del repo, serve la rete):
+    python benchmarks/record_fixtures.py --coins BTC,ETH,SOL --out benchmarks/fixtures/recorded
+    python benchmarks/record_fixtures.py --coins BTC --candles 5000 --mainnet
+
+Hyperliquid conserva al massimo 5000 candele per intervallo: per scenari più
+lunghi usare le fixture sintetiche (bench_analysis.py le genera da solo).
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from hyperliquid.info import Info
+from hyperliquid.utils import constants
+
+from candle_cache import INTERVAL_TO_MS, MAX_CANDLES
+from fixtures import candles_to_columns, now_ms, write_coin_fixture, write_meta
+
+
+def record(info: Info, coin: str, intervals: dict, out: str) -> None:
+    end = now_ms()
+    series = {}
+    for interval, limit in intervals.items():
+        start = end - limit * INTERVAL_TO_MS[interval]
+        raw = info.candles_snapshot(name=coin, interval=interval, startTime=start, endTime=end)
+        series[interval] = candles_to_columns(raw)
+        print(f"  {coin} {interval}: {len(raw)} candele")
+    l2 = info.l2_snapshot(coin)
+    write_coin_fixture(out, coin, series, l2, end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--coins", default="BTC,ETH,SOL")
+    parser.add_argument("--candles", type=int, default=MAX_CANDLES, help="candele 15m e 1h per coin")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "fixtures", "recorded"))
+    parser.add_argument("--mainnet", action="store_true", help="default: testnet")
+    args = parser.parse_args()
+
+    base_url = constants.MAINNET_API_URL if args.mainnet else constants.TESTNET_API_URL
+    info = Info(base_url, skip_ws=True)
+    coins = [c.strip().upper() for c in args.coins.split(",") if c.strip()]
+    limit = min(args.candles, MAX_CANDLES)
+    intervals = {"15m": limit, "1h": limit, "1d": 30}
+
+    print(f"Registrazione di {len(coins)} coin da {base_url} in {args.out}")
+    recorded = []
+    for coin in coins:
+        try:
+            record(info, coin, intervals, args.out)
+            recorded.append(coin)
+        except Exception as e:
+            print(f"  ❌ {coin}: {e}")
+    write_meta(args.out, source="recorded", base_url=base_url, coins=recorded,
+               candles=limit, intervals=intervals, recorded_at_ms=now_ms())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+INTERVAL_TO_MS = {
+    "1m": 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "1h": 60 * 60_000,
+    "4h": 4 * 60 * 60_000,
+    "1d": 24 * 60 * 60_000,
+}
+
+OHLCV_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+# Hyperliquid espone al massimo le ultime 5000 candele per (coin, interval)
+MAX_CANDLES = 5000
+
+
+def candles_to_frame(raw: list) -> pd.DataFrame:
+    """
+    Converte la risposta di Info.candles_snapshot in un DataFrame OHLCV.
+    Oltre alle colonne standard mantiene 't' (open time in ms) per il merge.
+    """
+    df = pd.DataFrame(raw)
+    df = df[["t", "o", "h", "l", "c", "v"]].copy()
+    df.rename(
+        columns={"o": "open", "h": "high", "l": "low", "c": "close", "v": "volume"},
+        inplace=True,
+    )
+    df["t"] = df["t"].astype("int64")
+    for col in ["open", "high", "low", "close", "volume"]:
+        df[col] = df[col].astype(float)
+    df["timestamp"] = pd.to_datetime(df["t"], unit="ms", utc=True)
+    return df
+
+
+class CandleCache:
+    """
+    Store in-process delle candele Hyperliquid, indicizzato per (coin, interval).
+
+    Alla prima richiesta scarica l'intera finestra; dalle successive chiede a
+    candles_snapshot solo le candele a partire dall'ultima salvata (che può
+    essere quella ancora in formazione), e la sostituisce con la versione
+    aggiornata. In regime le chiamate trasferiscono 1-2 candele invece di 200+.
+    """
+
+    def __init__(self, max_candles: int = MAX_CANDLES):
+        self.max_candles = max_candles
+        self._frames: Dict[Tuple[str, str], pd.DataFrame] = {}
+        # inizio (ms) della finestra già coperta dai download per ogni chiave
+        self._covered_from: Dict[Tuple[str, str], int] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.stats = {"full_fetches": 0, "incremental_fetches": 0, "candles_received": 0}
+
+    def _lock_for(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def clear(self, coin: Optional[str] = None, interval: Optional[str] = None) -> None:
+        """Svuota la cache (tutta, oppure solo le chiavi che corrispondono)."""
+        with self._locks_guard:
+            for key in list(self._frames):
+                if (coin is None or key[0] == coin) and (interval is None or key[1] == interval):
+                    del self._frames[key]
+                    self._covered_from.pop(key, None)
+
+    def get_ohlcv(self, info, coin: str, interval: str, limit: int = 500) -> pd.DataFrame:
+        """
+        Restituisce le candele della finestra [now - limit*step, now], con la
+        stessa forma di CryptoTechnicalAnalysisHL.fetch_ohlcv
+        (timestamp, open, high, low, close, volume).
+
+        Args:
+            info: istanza hyperliquid Info (o compatibile) usata per i download
+            coin: asset Hyperliquid (es. 'BTC')
+            interval: chiave di INTERVAL_TO_MS (es. '15m', '1d')
+            limit: numero di candele circa della finestra
+        """
+        if interval not in INTERVAL_TO_MS:
+            raise ValueError(f"Interval '{interval}' non supportato in INTERVAL_TO_MS")
+
+        step_ms = INTERVAL_TO_MS[interval]
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        start_ms = now_ms - limit * step_ms
+        key = (coin, interval)
+
+        with self._lock_for(key):
+            cached = self._frames.get(key)
+            covered_from = self._covered_from.get(key)
+
+            # Serve uno storico più vecchio di quello in cache, oppure il buco
+            # dall'ultima candela è più lungo della finestra: download completo
+            if (
+                cached is None
+                or cached.empty
+                or covered_from > start_ms
+                or int(cached["t"].iloc[-1]) <= start_ms - step_ms
+            ):
+                raw = info.candles_snapshot(
+                    name=coin, interval=interval, startTime=start_ms, endTime=now_ms
+                )
+                if not raw:
+                    raise RuntimeError(f"Nessuna candela ricevuta per {coin} ({interval})")
+                merged = candles_to_frame(raw)
+                covered_from = start_ms
+                self.stats["full_fetches"] += 1
+            else:
+                # L'ultima candela salvata può essere ancora in formazione:
+                # la riscarichiamo insieme a quelle più nuove e la sostituiamo
+                fetch_from = int(cached["t"].iloc[-1])
+                raw = info.candles_snapshot(
+                    name=coin, interval=interval, startTime=fetch_from, endTime=now_ms
+                )
+                self.stats["incremental_fetches"] += 1
+                if raw:
+                    fresh = candles_to_frame(raw)
+                    merged = pd.concat(
+                        [cached[cached["t"] < int(fresh["t"].min())], fresh],
+                        ignore_index=True,
+                    )
+                else:
+                    merged = cached
+
+            self.stats["candles_received"] += len(raw) if raw else 0
+
+            merged = (
+                merged.drop_duplicates(subset="t", keep="last")
+                .sort_values("t")
+                .tail(self.max_candles)
+                .reset_index(drop=True)
+            )
+            self._frames[key] = merged
+            if len(merged) >= self.max_candles:
+                covered_from = max(covered_from, int(merged["t"].iloc[0]))
+            self._covered_from[key] = covered_from
+
+        # candele che si sovrappongono alla finestra richiesta
+        window = merged[merged["t"] > start_ms - step_ms]
+        return window[OHLCV_COLUMNS].reset_index(drop=True)
+
+
+_SHARED_CACHES: Dict[str, CandleCache] = {}
+_SHARED_GUARD = threading.Lock()
+
+
+def get_shared_cache(base_url: str) -> CandleCache:
+    """
+    Cache condivisa a livello di processo per un endpoint (mainnet/testnet):
+    main.py ricrea gli analyzer ad ogni ciclo, la storia deve sopravvivere.
+    """
+    with _SHARED_GUARD:
+        if base_url not in _SHARED_CACHES:
+            _SHARED_CACHES[base_url] = CandleCache()
+        return _SHARED_CACHES[base_url]
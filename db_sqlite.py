@@ -0,0 +1,536 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from db_utils import (
+    RETENTION_DAYS,
+    ROLLUP_BUCKETS,
+    ROLLUP_RETENTION_DAYS,
+    StorageBackend,
+    _bucket_start,
+    _context_rows,
+    _dumps,
+    _error_rows,
+    _finite,
+    _operation_rows,
+    _pnl_rollup_rows,
+    _position_records,
+    _split_prompt,
+    _stored_prompt,
+    _to_utc,
+)
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))  # attesa massima sul lock di scrittura (s)
+
+# Stesso schema di db_utils.SCHEMA_TABLES con i tipi SQLite: timestamp come
+# testo ISO in UTC a lunghezza fissa (ordinabili come stringhe), JSON come
+# testo, NUMERIC come REAL
+SQLITE_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS account_snapshots (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    balance_usd REAL NOT NULL,
+    raw_payload TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS open_positions (
+    id INTEGER PRIMARY KEY,
+    snapshot_id INTEGER NOT NULL REFERENCES account_snapshots(id) ON DELETE CASCADE,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    size REAL NOT NULL,
+    entry_price REAL,
+    mark_price REAL,
+    pnl_usd REAL,
+    leverage TEXT,
+    raw_payload TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS prompt_templates (
+    hash TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    template TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ai_contexts (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    system_prompt TEXT,
+    template_hash TEXT REFERENCES prompt_templates(hash),
+    prompt_args BLOB
+);
+
+CREATE TABLE IF NOT EXISTS indicators_contexts (
+    id INTEGER PRIMARY KEY,
+    context_id INTEGER NOT NULL REFERENCES ai_contexts(id) ON DELETE CASCADE,
+    ticker TEXT,
+    ts TEXT,
+    price REAL,
+    ema20 REAL,
+    macd REAL,
+    rsi_7 REAL,
+    volume_bid REAL,
+    volume_ask REAL,
+    open_interest_latest REAL,
+    funding_rate REAL,
+    raw TEXT
+);
+
+CREATE TABLE IF NOT EXISTS news_contexts (
+    id INTEGER PRIMARY KEY,
+    context_id INTEGER NOT NULL REFERENCES ai_contexts(id) ON DELETE CASCADE,
+    news_text TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sentiment_contexts (
+    id INTEGER PRIMARY KEY,
+    context_id INTEGER NOT NULL REFERENCES ai_contexts(id) ON DELETE CASCADE,
+    value INTEGER,
+    classification TEXT,
+    sentiment_timestamp INTEGER,
+    raw TEXT
+);
+
+CREATE TABLE IF NOT EXISTS forecasts_contexts (
+    id INTEGER PRIMARY KEY,
+    context_id INTEGER NOT NULL REFERENCES ai_contexts(id) ON DELETE CASCADE,
+    ticker TEXT,
+    timeframe TEXT,
+    prediction REAL,
+    forecast_timestamp INTEGER,
+    raw TEXT
+);
+
+CREATE TABLE IF NOT EXISTS bot_operations (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    context_id INTEGER REFERENCES ai_contexts(id) ON DELETE CASCADE,
+    operation TEXT NOT NULL,
+    symbol TEXT,
+    direction TEXT,
+    target_portion_of_balance REAL,
+    leverage REAL,
+    raw_payload TEXT NOT NULL,
+    agent TEXT,
+    pnl REAL
+);
+
+CREATE TABLE IF NOT EXISTS errors (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    error_type TEXT NOT NULL,
+    error_message TEXT,
+    traceback TEXT,
+    context TEXT,
+    source TEXT
+);
+
+CREATE TABLE IF NOT EXISTS pnl_rollups (
+    bucket TEXT NOT NULL,
+    bucket_start TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    realized_pnl REAL NOT NULL DEFAULT 0,
+    closes INTEGER NOT NULL DEFAULT 0,
+    operations INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, agent, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS balance_rollups (
+    bucket TEXT NOT NULL,
+    bucket_start TEXT NOT NULL,
+    balance_open REAL NOT NULL,
+    balance_close REAL NOT NULL,
+    balance_min REAL NOT NULL,
+    balance_max REAL NOT NULL,
+    last_at TEXT NOT NULL,
+    samples INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, bucket_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_bot_operations_agent_created ON bot_operations (agent, created_at);
+CREATE INDEX IF NOT EXISTS idx_bot_operations_operation_created ON bot_operations (operation, created_at);
+CREATE INDEX IF NOT EXISTS idx_bot_operations_created_id ON bot_operations (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_bot_operations_context ON bot_operations (context_id);
+CREATE INDEX IF NOT EXISTS idx_open_positions_snapshot ON open_positions (snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_errors_created ON errors (created_at);
+CREATE INDEX IF NOT EXISTS idx_account_snapshots_created ON account_snapshots (created_at);
+CREATE INDEX IF NOT EXISTS idx_ai_contexts_created ON ai_contexts (created_at);
+CREATE INDEX IF NOT EXISTS idx_indicators_contexts_context ON indicators_contexts (context_id);
+CREATE INDEX IF NOT EXISTS idx_news_contexts_context ON news_contexts (context_id);
+CREATE INDEX IF NOT EXISTS idx_sentiment_contexts_context ON sentiment_contexts (context_id);
+CREATE INDEX IF NOT EXISTS idx_forecasts_contexts_context ON forecasts_contexts (context_id);
+"""
+
+PNL_ROLLUP_UPSERT_SQL = """
+INSERT INTO pnl_rollups (bucket, bucket_start, agent, realized_pnl, closes, operations)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (bucket, agent, bucket_start) DO UPDATE SET
+    realized_pnl = pnl_rollups.realized_pnl + excluded.realized_pnl,
+    closes = pnl_rollups.closes + excluded.closes,
+    operations = pnl_rollups.operations + excluded.operations
+"""
+
+# stessa semantica di db_utils.BALANCE_ROLLUP_CONFLICT_SQL (MIN/MAX scalari al posto di LEAST/GREATEST)
+BALANCE_ROLLUP_UPSERT_SQL = """
+INSERT INTO balance_rollups
+(bucket, bucket_start, balance_open, balance_close, balance_min, balance_max, last_at, samples)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (bucket, bucket_start) DO UPDATE SET
+    balance_close = CASE WHEN excluded.last_at >= balance_rollups.last_at
+                         THEN excluded.balance_close ELSE balance_rollups.balance_close END,
+    balance_min = MIN(balance_rollups.balance_min, excluded.balance_min),
+    balance_max = MAX(balance_rollups.balance_max, excluded.balance_max),
+    last_at = MAX(balance_rollups.last_at, excluded.last_at),
+    samples = balance_rollups.samples + excluded.samples
+"""
+
+
+def _ts(value: Any) -> Optional[str]:
+    """Timestamp in UTC con microsecondi sempre presenti: l'ordine delle stringhe è quello temporale."""
+    parsed = _to_utc(value)
+    if parsed is None:
+        return None
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+def _from_ts(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _adapt(value: Any) -> Any:
+    """Valore di una riga condivisa con il backend Postgres -> tipo accettato da sqlite3."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return _ts(value)
+    if isinstance(value, (dict, list)):
+        return _dumps(value)
+    if np is not None and isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _adapt_rows(rows: List[tuple]) -> List[tuple]:
+    return [tuple(_adapt(v) for v in row) for row in rows]
+
+
+def sqlite_path(url: str) -> str:
+    """sqlite:///relativo.db, sqlite:////assoluto.db, sqlite:///:memory: -> percorso per sqlite3.connect."""
+    path = url[len("sqlite:"):].split("?", 1)[0]
+    if path.startswith("//"):
+        path = path[2:]
+    if path.startswith("/") and not path.startswith("//"):
+        path = path[1:]
+    return path or ":memory:"
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Database embedded per simulazioni e sviluppo locale, selezionato con
+    DATABASE_URL=sqlite:///percorso.db.
+
+    - una connessione per processo condivisa dai thread (serializzata da un lock):
+      in SQLite c'è comunque un solo writer alla volta
+    - WAL + synchronous=NORMAL: i lettori (dashboard) non bloccano le scritture
+      e il commit non attende l'fsync del database
+    - ogni write_records è una transazione con executemany per tabella: con la
+      coda di db_utils (log_bot_operation_async) migliaia di operazioni al secondo
+
+    Partizionamento e archiviazione non sono supportati: la retention cancella le righe.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}")
+
+    @classmethod
+    def from_url(cls, url: str) -> "SQLiteBackend":
+        return cls(sqlite_path(url))
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE: il lock di scrittura si prende subito, niente upgrade falliti a metà transazione."""
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                yield cur
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            cur.execute("COMMIT")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            cur = self._conn.execute(sql, params)
+            columns = [desc[0] for desc in cur.description]
+            rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+        for row in rows:
+            row["created_at"] = _from_ts(row.get("created_at"))
+        return rows
+
+    # ---------------------
+    # schema
+    # ---------------------
+    def init_db(self, partitioned: bool = False) -> None:
+        if partitioned:
+            print("[DB] SQLite: partizionamento non supportato, tabelle normali")
+        with self._lock:
+            self._conn.executescript(SQLITE_SCHEMA_SQL)
+            empty = self._conn.execute(
+                "SELECT NOT EXISTS (SELECT 1 FROM pnl_rollups) AND NOT EXISTS (SELECT 1 FROM balance_rollups)"
+            ).fetchone()[0]
+        if empty:
+            self.rebuild_rollups()
+
+    # ---------------------
+    # scritture
+    # ---------------------
+    def _next_ids(self, cur, table: str, count: int) -> List[int]:
+        # id assegnati nella transazione (BEGIN IMMEDIATE = nessun altro writer)
+        cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+        first = cur.fetchone()[0] + 1
+        return list(range(first, first + count))
+
+    def _insert_operations(self, cur, records: List[Dict[str, Any]]) -> List[int]:
+        context_ids = self._next_ids(cur, "ai_contexts", len(records))
+        prompts = [_split_prompt(r) for r in records]
+        now = _ts(datetime.now(timezone.utc))
+        templates = {h: t for h, t, _, _ in prompts if h}
+        if templates:
+            cur.executemany(
+                "INSERT OR IGNORE INTO prompt_templates (hash, created_at, template) VALUES (?, ?, ?)",
+                [(h, now, t) for h, t in templates.items()],
+            )
+        cur.executemany(
+            "INSERT INTO ai_contexts (id, created_at, system_prompt, template_hash, prompt_args) VALUES (?, ?, ?, ?, ?)",
+            [
+                (cid, _ts(r["created_at"]), prompt, h, packed)
+                for cid, r, (h, _, packed, prompt) in zip(context_ids, records, prompts)
+            ],
+        )
+
+        contexts = _context_rows(context_ids, records)
+        cur.executemany(
+            """
+            INSERT INTO indicators_contexts
+            (context_id, ticker, ts, price, ema20, macd, rsi_7, volume_bid, volume_ask,
+             open_interest_latest, funding_rate, raw)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            _adapt_rows(contexts["indicators_contexts"]),
+        )
+        cur.executemany("INSERT INTO news_contexts (context_id, news_text) VALUES (?, ?)", contexts["news_contexts"])
+        cur.executemany(
+            "INSERT INTO sentiment_contexts (context_id, value, classification, sentiment_timestamp, raw) VALUES (?, ?, ?, ?, ?)",
+            _adapt_rows(contexts["sentiment_contexts"]),
+        )
+        cur.executemany(
+            "INSERT INTO forecasts_contexts (context_id, ticker, timeframe, prediction, forecast_timestamp, raw) VALUES (?, ?, ?, ?, ?, ?)",
+            _adapt_rows(contexts["forecasts_contexts"]),
+        )
+
+        rows = _operation_rows(context_ids, records)
+        op_ids = self._next_ids(cur, "bot_operations", len(rows))
+        cur.executemany(
+            """
+            INSERT INTO bot_operations
+            (id, context_id, created_at, operation, symbol, direction, target_portion_of_balance, leverage, raw_payload, agent, pnl)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(op_id, row[0], _ts(row[1]), *(_adapt(v) for v in row[2:])) for op_id, row in zip(op_ids, rows)],
+        )
+        cur.executemany(
+            PNL_ROLLUP_UPSERT_SQL,
+            _adapt_rows(_pnl_rollup_rows([(row[1], row[8], row[2], row[9]) for row in rows])),
+        )
+        return op_ids
+
+    def write_records(self, records: List[Dict[str, Any]]) -> List[int]:
+        operations = [r for r in records if r["kind"] == "operation"]
+        errors = [r for r in records if r["kind"] == "error"]
+        op_ids: List[int] = []
+        with self._transaction() as cur:
+            if operations:
+                op_ids = self._insert_operations(cur, operations)
+            if errors:
+                cur.executemany(
+                    "INSERT INTO errors (created_at, error_type, error_message, traceback, context, source) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(_ts(row[0]), *(_adapt(v) for v in row[1:])) for row in _error_rows(errors)],
+                )
+        return op_ids
+
+    def log_account_status(self, account_status: Dict[str, Any], skip_unchanged: bool = False) -> Optional[int]:
+        raw = _dumps(account_status)
+        balance = _finite(account_status.get("balance_usd"))
+        with self._transaction() as cur:
+            if skip_unchanged:
+                cur.execute("SELECT id, raw_payload FROM account_snapshots ORDER BY created_at DESC, id DESC LIMIT 1")
+                last = cur.fetchone()
+                # confronto sul JSON decodificato, come l'uguaglianza tra JSONB
+                if last is not None and json.loads(last[1]) == json.loads(raw):
+                    print(f"[DB] Stato account invariato, snapshot {last[0]} non duplicato")
+                    return last[0]
+            now = datetime.now(timezone.utc)
+            cur.execute(
+                "INSERT INTO account_snapshots (created_at, balance_usd, raw_payload) VALUES (?, ?, ?)",
+                (_ts(now), balance, raw),
+            )
+            snapshot_id = cur.lastrowid
+            cur.executemany(
+                """
+                INSERT INTO open_positions
+                (snapshot_id, symbol, side, size, entry_price, mark_price, pnl_usd, leverage, raw_payload)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (snapshot_id, p["symbol"], p["side"], p["size"], p["entry_price"], p["mark_price"],
+                     p["pnl_usd"], p["leverage"], _dumps(p["raw"]))
+                    for p in _position_records(account_status)
+                ],
+            )
+            cur.executemany(
+                BALANCE_ROLLUP_UPSERT_SQL,
+                [
+                    (bucket, _ts(_bucket_start(now, bucket)), balance, balance, balance, balance, _ts(now), 1)
+                    for bucket in ROLLUP_BUCKETS
+                ],
+            )
+        return snapshot_id
+
+    def rebuild_rollups(self) -> None:
+        """Come REBUILD_ROLLUPS_SQL, aggregando in Python con gli stessi helper delle scritture."""
+        with self._transaction() as cur:
+            cur.execute("DELETE FROM pnl_rollups")
+            cur.execute("DELETE FROM balance_rollups")
+            cur.execute("SELECT created_at, agent, operation, pnl FROM bot_operations WHERE agent IS NOT NULL")
+            cur.executemany(PNL_ROLLUP_UPSERT_SQL, _adapt_rows(_pnl_rollup_rows(cur.fetchall())))
+
+            balances: Dict[tuple, list] = {}
+            cur.execute("SELECT created_at, balance_usd FROM account_snapshots ORDER BY created_at, id")
+            for created_at, balance in cur.fetchall():
+                for bucket in ROLLUP_BUCKETS:
+                    key = (bucket, _ts(_bucket_start(_from_ts(created_at), bucket)))
+                    entry = balances.get(key)
+                    if entry is None:
+                        balances[key] = [balance, balance, balance, balance, created_at, 1]
+                    else:
+                        entry[1:6] = [balance, min(entry[2], balance), max(entry[3], balance), created_at, entry[5] + 1]
+            cur.executemany(
+                BALANCE_ROLLUP_UPSERT_SQL,
+                [(bucket, start, *entry) for (bucket, start), entry in sorted(balances.items())],
+            )
+
+    # ---------------------
+    # letture
+    # ---------------------
+    def get_recent_logs(self, limit: int) -> List[Dict[str, Any]]:
+        return self._query(
+            """
+            SELECT created_at, operation, symbol, direction, json_extract(raw_payload, '$.reason') AS reason
+            FROM bot_operations
+            ORDER BY created_at DESC
+            LIMIT ?
+            """,
+            (limit,),
+        )
+
+    def get_grid_alerts(self, limit: int) -> List[Dict[str, Any]]:
+        return self._query(
+            """
+            SELECT created_at, symbol, json_extract(raw_payload, '$.reason') AS reason
+            FROM bot_operations
+            WHERE operation = 'GRID_ALERT'
+            ORDER BY created_at DESC
+            LIMIT ?
+            """,
+            (limit,),
+        )
+
+    def get_logs_since(self, cursor: Optional[tuple], limit: int, lookback: float = 0.0) -> List[Dict[str, Any]]:
+        columns = "id, created_at, operation, symbol, direction, json_extract(raw_payload, '$.reason') AS reason"
+        if cursor is None:
+            rows = self._query(
+                f"SELECT {columns} FROM bot_operations ORDER BY created_at DESC, id DESC LIMIT ?", (limit,)
+            )
+            return rows[::-1]
+        return self._query(
+            f"""
+            SELECT {columns} FROM bot_operations
+            WHERE (created_at, id) > (?, ?)
+               OR (created_at > ? AND id > ?)
+            ORDER BY created_at, id
+            LIMIT ?
+            """,
+            (_ts(cursor[0]), cursor[1], _ts(cursor[0] - timedelta(seconds=lookback)), cursor[1], limit),
+        )
+
+    def get_system_prompt(self, context_id: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT c.system_prompt, t.template, c.prompt_args
+                FROM ai_contexts c
+                LEFT JOIN prompt_templates t ON t.hash = c.template_hash
+                WHERE c.id = ?
+                """,
+                (context_id,),
+            ).fetchone()
+        return _stored_prompt(row)
+
+    # ---------------------
+    # manutenzione
+    # ---------------------
+    def maintain(self) -> Dict[str, List[str]]:
+        """Retention per righe (RETENTION_DAYS, ROLLUP_RETENTION_DAYS); le posizioni seguono gli snapshot via FK."""
+        now = datetime.now(timezone.utc)
+        deleted: Dict[str, int] = {}
+        with self._transaction() as cur:
+            for table, days in RETENTION_DAYS.items():
+                if days and days > 0:
+                    cutoff = _ts(now - timedelta(days=days))
+                    cur.execute(f"DELETE FROM {table} WHERE created_at < ?", (cutoff,))
+                    deleted[table] = cur.rowcount
+                    if table == "bot_operations":
+                        cur.execute("DELETE FROM ai_contexts WHERE created_at < ?", (cutoff,))
+            for bucket, days in ROLLUP_RETENTION_DAYS.items():
+                if days > 0:
+                    for table in ("pnl_rollups", "balance_rollups"):
+                        cur.execute(
+                            f"DELETE FROM {table} WHERE bucket = ? AND bucket_start < ?",
+                            (bucket, _ts(now - timedelta(days=days))),
+                        )
+        for table, count in deleted.items():
+            if count:
+                print(f"[DB] Retention {table}: eliminate {count} righe")
+        return {}
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.execute("PRAGMA optimize")
+            finally:
+                self._conn.close()
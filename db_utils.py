@@ -1,13 +1,26 @@
 from __future__ import annotations
+import atexit
+import bisect
+import gzip
+import hashlib
 import json
 import os
+import re
+import select
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
 from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
 import traceback
+import zlib
 import psycopg2
-from psycopg2.extras import Json
+import psycopg2.extensions
+import psycopg2.pool
+from psycopg2.extras import Json, execute_values
 from dotenv import load_dotenv
 
 # Import opzionale di numpy
@@ -26,29 +39,302 @@ def get_db_config() -> DBConfig:
     dsn = os.getenv("DATABASE_URL")
     if not dsn:
         # Fallback default or raise
-        raise RuntimeError("DATABASE_URL not set.")
+        raise RuntimeError("DATABASE_URL not set (postgresql://... oppure sqlite:///percorso.db per un database locale).")
     return DBConfig(dsn=dsn)
 
+# =====================
+# CONNECTION POOL
+# =====================
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))        # attesa massima per una connessione (s)
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "1800"))      # età massima di una connessione (s)
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "60"))  # SELECT 1 se inattiva da più di (s)
+
+
+class PoolTimeoutError(RuntimeError):
+    """Nessuna connessione libera nel pool entro DB_POOL_TIMEOUT."""
+
+
+class _ConnectionPool:
+    """
+    ThreadedConnectionPool di psycopg2 con:
+      - attesa bloccante (semaforo) invece di PoolError quando è pieno
+      - health check al checkout: connessioni chiuse, troppo vecchie o che non
+        rispondono a SELECT 1 dopo un periodo di inattività vengono ricreate
+      - rollback di eventuali transazioni lasciate aperte prima del rilascio
+    """
+
+    def __init__(self, dsn: str, minconn: int, maxconn: int):
+        self.pid = os.getpid()
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, dsn)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._created: Dict[int, float] = {}
+        self._last_used: Dict[int, float] = {}
+        self.stats = {"acquired": 0, "recycled": 0, "broken": 0, "wait_s_total": 0.0, "wait_s_max": 0.0}
+
+    def _healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        key = id(conn)
+        if now - self._created.setdefault(key, now) > DB_POOL_RECYCLE:
+            return False
+        if now - self._last_used.get(key, now) > DB_POOL_PING_AFTER:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    def _discard(self, conn) -> None:
+        self._created.pop(id(conn), None)
+        self._last_used.pop(id(conn), None)
+        try:
+            self._pool.putconn(conn, close=True)
+        except Exception:
+            pass
+
+    def acquire(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise PoolTimeoutError(f"DB pool esaurito: nessuna connessione libera entro {DB_POOL_TIMEOUT}s")
+        try:
+            conn = self._pool.getconn()
+            while not self._healthy(conn):
+                self.stats["recycled"] += 1
+                self._discard(conn)
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        wait_s = time.monotonic() - started
+        self.stats["acquired"] += 1
+        self.stats["wait_s_total"] += wait_s
+        self.stats["wait_s_max"] = max(self.stats["wait_s_max"], wait_s)
+        if _pool_metrics_hook is not None:
+            try:
+                _pool_metrics_hook({"event": "acquire", "wait_s": wait_s, **self.stats})
+            except Exception:
+                pass
+        return conn
+
+    def release(self, conn, broken: bool = False) -> None:
+        try:
+            if not broken and not conn.closed:
+                # la prossima richiesta deve trovare la connessione pulita
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            if broken or conn.closed:
+                self.stats["broken"] += 1
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        except Exception:
+            self.stats["broken"] += 1
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        try:
+            self._pool.closeall()
+        except Exception:
+            pass
+
+
+_pool: Optional[_ConnectionPool] = None
+_pool_guard = threading.Lock()
+_pool_metrics_hook: Optional[Callable[[Dict[str, Any]], None]] = None
+
+
+def set_pool_metrics_hook(hook: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+    """Registra una callback chiamata ad ogni checkout con il tempo di attesa (wait_s) e le statistiche del pool."""
+    global _pool_metrics_hook
+    _pool_metrics_hook = hook
+
+
+def get_pool() -> _ConnectionPool:
+    """Pool di processo, creato al primo uso. Dopo un fork il figlio ne crea uno proprio."""
+    global _pool
+    with _pool_guard:
+        if _pool is None or _pool.pid != os.getpid():
+            # le connessioni ereditate dal padre non vanno né usate né chiuse
+            _pool = _ConnectionPool(get_db_config().dsn, DB_POOL_MIN, DB_POOL_MAX)
+        return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_guard:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.close()
+        _pool = None
+
+
+atexit.register(close_pool)
+
+
 @contextmanager
 def get_connection():
-    config = get_db_config()
-    conn = psycopg2.connect(config.dsn)
+    pool = get_pool()
+    conn = pool.acquire()
+    broken = False
     try:
         yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
     finally:
-        conn.close()
+        pool.release(conn, broken=broken)
+
+# =====================
+# STORAGE BACKEND
+# =====================
+class StorageBackend(ABC):
+    """
+    Operazioni di db_utils che dipendono dal database. Le funzioni pubbliche
+    del modulo delegano al backend scelto dallo schema di DATABASE_URL
+    (get_backend): Postgres di default, sqlite:///file.db per SQLite embedded.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.pid = os.getpid()
+
+    @abstractmethod
+    def init_db(self, partitioned: bool = False) -> None:
+        ...
+
+    @abstractmethod
+    def write_records(self, records: List[Dict[str, Any]]) -> List[int]:
+        """Operazioni ed errori (vedi _operation_record/_error_record) in una transazione; id delle operazioni."""
+
+    @abstractmethod
+    def log_account_status(self, account_status: Dict[str, Any], skip_unchanged: bool = False) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def get_recent_logs(self, limit: int) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_grid_alerts(self, limit: int) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_logs_since(self, cursor: Optional[tuple], limit: int, lookback: float = 0.0) -> List[Dict[str, Any]]:
+        ...
+
+    def listen_operations(self) -> Optional["_OperationListener"]:
+        """Listener delle nuove operazioni, None se il backend non le notifica (si fa polling)."""
+        return None
+
+    @abstractmethod
+    def get_system_prompt(self, context_id: int) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def rebuild_rollups(self) -> None:
+        ...
+
+    def maintain(self) -> Dict[str, List[str]]:
+        """Retention (e partizioni dove previste); tabelle -> partizioni eliminate."""
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class PostgresBackend(StorageBackend):
+    name = "postgres"
+
+    def init_db(self, partitioned: bool = False) -> None:
+        _pg_init_db(partitioned)
+
+    def write_records(self, records: List[Dict[str, Any]]) -> List[int]:
+        return _pg_write_records(records)
+
+    def log_account_status(self, account_status: Dict[str, Any], skip_unchanged: bool = False) -> Optional[int]:
+        return _pg_log_account_status(account_status, skip_unchanged)
+
+    def get_recent_logs(self, limit: int) -> List[Dict[str, Any]]:
+        return _pg_get_recent_logs(limit)
+
+    def get_grid_alerts(self, limit: int) -> List[Dict[str, Any]]:
+        return _pg_get_grid_alerts(limit)
+
+    def get_logs_since(self, cursor: Optional[tuple], limit: int, lookback: float = 0.0) -> List[Dict[str, Any]]:
+        return _pg_get_logs_since(cursor, limit, lookback)
+
+    def listen_operations(self) -> Optional["_OperationListener"]:
+        return _OperationListener(DB_NOTIFY_CHANNEL) if DB_NOTIFY_CHANNEL else None
+
+    def get_system_prompt(self, context_id: int) -> Optional[str]:
+        return _pg_get_system_prompt(context_id)
+
+    def rebuild_rollups(self) -> None:
+        _pg_rebuild_rollups()
+
+    def maintain(self) -> Dict[str, List[str]]:
+        return maintain_partitions()
+
+    def close(self) -> None:
+        close_pool()
+
+
+_backend: Optional[StorageBackend] = None
+_backend_guard = threading.Lock()
+
+
+def get_backend() -> StorageBackend:
+    """Backend di processo: sqlite:... -> SQLite embedded, altrimenti Postgres. Uno nuovo dopo un fork."""
+    global _backend
+    with _backend_guard:
+        if _backend is None or _backend.pid != os.getpid():
+            url = get_db_config().dsn
+            if url.startswith("sqlite:"):
+                from db_sqlite import SQLiteBackend
+
+                _backend = SQLiteBackend.from_url(url)
+            else:
+                _backend = PostgresBackend()
+        return _backend
+
+
+def _close_backend() -> None:
+    global _backend
+    with _backend_guard:
+        if _backend is not None and _backend.pid == os.getpid():
+            _backend.close()
+        _backend = None
+
+
+# registrato prima del log writer: atexit esegue in ordine inverso, quindi
+# la coda viene svuotata con il backend ancora aperto
+atexit.register(_close_backend)
+
 
 # =====================
 # SCHEMA & INIT
 # =====================
-SCHEMA_SQL = """
+# Una voce per tabella, in ordine di dipendenza (FK): init_db può sostituire
+# le singole definizioni (es. versione partizionata)
+SCHEMA_TABLES = {
+    "account_snapshots": """
 CREATE TABLE IF NOT EXISTS account_snapshots (
     id BIGSERIAL PRIMARY KEY,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     balance_usd NUMERIC(20, 8) NOT NULL,
     raw_payload JSONB NOT NULL
 );
-
+""",
+    "open_positions": """
 CREATE TABLE IF NOT EXISTS open_positions (
     id BIGSERIAL PRIMARY KEY,
     snapshot_id BIGINT NOT NULL REFERENCES account_snapshots(id) ON DELETE CASCADE,
@@ -61,13 +347,24 @@ CREATE TABLE IF NOT EXISTS open_positions (
     leverage TEXT,
     raw_payload JSONB NOT NULL
 );
-
+""",
+    "prompt_templates": """
+CREATE TABLE IF NOT EXISTS prompt_templates (
+    hash TEXT PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    template TEXT NOT NULL
+);
+""",
+    "ai_contexts": """
 CREATE TABLE IF NOT EXISTS ai_contexts (
     id BIGSERIAL PRIMARY KEY,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-    system_prompt TEXT
+    system_prompt TEXT,
+    template_hash TEXT REFERENCES prompt_templates(hash),
+    prompt_args BYTEA
 );
-
+""",
+    "indicators_contexts": """
 CREATE TABLE IF NOT EXISTS indicators_contexts (
     id BIGSERIAL PRIMARY KEY,
     context_id BIGINT NOT NULL REFERENCES ai_contexts(id) ON DELETE CASCADE,
@@ -83,13 +380,15 @@ CREATE TABLE IF NOT EXISTS indicators_contexts (
     funding_rate NUMERIC(20, 8),
     raw JSONB
 );
-
+""",
+    "news_contexts": """
 CREATE TABLE IF NOT EXISTS news_contexts (
     id BIGSERIAL PRIMARY KEY,
     context_id BIGINT NOT NULL REFERENCES ai_contexts(id) ON DELETE CASCADE,
     news_text TEXT NOT NULL
 );
-
+""",
+    "sentiment_contexts": """
 CREATE TABLE IF NOT EXISTS sentiment_contexts (
     id BIGSERIAL PRIMARY KEY,
     context_id BIGINT NOT NULL REFERENCES ai_contexts(id) ON DELETE CASCADE,
@@ -98,7 +397,8 @@ CREATE TABLE IF NOT EXISTS sentiment_contexts (
     sentiment_timestamp BIGINT,
     raw JSONB
 );
-
+""",
+    "forecasts_contexts": """
 CREATE TABLE IF NOT EXISTS forecasts_contexts (
     id BIGSERIAL PRIMARY KEY,
     context_id BIGINT NOT NULL REFERENCES ai_contexts(id) ON DELETE CASCADE,
@@ -108,7 +408,8 @@ CREATE TABLE IF NOT EXISTS forecasts_contexts (
     forecast_timestamp BIGINT,
     raw JSONB
 );
-
+""",
+    "bot_operations": """
 CREATE TABLE IF NOT EXISTS bot_operations (
     id BIGSERIAL PRIMARY KEY,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
@@ -118,9 +419,12 @@ CREATE TABLE IF NOT EXISTS bot_operations (
     direction TEXT,
     target_portion_of_balance NUMERIC(10, 4),
     leverage NUMERIC(10, 4),
-    raw_payload JSONB NOT NULL
+    raw_payload JSONB NOT NULL,
+    agent TEXT,
+    pnl NUMERIC(30, 10)
 );
-
+""",
+    "errors": """
 CREATE TABLE IF NOT EXISTS errors (
     id BIGSERIAL PRIMARY KEY,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
@@ -130,14 +434,396 @@ CREATE TABLE IF NOT EXISTS errors (
     context JSONB,
     source TEXT
 );
+""",
+    "pnl_rollups": """
+CREATE TABLE IF NOT EXISTS pnl_rollups (
+    bucket TEXT NOT NULL,
+    bucket_start TIMESTAMPTZ NOT NULL,
+    agent TEXT NOT NULL,
+    realized_pnl NUMERIC(30, 10) NOT NULL DEFAULT 0,
+    closes INTEGER NOT NULL DEFAULT 0,
+    operations INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, agent, bucket_start)
+);
+""",
+    "balance_rollups": """
+CREATE TABLE IF NOT EXISTS balance_rollups (
+    bucket TEXT NOT NULL,
+    bucket_start TIMESTAMPTZ NOT NULL,
+    balance_open NUMERIC(20, 8) NOT NULL,
+    balance_close NUMERIC(20, 8) NOT NULL,
+    balance_min NUMERIC(20, 8) NOT NULL,
+    balance_max NUMERIC(20, 8) NOT NULL,
+    last_at TIMESTAMPTZ NOT NULL,
+    samples INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, bucket_start)
+);
+""",
+}
+
+SCHEMA_SQL = "\n".join(SCHEMA_TABLES.values())
+
+# Agente delle operazioni registrate prima della colonna agent (stessa
+# attribuzione per simbolo che usava la dashboard); il resto è di Bruce
+LEGACY_AGENT_BY_SYMBOL = {"SUI": "Barry", "AVAX": "Wally", "DOGE": "Harrison"}
+DEFAULT_AGENT = "Bruce"
+
+_NUMERIC_RE = r"^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$"
+
+# Migrazioni idempotenti per i database creati con uno schema precedente
+MIGRATIONS_SQL = f"""
+ALTER TABLE bot_operations ADD COLUMN IF NOT EXISTS agent TEXT;
+ALTER TABLE bot_operations ADD COLUMN IF NOT EXISTS pnl NUMERIC(30, 10);
+ALTER TABLE ai_contexts ADD COLUMN IF NOT EXISTS template_hash TEXT REFERENCES prompt_templates(hash);
+ALTER TABLE ai_contexts ADD COLUMN IF NOT EXISTS prompt_args BYTEA;
+
+UPDATE bot_operations SET
+    agent = COALESCE(
+        NULLIF(raw_payload->>'agent', ''),
+        CASE symbol {" ".join(f"WHEN '{s}' THEN '{a}'" for s, a in LEGACY_AGENT_BY_SYMBOL.items())} ELSE '{DEFAULT_AGENT}' END
+    ),
+    pnl = CASE
+        WHEN raw_payload->>'pnl' ~ '{_NUMERIC_RE}' THEN (raw_payload->>'pnl')::numeric
+        WHEN raw_payload->>'realized_pnl' ~ '{_NUMERIC_RE}' THEN (raw_payload->>'realized_pnl')::numeric
+    END
+WHERE agent IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_bot_operations_agent_created
+    ON bot_operations (agent, created_at) INCLUDE (operation, pnl);
+CREATE INDEX IF NOT EXISTS idx_bot_operations_operation_created
+    ON bot_operations (operation, created_at);
+CREATE INDEX IF NOT EXISTS idx_open_positions_snapshot
+    ON open_positions (snapshot_id);
+-- (created_at, id): chiave del cursore di get_logs_since, copre anche le ricerche per created_at
+CREATE INDEX IF NOT EXISTS idx_bot_operations_created_id ON bot_operations (created_at, id);
+DROP INDEX IF EXISTS idx_bot_operations_created;
+CREATE INDEX IF NOT EXISTS idx_errors_created ON errors (created_at);
+CREATE INDEX IF NOT EXISTS idx_account_snapshots_created ON account_snapshots (created_at);
+
+-- FK verso ai_contexts: senza indice ogni DELETE a cascata (retention) scansiona le tabelle
+CREATE INDEX IF NOT EXISTS idx_ai_contexts_created ON ai_contexts (created_at);
+CREATE INDEX IF NOT EXISTS idx_bot_operations_context ON bot_operations (context_id);
+CREATE INDEX IF NOT EXISTS idx_indicators_contexts_context ON indicators_contexts (context_id);
+CREATE INDEX IF NOT EXISTS idx_news_contexts_context ON news_contexts (context_id);
+CREATE INDEX IF NOT EXISTS idx_sentiment_contexts_context ON sentiment_contexts (context_id);
+CREATE INDEX IF NOT EXISTS idx_forecasts_contexts_context ON forecasts_contexts (context_id);
 """
 
-def init_db() -> None:
+
+# =====================
+# PARTITIONING & RETENTION
+# =====================
+DB_PARTITIONED = os.getenv("DB_PARTITIONED", "0") == "1"                # partizionamento per created_at
+DB_PARTITION_INTERVAL = os.getenv("DB_PARTITION_INTERVAL", "day")       # "day" | "month"
+DB_PARTITIONS_AHEAD = int(os.getenv("DB_PARTITIONS_AHEAD", "7"))        # partizioni future create in anticipo
+DB_ARCHIVE_DIR = os.getenv("DB_ARCHIVE_DIR", "")                        # se impostata: CSV gzip delle partizioni prima del drop
+DB_MAINTENANCE_INTERVAL = float(os.getenv("DB_MAINTENANCE_INTERVAL", "3600"))  # (s) tra due run_maintenance_if_due
+
+# giorni di storico conservati (0 = senza limite)
+RETENTION_DAYS = {
+    "bot_operations": int(os.getenv("DB_RETENTION_BOT_OPERATIONS_DAYS", "90")),
+    "errors": int(os.getenv("DB_RETENTION_ERRORS_DAYS", "30")),
+    "account_snapshots": int(os.getenv("DB_RETENTION_ACCOUNT_SNAPSHOTS_DAYS", "365")),
+}
+
+# giorni conservati per granularità dei rollup (0 = senza limite)
+ROLLUP_RETENTION_DAYS = {"minute": 7, "hour": 180, "day": 0}
+
+# La chiave primaria di una tabella partizionata deve includere created_at,
+# quindi account_snapshots non può più essere referenziata da open_positions:
+# le posizioni orfane vengono rimosse da apply_retention
+PARTITIONED_SCHEMA_TABLES = {
+    "account_snapshots": """
+CREATE TABLE IF NOT EXISTS account_snapshots (
+    id BIGSERIAL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    balance_usd NUMERIC(20, 8) NOT NULL,
+    raw_payload JSONB NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+""",
+    "open_positions": """
+CREATE TABLE IF NOT EXISTS open_positions (
+    id BIGSERIAL PRIMARY KEY,
+    snapshot_id BIGINT NOT NULL,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    size NUMERIC(30, 10) NOT NULL,
+    entry_price NUMERIC(30, 10),
+    mark_price NUMERIC(30, 10),
+    pnl_usd NUMERIC(30, 10),
+    leverage TEXT,
+    raw_payload JSONB NOT NULL
+);
+""",
+    "bot_operations": """
+CREATE TABLE IF NOT EXISTS bot_operations (
+    id BIGSERIAL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    context_id BIGINT REFERENCES ai_contexts(id) ON DELETE CASCADE,
+    operation TEXT NOT NULL,
+    symbol TEXT,
+    direction TEXT,
+    target_portion_of_balance NUMERIC(10, 4),
+    leverage NUMERIC(10, 4),
+    raw_payload JSONB NOT NULL,
+    agent TEXT,
+    pnl NUMERIC(30, 10),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+""",
+    "errors": """
+CREATE TABLE IF NOT EXISTS errors (
+    id BIGSERIAL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    error_type TEXT NOT NULL,
+    error_message TEXT,
+    traceback TEXT,
+    context JSONB,
+    source TEXT,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+""",
+}
+
+PARTITIONED_TABLES = ("account_snapshots", "bot_operations", "errors")
+
+
+def _period_start(ts: datetime, interval: str = DB_PARTITION_INTERVAL) -> datetime:
+    ts = ts.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(day=1) if interval == "month" else ts
+
+
+def _next_period(start: datetime, interval: str = DB_PARTITION_INTERVAL) -> datetime:
+    if interval == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _partition_name(table: str, start: datetime, interval: str = DB_PARTITION_INTERVAL) -> str:
+    return f"{table}_p{start:%Y%m}" if interval == "month" else f"{table}_p{start:%Y%m%d}"
+
+
+def _partition_range(table: str, name: str) -> Optional[tuple]:
+    """(inizio, fine) di una partizione dal nome (_pYYYYMMDD o _pYYYYMM); None per la default."""
+    suffix = name[len(table) + 2:] if name.startswith(f"{table}_p") else ""
+    fmt, interval = {8: ("%Y%m%d", "day"), 6: ("%Y%m", "month")}.get(len(suffix), (None, None))
+    if fmt is None or not suffix.isdigit():
+        return None
+    start = datetime.strptime(suffix, fmt).replace(tzinfo=timezone.utc)
+    return start, _next_period(start, interval)
+
+
+def _relkind(cur, table: str) -> Optional[str]:
+    """'r' tabella normale, 'p' partizionata, None se non esiste."""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _partitions(cur, table: str) -> List[str]:
+    cur.execute(
+        """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+        """,
+        (table,),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def ensure_partitions(cur, table: str, first: Optional[datetime] = None, ahead: int = DB_PARTITIONS_AHEAD) -> None:
+    """
+    Partizioni da `first` (default: periodo corrente) fino a `ahead` periodi
+    nel futuro, più la partizione default per le righe fuori intervallo.
+    La manutenzione deve girare prima che si esauriscano le partizioni future:
+    una nuova partizione non può coprire righe già finite nella default.
+    """
+    start = _period_start(first or datetime.now(timezone.utc))
+    end = _period_start(datetime.now(timezone.utc))
+    for _ in range(ahead):
+        end = _next_period(end)
+    while start <= end:
+        stop = _next_period(start)
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {_partition_name(table, start)} PARTITION OF {table} "
+            "FOR VALUES FROM (%s) TO (%s)",
+            (start, stop),
+        )
+        start = stop
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+
+
+def _migrate_to_partitioned(cur, table: str) -> None:
+    """Ricrea una tabella esistente come partizionata copiando le righe (stessi id)."""
+    legacy = f"{table}_unpartitioned"
+    print(f"[DB] Migrazione di {table} a tabella partizionata...")
+    cur.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    # la nuova tabella crea la propria sequenza {table}_id_seq
+    cur.execute(f"ALTER SEQUENCE IF EXISTS {table}_id_seq RENAME TO {legacy}_id_seq")
+    cur.execute(f"ALTER INDEX IF EXISTS {table}_pkey RENAME TO {legacy}_pkey")
+    cur.execute(PARTITIONED_SCHEMA_TABLES[table])
+
+    cur.execute(f"SELECT min(created_at), max(id) FROM {legacy}")
+    first, max_id = cur.fetchone()
+    ensure_partitions(cur, table, first=first)
+    cur.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position
+        """,
+        (legacy,),
+    )
+    columns = ", ".join(row[0] for row in cur.fetchall())
+    cur.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy}")
+    if max_id is not None:
+        cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), %s)", (max_id,))
+    # CASCADE rimuove anche la FK di open_positions verso la vecchia account_snapshots
+    cur.execute(f"DROP TABLE {legacy} CASCADE")
+
+
+def _archive_partition(cur, partition: str, archive_dir: str) -> str:
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{partition}.csv.gz")
+    with gzip.open(path, "wt", newline="") as f:
+        cur.copy_expert(f"COPY {partition} TO STDOUT WITH CSV HEADER", f)
+    return path
+
+
+def apply_retention(now: Optional[datetime] = None, archive_dir: Optional[str] = DB_ARCHIVE_DIR) -> Dict[str, List[str]]:
+    """
+    Stacca ed elimina le partizioni interamente più vecchie di RETENTION_DAYS
+    (salvandole in archive_dir se impostata), poi rimuove i contesti AI e le
+    posizioni aperte rimasti senza riga di riferimento e i rollup scaduti
+    (ROLLUP_RETENTION_DAYS).
+    Ogni partizione è una transazione separata. Restituisce le partizioni eliminate per tabella.
+    """
+    now = now or datetime.now(timezone.utc)
+    dropped: Dict[str, List[str]] = {}
+    for table in PARTITIONED_TABLES:
+        days = RETENTION_DAYS.get(table) or 0
+        if days <= 0:
+            continue
+        cutoff = now - timedelta(days=days)
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                if _relkind(cur, table) != "p":
+                    continue
+                expired = [
+                    name for name in _partitions(cur, table)
+                    if (bounds := _partition_range(table, name)) is not None and bounds[1] <= cutoff
+                ]
+            conn.rollback()
+
+            for name in expired:
+                with conn.cursor() as cur:
+                    if archive_dir:
+                        path = _archive_partition(cur, name, archive_dir)
+                        print(f"[DB] Partizione {name} archiviata in {path}")
+                    cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                    cur.execute(f"DROP TABLE {name}")
+                conn.commit()
+                dropped.setdefault(table, []).append(name)
+
+            with conn.cursor() as cur:
+                if table == "bot_operations":
+                    # i contesti (prompt, indicatori...) hanno la stessa età delle operazioni
+                    cur.execute("DELETE FROM ai_contexts WHERE created_at < %s", (cutoff,))
+                elif table == "account_snapshots":
+                    # gli id degli snapshot sono crescenti: tutto ciò che precede il più vecchio è orfano
+                    cur.execute("DELETE FROM open_positions WHERE snapshot_id < (SELECT min(id) FROM account_snapshots)")
+            conn.commit()
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for bucket, days in ROLLUP_RETENTION_DAYS.items():
+                if days > 0:
+                    for table in ("pnl_rollups", "balance_rollups"):
+                        cur.execute(
+                            f"DELETE FROM {table} WHERE bucket = %s AND bucket_start < %s",
+                            (bucket, now - timedelta(days=days)),
+                        )
+        conn.commit()
+
+    for table, names in dropped.items():
+        print(f"[DB] Retention {table}: eliminate {len(names)} partizioni ({names[0]} .. {names[-1]})")
+    return dropped
+
+
+def maintain_partitions(archive_dir: Optional[str] = DB_ARCHIVE_DIR) -> Dict[str, List[str]]:
+    """Crea le partizioni dei prossimi periodi e applica la retention."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for table in PARTITIONED_TABLES:
+                if _relkind(cur, table) == "p":
+                    ensure_partitions(cur, table)
+        conn.commit()
+    return apply_retention(archive_dir=archive_dir)
+
+
+_last_maintenance = 0.0
+
+
+def run_maintenance_if_due() -> None:
+    """
+    Da chiamare nel loop principale: manutenzione del backend (Postgres:
+    maintain_partitions, con tabelle non partizionate pota solo i rollup) al
+    massimo ogni DB_MAINTENANCE_INTERVAL secondi.
+    """
+    global _last_maintenance
+    if time.monotonic() - _last_maintenance < DB_MAINTENANCE_INTERVAL:
+        return
+    _last_maintenance = time.monotonic()
+    try:
+        get_backend().maintain()
+    except Exception as e:
+        print(f"[DB] Manutenzione DB fallita: {e}")
+
+
+def _pg_init_db(partitioned: bool = DB_PARTITIONED) -> None:
+    """
+    Crea lo schema. partitioned=True: bot_operations, errors e account_snapshots
+    partizionate per created_at (range giornaliero o mensile); le tabelle già
+    esistenti non partizionate vengono migrate copiando i dati.
+    """
+    tables = dict(SCHEMA_TABLES)
+    if partitioned:
+        tables.update(PARTITIONED_SCHEMA_TABLES)
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(SCHEMA_SQL)
+            if partitioned:
+                for table in PARTITIONED_TABLES:
+                    if _relkind(cur, table) == "r":
+                        _migrate_to_partitioned(cur, table)
+            cur.execute("\n".join(tables.values()))
+            if partitioned:
+                for table in PARTITIONED_TABLES:
+                    ensure_partitions(cur, table)
+            cur.execute(MIGRATIONS_SQL)
+            # primo avvio con i rollup: si popolano dallo storico esistente
+            cur.execute(
+                "SELECT NOT EXISTS (SELECT 1 FROM pnl_rollups) AND NOT EXISTS (SELECT 1 FROM balance_rollups)"
+            )
+            if cur.fetchone()[0]:
+                cur.execute(REBUILD_ROLLUPS_SQL)
         conn.commit()
 
+
+def init_db(partitioned: bool = DB_PARTITIONED) -> None:
+    """
+    Crea lo schema. partitioned=True (solo Postgres): bot_operations, errors e
+    account_snapshots partizionate per created_at (range giornaliero o mensile);
+    le tabelle già esistenti non partizionate vengono migrate copiando i dati.
+    """
+    get_backend().init_db(partitioned)
+
+
+def _operation_agent(payload: Dict[str, Any], agent: Optional[str] = None) -> str:
+    return agent or payload.get("agent") or LEGACY_AGENT_BY_SYMBOL.get(payload.get("symbol"), DEFAULT_AGENT)
+
 # =====================
 # LOGGING FUNCTIONS
 # =====================
@@ -158,47 +844,884 @@ def _normalize_for_json(value: Any) -> Any:
     if num is not None: return num
     return value
 
+def _json_default(value: Any) -> Any:
+    # numpy, Decimal, datetime... nei payload degli agenti
+    if np is not None and isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _json_safe(value: Any) -> Any:
+    # JSONB non accetta NaN/Infinity (es. EMA nelle prime candele)
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if np is not None and isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and (value != value or value in (float("inf"), float("-inf"))):
+        return None
+    return value
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(_json_safe(value), default=_json_default)
+
+
+def _error_record(exc: BaseException, context: Optional[Dict], source: Optional[str]) -> Dict[str, Any]:
+    return {
+        "kind": "error",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "error_type": type(exc).__name__,
+        "error_message": str(exc),
+        # va chiamata dentro il blocco except, come log_error
+        "traceback": traceback.format_exc(),
+        "context": context,
+        "source": source,
+    }
+
+
+def _operation_record(operation_payload: Dict[str, Any], *, agent=None, system_prompt=None, prompt_template=None,
+                      prompt_args=None, indicators=None, news_text=None, sentiment=None, forecasts=None) -> Dict[str, Any]:
+    return {
+        "kind": "operation",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "payload": operation_payload,
+        "agent": _operation_agent(operation_payload, agent),
+        "system_prompt": system_prompt,
+        "prompt_template": prompt_template,
+        "prompt_args": prompt_args,
+        "indicators": indicators,
+        "news_text": news_text,
+        "sentiment": sentiment,
+        "forecasts": forecasts,
+    }
+
+
+# =====================
+# DECISION CONTEXT
+# =====================
+CONTEXT_PAGE_SIZE = 1000  # righe per statement nei bulk insert dei contesti
+
+_ORDERBOOK_VOLUME_RE = re.compile(r"Bid Vol:\s*([-\d.eE]+),\s*Ask Vol:\s*([-\d.eE]+)")
+
+
+def _as_records(value: Any) -> List[Dict[str, Any]]:
+    """Contesti come lista di dict: accetta JSON (es. df.to_json(orient='records')), dict singolo o lista."""
+    if value is None:
+        return []
+    if isinstance(value, (str, bytes)):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    if isinstance(value, dict):
+        return [value]
+    if isinstance(value, list):
+        return [v for v in value if isinstance(v, dict)]
+    return []
+
+
+def _finite(value: Any) -> Optional[float]:
+    num = _to_plain_number(value)
+    if num is None or num != num or num in (float("inf"), float("-inf")):
+        return None
+    return num
+
+
+def _to_int(value: Any) -> Optional[int]:
+    num = _finite(value)
+    return int(num) if num is not None else None
+
+
+def _to_utc(value: Any) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
+
+
+def _to_epoch_ms(value: Any) -> Optional[int]:
+    """Timestamp del forecast: epoch ms (df.to_json), datetime/pd.Timestamp o stringa ISO."""
+    ts = value.to_pydatetime() if hasattr(value, "to_pydatetime") else value
+    parsed = _to_utc(ts)
+    if parsed is not None:
+        return int(parsed.timestamp() * 1000)
+    return _to_int(value)
+
+
+def _indicator_row(context_id: int, item: Dict[str, Any]) -> tuple:
+    current = item.get("current") or {}
+    derivatives = item.get("derivatives") or {}
+    # get_orderbook_volume restituisce "Bid Vol: x, Ask Vol: y"
+    volume = item.get("volume")
+    match = _ORDERBOOK_VOLUME_RE.search(volume) if isinstance(volume, str) else None
+    return (
+        context_id,
+        item.get("ticker"),
+        _to_utc(item.get("timestamp")),
+        _finite(current.get("price")),
+        _finite(current.get("ema20")),
+        _finite(current.get("macd")),
+        _finite(current.get("rsi_7")),
+        _finite(match.group(1)) if match else None,
+        _finite(match.group(2)) if match else None,
+        _finite(derivatives.get("open_interest_latest")),
+        _finite(derivatives.get("funding_rate")),
+        item,
+    )
+
+
+def _sentiment_row(context_id: int, item: Dict[str, Any]) -> tuple:
+    # formato di sentiment.get_latest_fear_and_greed
+    return (
+        context_id,
+        _to_int(item.get("valore")),
+        item.get("classificazione"),
+        _to_int(item.get("timestamp")),
+        item,
+    )
+
+
+def _forecast_row(context_id: int, item: Dict[str, Any]) -> tuple:
+    # righe di HyperliquidForecaster.forecast_many
+    return (
+        context_id,
+        item.get("Ticker"),
+        item.get("Timeframe"),
+        _finite(item.get("Previsione")),
+        _to_epoch_ms(item.get("Timestamp Previsione")),
+        item,
+    )
+
+
+def _context_rows(context_ids: List[int], records: List[Dict[str, Any]]) -> Dict[str, List[tuple]]:
+    """
+    Righe di indicators_contexts, news_contexts, sentiment_contexts e
+    forecasts_contexts per un batch di decisioni. L'ultima colonna (raw) resta
+    il dict originale: la serializzazione dipende dal backend.
+    """
+    rows = {"indicators_contexts": [], "news_contexts": [], "sentiment_contexts": [], "forecasts_contexts": []}
+    for cid, r in zip(context_ids, records):
+        rows["indicators_contexts"].extend(_indicator_row(cid, item) for item in _as_records(r.get("indicators")))
+        if r.get("news_text"):
+            rows["news_contexts"].append((cid, str(r["news_text"])))
+        rows["sentiment_contexts"].extend(_sentiment_row(cid, item) for item in _as_records(r.get("sentiment")))
+        rows["forecasts_contexts"].extend(_forecast_row(cid, item) for item in _as_records(r.get("forecasts")))
+    return rows
+
+
+def _pg_json(value: Any) -> Optional[Json]:
+    return Json(value, dumps=_dumps) if value is not None else None
+
+
+def _insert_contexts(cur, context_ids: List[int], records: List[Dict[str, Any]]) -> None:
+    """
+    Indicatori, news, sentiment e forecast di ogni decisione nelle rispettive
+    tabelle, collegati al context_id. Un solo INSERT multi-riga per tabella
+    (a pagine di CONTEXT_PAGE_SIZE) per l'intero batch, nella transazione del chiamante.
+    """
+    rows = _context_rows(context_ids, records)
+    indicators = [(*row[:-1], _pg_json(row[-1])) for row in rows["indicators_contexts"]]
+    news = rows["news_contexts"]
+    sentiment = [(*row[:-1], _pg_json(row[-1])) for row in rows["sentiment_contexts"]]
+    forecasts = [(*row[:-1], _pg_json(row[-1])) for row in rows["forecasts_contexts"]]
+
+    if indicators:
+        execute_values(
+            cur,
+            """
+            INSERT INTO indicators_contexts
+            (context_id, ticker, ts, price, ema20, macd, rsi_7, volume_bid, volume_ask,
+             open_interest_latest, funding_rate, raw)
+            VALUES %s
+            """,
+            indicators,
+            page_size=CONTEXT_PAGE_SIZE,
+        )
+    if news:
+        execute_values(cur, "INSERT INTO news_contexts (context_id, news_text) VALUES %s", news, page_size=CONTEXT_PAGE_SIZE)
+    if sentiment:
+        execute_values(
+            cur,
+            "INSERT INTO sentiment_contexts (context_id, value, classification, sentiment_timestamp, raw) VALUES %s",
+            sentiment,
+            page_size=CONTEXT_PAGE_SIZE,
+        )
+    if forecasts:
+        execute_values(
+            cur,
+            "INSERT INTO forecasts_contexts (context_id, ticker, timeframe, prediction, forecast_timestamp, raw) VALUES %s",
+            forecasts,
+            page_size=CONTEXT_PAGE_SIZE,
+        )
+
+
+def _error_rows(records: List[Dict[str, Any]]) -> List[tuple]:
+    """(created_at, error_type, error_message, traceback, context, source); context resta un dict."""
+    return [
+        (r["created_at"], r["error_type"], r["error_message"], r["traceback"], r["context"] or None, r["source"])
+        for r in records
+    ]
+
+
+def _insert_errors(cur, records: List[Dict[str, Any]]) -> None:
+    execute_values(
+        cur,
+        "INSERT INTO errors (created_at, error_type, error_message, traceback, context, source) VALUES %s",
+        [(*row[:4], _pg_json(row[4]), row[5]) for row in _error_rows(records)],
+        page_size=len(records),
+    )
+
+
+def _operation_rows(context_ids: List[int], records: List[Dict[str, Any]]) -> List[tuple]:
+    """
+    Righe di bot_operations: (context_id, created_at, operation, symbol, direction,
+    target_portion_of_balance, leverage, raw_payload, agent, pnl); raw_payload resta un dict.
+    """
+    rows = []
+    for cid, r in zip(context_ids, records):
+        payload = r["payload"]
+        rows.append((
+            cid, r["created_at"],
+            payload.get("operation"), payload.get("symbol"), payload.get("direction"),
+            payload.get("target_portion_of_balance"), payload.get("leverage"),
+            payload,
+            r.get("agent") or _operation_agent(payload),
+            _finite(payload.get("pnl", payload.get("realized_pnl"))),
+        ))
+    return rows
+
+
+def _insert_operations(cur, records: List[Dict[str, Any]]) -> List[int]:
+    """
+    Un contesto in ai_contexts (con indicatori, news, sentiment e forecast) e una
+    riga in bot_operations per record. Restituisce gli id delle operazioni.
+    """
+    # id dei contesti riservati in anticipo: l'ordine di RETURNING su un INSERT
+    # multi-riga non è garantito, così ogni operazione punta al contesto giusto
+    cur.execute(
+        "SELECT nextval(pg_get_serial_sequence('ai_contexts', 'id')) FROM generate_series(1, %s)",
+        (len(records),),
+    )
+    context_ids = [row[0] for row in cur.fetchall()]
+
+    prompts = [_split_prompt(r) for r in records]
+    _insert_templates(cur, {h: t for h, t, _, _ in prompts if h})
+    execute_values(
+        cur,
+        "INSERT INTO ai_contexts (id, created_at, system_prompt, template_hash, prompt_args) VALUES %s",
+        [
+            (cid, r["created_at"], prompt, h, packed)
+            for cid, r, (h, _, packed, prompt) in zip(context_ids, records, prompts)
+        ],
+        page_size=len(records),
+    )
+    _insert_contexts(cur, context_ids, records)
+
+    rows = _operation_rows(context_ids, records)
+    result = execute_values(
+        cur,
+        """
+        INSERT INTO bot_operations
+        (context_id, created_at, operation, symbol, direction, target_portion_of_balance, leverage, raw_payload, agent, pnl)
+        VALUES %s
+        RETURNING id
+        """,
+        [(*row[:7], _pg_json(row[7]), *row[8:]) for row in rows],
+        page_size=len(rows),
+        fetch=True,
+    )
+    _upsert_pnl_rollups(cur, [(row[1], row[8], row[2], row[9]) for row in rows])
+    op_ids = [row[0] for row in result]
+    if DB_NOTIFY_CHANNEL:
+        _notify_operations(cur, op_ids)
+    return op_ids
+
+
+def _notify_operations(cur, op_ids: List[int]) -> None:
+    # consegnate dal server al commit (scartate con il rollback); payload max 8000 byte
+    for i in range(0, len(op_ids), NOTIFY_IDS_PER_MESSAGE):
+        cur.execute(
+            "SELECT pg_notify(%s, %s)",
+            (DB_NOTIFY_CHANNEL, ",".join(str(op_id) for op_id in op_ids[i:i + NOTIFY_IDS_PER_MESSAGE])),
+        )
+
+
+def _pg_write_records(records: List[Dict[str, Any]]) -> List[int]:
+    """Scrive un batch misto di operazioni ed errori in un'unica transazione. Restituisce gli id delle operazioni."""
+    operations = [r for r in records if r["kind"] == "operation"]
+    errors = [r for r in records if r["kind"] == "error"]
+    op_ids: List[int] = []
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            if operations:
+                op_ids = _insert_operations(cur, operations)
+            if errors:
+                _insert_errors(cur, errors)
+        conn.commit()
+    return op_ids
+
+
+def _write_records(records: List[Dict[str, Any]]) -> List[int]:
+    return get_backend().write_records(records)
+
+
 def log_error(exc: BaseException, *, context: Optional[Dict] = None, source: Optional[str] = None):
-    error_type = type(exc).__name__
-    error_message = str(exc)
-    tb_str = traceback.format_exc()
+    record = _error_record(exc, context, source)
     try:
-        with get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO errors (error_type, error_message, traceback, context, source) VALUES (%s, %s, %s, %s, %s)",
-                    (error_type, error_message, tb_str, Json(context) if context else None, source)
-                )
-            conn.commit()
+        _write_records([record])
     except Exception as e:
         print(f"CRITICAL: Failed to log error to DB: {e}")
 
-def log_bot_operation(operation_payload: Dict[str, Any], *, system_prompt=None, indicators=None, news_text=None, sentiment=None, forecasts=None) -> int:
-    operation = operation_payload.get("operation")
-    symbol = operation_payload.get("symbol")
-    direction = operation_payload.get("direction")
-    target_p = operation_payload.get("target_portion_of_balance")
-    lev = operation_payload.get("leverage")
+def log_bot_operation(operation_payload: Dict[str, Any], *, agent=None, system_prompt=None, prompt_template=None, prompt_args=None, indicators=None, news_text=None, sentiment=None, forecasts=None) -> int:
+    """
+    prompt_template/prompt_args: template del prompt di sistema e argomenti di
+    format() (lista posizionale o dict); il prompt viene salvato come template
+    deduplicato + argomenti compressi. Vedi get_system_prompt.
+    """
+    record = _operation_record(
+        operation_payload, agent=agent, system_prompt=system_prompt, prompt_template=prompt_template,
+        prompt_args=prompt_args, indicators=indicators, news_text=news_text, sentiment=sentiment,
+        forecasts=forecasts,
+    )
+    return _write_records([record])[0]
+
+# =====================
+# PROMPT TEMPLATES
+# =====================
+# Il prompt di sistema è quasi tutto il template di system_prompt.txt: il
+# template viene salvato una volta sola (chiave = sha256), per ogni decisione
+# solo gli argomenti di format(), compressi con zlib usando il template come
+# dizionario iniziale
+PROMPT_COMPRESSION_LEVEL = 9
 
+
+def _template_hash(template: str) -> str:
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()
+
+
+def _render_prompt(template: str, args: Any) -> str:
+    if isinstance(args, dict):
+        return template.format(**args)
+    return template.format(*(args or []))
+
+
+def _pack_prompt_args(template: str, args: Any) -> bytes:
+    compressor = zlib.compressobj(PROMPT_COMPRESSION_LEVEL, zdict=template.encode("utf-8"))
+    return compressor.compress(json.dumps(args).encode("utf-8")) + compressor.flush()
+
+
+def _unpack_prompt_args(template: str, packed: bytes) -> Any:
+    decompressor = zlib.decompressobj(zdict=template.encode("utf-8"))
+    return json.loads(decompressor.decompress(bytes(packed)) + decompressor.flush())
+
+
+def _split_prompt(record: Dict[str, Any]) -> tuple:
+    """
+    (template_hash, template, argomenti compressi, system_prompt) di un record.
+    Se il prompt ricostruito dagli argomenti (dopo il giro in JSON) non coincide
+    esattamente con quello passato si salva il testo intero.
+    """
+    template = record.get("prompt_template")
+    prompt = record.get("system_prompt")
+    if not template:
+        return None, None, None, prompt
+    try:
+        args = json.loads(json.dumps(record.get("prompt_args")))
+        rendered = _render_prompt(template, args)
+    except (TypeError, ValueError, IndexError, KeyError) as e:
+        print(f"[DB] Argomenti del prompt non serializzabili, salvo il testo intero: {e}")
+        return None, None, None, prompt
+    if prompt is not None and rendered != prompt:
+        return None, None, None, prompt
+    return _template_hash(template), template, _pack_prompt_args(template, args), None
+
+
+def _insert_templates(cur, templates: Dict[str, str]) -> None:
+    """Solo i template non ancora presenti viaggiano verso il DB."""
+    if not templates:
+        return
+    cur.execute("SELECT hash FROM prompt_templates WHERE hash = ANY(%s)", (list(templates),))
+    known = {row[0] for row in cur.fetchall()}
+    missing = [(h, t) for h, t in templates.items() if h not in known]
+    if missing:
+        execute_values(
+            cur,
+            "INSERT INTO prompt_templates (hash, template) VALUES %s ON CONFLICT (hash) DO NOTHING",
+            missing,
+        )
+
+
+def get_system_prompt(context_id: int) -> Optional[str]:
+    """Prompt di sistema completo di una decisione, ricostruito esattamente dal template."""
+    return get_backend().get_system_prompt(context_id)
+
+
+def _stored_prompt(row: Optional[tuple]) -> Optional[str]:
+    """(system_prompt, template, prompt_args) letti da ai_contexts -> prompt completo."""
+    if row is None:
+        return None
+    system_prompt, template, packed = row
+    if template is None or packed is None:
+        return system_prompt
+    return _render_prompt(template, _unpack_prompt_args(template, packed))
+
+
+def _pg_get_system_prompt(context_id: int) -> Optional[str]:
     with get_connection() as conn:
         with conn.cursor() as cur:
-            # 1. Context
-            cur.execute("INSERT INTO ai_contexts (system_prompt) VALUES (%s) RETURNING id", (system_prompt,))
-            context_id = cur.fetchone()[0]
-
-            # 2. Log Operation
             cur.execute(
                 """
-                INSERT INTO bot_operations 
-                (context_id, operation, symbol, direction, target_portion_of_balance, leverage, raw_payload)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
+                SELECT c.system_prompt, t.template, c.prompt_args
+                FROM ai_contexts c
+                LEFT JOIN prompt_templates t ON t.hash = c.template_hash
+                WHERE c.id = %s
                 """,
-                (context_id, operation, symbol, direction, target_p, lev, Json(operation_payload))
+                (context_id,),
             )
-            op_id = cur.fetchone()[0]
+            return _stored_prompt(cur.fetchone())
+
+
+# =====================
+# ROLLUPS (DASHBOARD)
+# =====================
+# Aggregati per minuto/ora/giorno aggiornati nella stessa transazione delle
+# scritture: la dashboard legge solo questi, non lo storico completo
+ROLLUP_BUCKETS = ("minute", "hour", "day")
+
+# il bucket in UTC, come _bucket_start
+_SQL_BUCKET_START = "date_trunc({bucket}, {ts} AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'"
+
+PNL_ROLLUP_UPSERT_SQL = """
+INSERT INTO pnl_rollups (bucket, bucket_start, agent, realized_pnl, closes, operations)
+VALUES %s
+ON CONFLICT (bucket, agent, bucket_start) DO UPDATE SET
+    realized_pnl = pnl_rollups.realized_pnl + EXCLUDED.realized_pnl,
+    closes = pnl_rollups.closes + EXCLUDED.closes,
+    operations = pnl_rollups.operations + EXCLUDED.operations
+"""
+
+BALANCE_ROLLUP_CONFLICT_SQL = """ON CONFLICT (bucket, bucket_start) DO UPDATE SET
+        balance_close = CASE WHEN EXCLUDED.last_at >= balance_rollups.last_at
+                             THEN EXCLUDED.balance_close ELSE balance_rollups.balance_close END,
+        balance_min = LEAST(balance_rollups.balance_min, EXCLUDED.balance_min),
+        balance_max = GREATEST(balance_rollups.balance_max, EXCLUDED.balance_max),
+        last_at = GREATEST(balance_rollups.last_at, EXCLUDED.last_at),
+        samples = balance_rollups.samples + EXCLUDED.samples"""
+
+REBUILD_ROLLUPS_SQL = f"""
+DELETE FROM pnl_rollups;
+DELETE FROM balance_rollups;
+
+INSERT INTO pnl_rollups (bucket, bucket_start, agent, realized_pnl, closes, operations)
+SELECT b.bucket, {_SQL_BUCKET_START.format(bucket="b.bucket", ts="o.created_at")}, o.agent,
+       COALESCE(SUM(o.pnl) FILTER (WHERE upper(o.operation) LIKE '%CLOSE%'), 0),
+       COUNT(*) FILTER (WHERE upper(o.operation) LIKE '%CLOSE%'),
+       COUNT(*)
+FROM bot_operations o, unnest(ARRAY['minute', 'hour', 'day']) AS b(bucket)
+WHERE o.agent IS NOT NULL
+GROUP BY 1, 2, 3;
+
+INSERT INTO balance_rollups (bucket, bucket_start, balance_open, balance_close, balance_min, balance_max, last_at, samples)
+SELECT b.bucket, {_SQL_BUCKET_START.format(bucket="b.bucket", ts="s.created_at")},
+       (array_agg(s.balance_usd ORDER BY s.created_at))[1],
+       (array_agg(s.balance_usd ORDER BY s.created_at DESC))[1],
+       MIN(s.balance_usd), MAX(s.balance_usd), MAX(s.created_at), COUNT(*)
+FROM account_snapshots s, unnest(ARRAY['minute', 'hour', 'day']) AS b(bucket)
+GROUP BY 1, 2;
+"""
+
+
+def _bucket_start(ts: datetime, bucket: str) -> datetime:
+    ts = ts.astimezone(timezone.utc).replace(second=0, microsecond=0)
+    if bucket in ("hour", "day"):
+        ts = ts.replace(minute=0)
+    if bucket == "day":
+        ts = ts.replace(hour=0)
+    return ts
+
+
+def _pnl_rollup_rows(operations: List[tuple]) -> List[tuple]:
+    """
+    operations: (created_at, agent, operation, pnl). Aggregati per (bucket, inizio, agente):
+    righe (bucket, bucket_start, agent, realized_pnl, closes, operations) in ordine di chiave.
+    """
+    totals: Dict[tuple, List[float]] = {}
+    for created_at, agent, operation, pnl in operations:
+        ts = _to_utc(created_at)
+        if ts is None or not agent:
+            continue
+        is_close = "CLOSE" in (operation or "").upper()
+        for bucket in ROLLUP_BUCKETS:
+            entry = totals.setdefault((bucket, _bucket_start(ts, bucket), agent), [0.0, 0, 0])
+            if is_close:
+                entry[0] += pnl or 0.0
+                entry[1] += 1
+            entry[2] += 1
+    # ordine stabile delle chiavi: due writer concorrenti non si bloccano a vicenda
+    return [(bucket, start, agent, pnl, closes, ops) for (bucket, start, agent), (pnl, closes, ops) in sorted(totals.items())]
+
+
+def _upsert_pnl_rollups(cur, operations: List[tuple]) -> None:
+    """Un solo upsert per batch, aggregato in Python."""
+    rows = _pnl_rollup_rows(operations)
+    if rows:
+        execute_values(cur, PNL_ROLLUP_UPSERT_SQL, rows, page_size=len(rows))
+
+
+def _pg_rebuild_rollups() -> None:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(REBUILD_ROLLUPS_SQL)
+        conn.commit()
+
+
+def rebuild_rollups() -> None:
+    """Ricalcola da zero i rollup dallo storico (es. dopo una modifica manuale delle tabelle)."""
+    get_backend().rebuild_rollups()
+
+
+# =====================
+# ACCOUNT SNAPSHOTS
+# =====================
+ACCOUNT_STATUS_SQL = f"""
+WITH last AS (
+    SELECT id, raw_payload FROM account_snapshots
+    ORDER BY created_at DESC, id DESC
+    LIMIT 1
+), snap AS (
+    INSERT INTO account_snapshots (balance_usd, raw_payload)
+    SELECT %(balance)s, %(raw)s::jsonb
+    WHERE NOT %(skip_unchanged)s
+       OR NOT EXISTS (SELECT 1 FROM last WHERE last.raw_payload = %(raw)s::jsonb)
+    RETURNING id, created_at, balance_usd
+), rollup AS (
+    INSERT INTO balance_rollups
+    (bucket, bucket_start, balance_open, balance_close, balance_min, balance_max, last_at, samples)
+    SELECT b.bucket, {_SQL_BUCKET_START.format(bucket="b.bucket", ts="snap.created_at")},
+           snap.balance_usd, snap.balance_usd, snap.balance_usd, snap.balance_usd, snap.created_at, 1
+    FROM snap, unnest(ARRAY['minute', 'hour', 'day']) AS b(bucket)
+    {BALANCE_ROLLUP_CONFLICT_SQL}
+), pos AS (
+    INSERT INTO open_positions
+    (snapshot_id, symbol, side, size, entry_price, mark_price, pnl_usd, leverage, raw_payload)
+    SELECT snap.id, p.symbol, p.side, p.size, p.entry_price, p.mark_price, p.pnl_usd, p.leverage, p.raw
+    FROM snap, jsonb_to_recordset(%(positions)s::jsonb) AS p(
+        symbol TEXT, side TEXT, size NUMERIC, entry_price NUMERIC, mark_price NUMERIC,
+        pnl_usd NUMERIC, leverage TEXT, raw JSONB
+    )
+)
+SELECT id, TRUE AS inserted FROM snap
+UNION ALL
+SELECT id, FALSE FROM last WHERE NOT EXISTS (SELECT 1 FROM snap)
+"""
+
+
+def _position_records(account_status: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Colonne di open_positions per ogni posizione di get_account_status; raw = dict originale."""
+    return [
+        {
+            "symbol": p.get("symbol"),
+            "side": p.get("side"),
+            "size": _finite(p.get("size")),
+            "entry_price": _finite(p.get("entry_price")),
+            "mark_price": _finite(p.get("mark_price")),
+            "pnl_usd": _finite(p.get("pnl_usd")),
+            "leverage": None if p.get("leverage") is None else str(p.get("leverage")),
+            "raw": p,
+        }
+        for p in account_status.get("open_positions") or []
+    ]
+
+
+def _pg_log_account_status(account_status: Dict[str, Any], skip_unchanged: bool = False) -> Optional[int]:
+    """
+    Snapshot e posizioni aperte con un solo statement: le posizioni passano come
+    array JSONB espanso da jsonb_to_recordset, quindi un round trip qualunque sia
+    il loro numero.
+    """
+    positions = _position_records(account_status)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(ACCOUNT_STATUS_SQL, {
+                "balance": _finite(account_status.get("balance_usd")),
+                "raw": _dumps(account_status),
+                "skip_unchanged": skip_unchanged,
+                "positions": _dumps(positions),
+            })
+            row = cur.fetchone()
         conn.commit()
-    return op_id
+    if row is None:
+        return None
+    if not row[1]:
+        print(f"[DB] Stato account invariato, snapshot {row[0]} non duplicato")
+    return row[0]
+
+
+def log_account_status(account_status: Dict[str, Any], *, skip_unchanged: bool = False) -> Optional[int]:
+    """
+    Salva lo stato dell'account (HyperLiquidTrader.get_account_status) e tutte le
+    posizioni aperte, restituisce l'id dello snapshot.
+
+    skip_unchanged=True: se il payload è identico a quello dell'ultimo snapshot
+    non viene scritto nulla e si restituisce l'id dello snapshot esistente.
+    """
+    return get_backend().log_account_status(account_status, skip_unchanged=skip_unchanged)
+
+# =====================
+# WRITE-BEHIND QUEUE
+# =====================
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "2"))      # flush periodico (s)
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))              # record per INSERT; raggiunta la soglia flush immediato
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))              # oltre, i record vanno direttamente su file
+LOG_SPILL_PATH = os.getenv("LOG_SPILL_PATH", os.path.join(".cache", "db_spill.jsonl"))
+
+# SQLSTATE Postgres di DB irraggiungibile: 08 connessione, 53 risorse esaurite
+# (too_many_connections, disk_full), 57P0x shutdown / avvio in corso
+_UNREACHABLE_SQLSTATE_PREFIXES = ("08", "53", "57P0")
+_UNREACHABLE_SQLITE_MESSAGES = ("database is locked", "database table is locked", "busy",
+                                "unable to open database", "disk i/o error")
+
+
+def _is_unreachable(e: Exception) -> bool:
+    """
+    True se l'errore indica DB irraggiungibile (record da conservare e
+    riprovare), False per dati o SQL invalidi (record da scartare): es.
+    sqlite3.OperationalError copre anche "no such table" e gli errori di sintassi.
+    """
+    if isinstance(e, (PoolTimeoutError, psycopg2.InterfaceError)):
+        return True
+    if isinstance(e, psycopg2.OperationalError):
+        # errori lato client (connessione rifiutata/persa) non hanno pgcode
+        return e.pgcode is None or e.pgcode.startswith(_UNREACHABLE_SQLSTATE_PREFIXES)
+    if isinstance(e, sqlite3.OperationalError):
+        message = str(e).lower()
+        return any(m in message for m in _UNREACHABLE_SQLITE_MESSAGES)
+    return False
+
+
+class _LogWriter:
+    """
+    Scrittura differita dei log su un thread in background.
+
+    - i record restano in memoria e vengono scritti con INSERT multi-riga ogni
+      LOG_FLUSH_INTERVAL secondi o appena la coda raggiunge LOG_BATCH_SIZE
+    - se il DB non è raggiungibile il batch viene accodato a un file JSONL
+      (append-only), ripreso e svuotato al primo flush riuscito
+    - un batch rifiutato per dati invalidi viene riscritto record per record e
+      i record che falliscono ancora vengono scartati (non bloccano la coda)
+
+    Consegna at-least-once: un crash durante il replay può duplicare un batch.
+    """
+
+    def __init__(self, spill_path: str = LOG_SPILL_PATH, flush_interval: float = LOG_FLUSH_INTERVAL,
+                 batch_size: int = LOG_BATCH_SIZE, max_queue: int = LOG_QUEUE_MAX):
+        self.pid = os.getpid()
+        self.spill_path = spill_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self._queue: List[Dict[str, Any]] = []
+        self._queue_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._db_down = False
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "spilled": 0, "replayed": 0, "dropped": 0}
+        self._thread = threading.Thread(target=self._run, name="db-log-writer", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, record: Dict[str, Any]) -> None:
+        with self._queue_lock:
+            overflow = len(self._queue) >= self.max_queue
+            if not overflow:
+                self._queue.append(record)
+                self.stats["enqueued"] += 1
+                full = len(self._queue) >= self.batch_size
+        if overflow:
+            self._spill([record])
+        elif full:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[DB] Log writer: flush fallito: {e}")
+
+    def flush(self) -> None:
+        """Scrive tutto quello che è in coda (e l'eventuale file di spill) prima di tornare."""
+        with self._write_lock:
+            while True:
+                with self._queue_lock:
+                    batch = self._queue[:self.batch_size]
+                    del self._queue[:self.batch_size]
+                if not batch:
+                    break
+                if not self._write(batch):
+                    # DB giù: inutile riprovare subito il resto, va tutto su file
+                    with self._queue_lock:
+                        rest, self._queue = self._queue, []
+                    self._spill(rest)
+                    return
+            if not self._db_down:
+                self._replay()
+
+    def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        try:
+            _write_records(batch)
+        except Exception as e:
+            if _is_unreachable(e):
+                if not self._db_down:
+                    print(f"[DB] Database non raggiungibile, log salvati in {self.spill_path}: {e}")
+                self._db_down = True
+                self._spill(batch)
+                return False
+            print(f"[DB] Batch di log rifiutato ({e}), scrittura record per record")
+            self._write_one_by_one(batch)
+            return True
+        if self._db_down:
+            print("[DB] Database di nuovo raggiungibile")
+        self._db_down = False
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+        return True
+
+    def _write_one_by_one(self, batch: List[Dict[str, Any]]) -> None:
+        for record in batch:
+            try:
+                _write_records([record])
+                self.stats["written"] += 1
+            except Exception as e:
+                if _is_unreachable(e):
+                    self._spill([record])
+                    continue
+                self.stats["dropped"] += 1
+                print(f"CRITICAL: Log {record.get('kind')} scartato: {e}")
+
+    def _spill(self, records: List[Dict[str, Any]]) -> None:
+        if not records:
+            return
+        try:
+            with self._spill_lock:
+                os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+                with open(self.spill_path, "a") as f:
+                    for record in records:
+                        f.write(_dumps(record) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.stats["spilled"] += len(records)
+        except Exception as e:
+            self.stats["dropped"] += len(records)
+            print(f"CRITICAL: Impossibile salvare {len(records)} log su {self.spill_path}: {e}")
+
+    def _replay(self) -> None:
+        # il file viene rinominato prima della lettura: i record spillati nel
+        # frattempo finiscono in un file nuovo e non vanno persi
+        replay_path = f"{self.spill_path}.replay"
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replay_path)
+
+        records = []
+        with open(replay_path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # riga troncata da un crash durante l'append
+                    self.stats["dropped"] += 1
+        print(f"[DB] Replay di {len(records)} log da {self.spill_path}")
+
+        for start in range(0, len(records), self.batch_size):
+            batch = records[start:start + self.batch_size]
+            if not self._write(batch):
+                # _write ha già rimesso il batch nel file di spill
+                self._spill(records[start + self.batch_size:])
+                break
+            self.stats["replayed"] += len(batch)
+        os.remove(replay_path)
+
+    def close(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[DB] Log writer: flush finale fallito: {e}")
+
+
+_log_writer: Optional[_LogWriter] = None
+_log_writer_guard = threading.Lock()
+
+
+def get_log_writer() -> _LogWriter:
+    """Writer di processo, avviato al primo log asincrono (uno nuovo dopo un fork)."""
+    global _log_writer
+    with _log_writer_guard:
+        if _log_writer is None or _log_writer.pid != os.getpid():
+            _log_writer = _LogWriter()
+        return _log_writer
+
+
+def log_bot_operation_async(operation_payload: Dict[str, Any], *, agent=None, system_prompt=None, prompt_template=None,
+                            prompt_args=None, indicators=None, news_text=None, sentiment=None, forecasts=None) -> None:
+    """Come log_bot_operation ma non blocca e non solleva: il record viene scritto in background."""
+    try:
+        get_log_writer().enqueue(_operation_record(
+            operation_payload, agent=agent, system_prompt=system_prompt, prompt_template=prompt_template,
+            prompt_args=prompt_args, indicators=indicators, news_text=news_text, sentiment=sentiment,
+            forecasts=forecasts,
+        ))
+    except Exception as e:
+        print(f"CRITICAL: Failed to queue bot operation log: {e}")
+
+
+def log_error_async(exc: BaseException, *, context: Optional[Dict] = None, source: Optional[str] = None) -> None:
+    """Come log_error ma scritto in background. Va chiamata dentro il blocco except (traceback)."""
+    try:
+        get_log_writer().enqueue(_error_record(exc, context, source))
+    except Exception as e:
+        print(f"CRITICAL: Failed to queue error log: {e}")
+
+
+def flush_logs() -> None:
+    """Scrive subito i log in coda (es. prima di uno shutdown controllato)."""
+    if _log_writer is not None and _log_writer.pid == os.getpid():
+        _log_writer.flush()
+
+
+def _close_log_writer() -> None:
+    global _log_writer
+    with _log_writer_guard:
+        if _log_writer is not None and _log_writer.pid == os.getpid():
+            _log_writer.close()
+        _log_writer = None
+
+
+# registrato dopo close_pool: atexit esegue in ordine inverso, quindi il flush
+# finale avviene con il pool ancora aperto
+atexit.register(_close_log_writer)
 
 # =====================
 # DATA FETCHING (DASHBOARD)
@@ -206,6 +1729,13 @@ def log_bot_operation(operation_payload: Dict[str, Any], *, system_prompt=None,
 
 def get_recent_logs(limit: int = 100) -> List[Dict[str, Any]]:
     """Fetches flattened logs for the dashboard."""
+    return get_backend().get_recent_logs(limit)
+
+def get_grid_alerts(limit: int = 50) -> List[Dict[str, Any]]:
+    """Fetches Grid Scanner alerts."""
+    return get_backend().get_grid_alerts(limit)
+
+def _pg_get_recent_logs(limit: int = 100) -> List[Dict[str, Any]]:
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
@@ -222,8 +1752,7 @@ def get_recent_logs(limit: int = 100) -> List[Dict[str, Any]]:
             columns = [desc[0] for desc in cur.description]
             return [dict(zip(columns, row)) for row in cur.fetchall()]
 
-def get_grid_alerts(limit: int = 50) -> List[Dict[str, Any]]:
-    """Fetches Grid Scanner alerts."""
+def _pg_get_grid_alerts(limit: int = 50) -> List[Dict[str, Any]]:
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
@@ -238,3 +1767,214 @@ def get_grid_alerts(limit: int = 50) -> List[Dict[str, Any]]:
             """, (limit,))
             columns = [desc[0] for desc in cur.description]
             return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+# =====================
+# TAILING (TERMINALE)
+# =====================
+DB_NOTIFY_CHANNEL = os.getenv("DB_NOTIFY_CHANNEL", "")                # se impostato: NOTIFY con gli id delle nuove operazioni (solo Postgres)
+NOTIFY_IDS_PER_MESSAGE = 500                                          # id per notifica (payload max 8000 byte)
+LOG_TAIL_LOOKBACK = float(os.getenv("LOG_TAIL_LOOKBACK", "10"))       # (s) finestra riletta a ogni poll di LogTail
+
+_LOG_COLUMNS_SQL = "id, created_at, operation, symbol, direction, raw_payload->>'reason' AS reason"
+
+
+def get_logs_since(cursor: Optional[tuple] = None, limit: int = 200, lookback: float = 0.0) -> List[Dict[str, Any]]:
+    """
+    Operazioni successive al cursore (created_at, id), in ordine crescente e al
+    massimo `limit` (keyset pagination sull'indice (created_at, id): il costo
+    dipende dalle righe nuove, non dallo storico). cursor=None: le ultime `limit`.
+    Il cursore per la chiamata successiva è (created_at, id) dell'ultima riga.
+
+    lookback > 0: anche le righe con created_at negli ultimi `lookback` secondi
+    prima del cursore ma id successivo (scritte in ritardo, es. dalla coda
+    asincrona di un altro agente). Qualche riga già vista può tornare: il
+    chiamante deduplica per id (vedi LogTail).
+    """
+    return get_backend().get_logs_since(cursor, limit, lookback)
+
+
+def _pg_get_logs_since(cursor: Optional[tuple], limit: int, lookback: float = 0.0) -> List[Dict[str, Any]]:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            if cursor is None:
+                cur.execute(
+                    f"SELECT {_LOG_COLUMNS_SQL} FROM bot_operations ORDER BY created_at DESC, id DESC LIMIT %s",
+                    (limit,),
+                )
+            else:
+                cur.execute(
+                    f"""
+                    SELECT {_LOG_COLUMNS_SQL} FROM bot_operations
+                    WHERE (created_at, id) > (%s, %s)
+                       OR (created_at > %s AND id > %s)
+                    ORDER BY created_at, id
+                    LIMIT %s
+                    """,
+                    (cursor[0], cursor[1], cursor[0] - timedelta(seconds=lookback), cursor[1], limit),
+                )
+            columns = [desc[0] for desc in cur.description]
+            rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+    return rows[::-1] if cursor is None else rows
+
+
+class _OperationListener:
+    """
+    LISTEN su DB_NOTIFY_CHANNEL con una connessione dedicata (fuori dal pool:
+    resta aperta per tutta la vita del listener).
+    """
+
+    def __init__(self, channel: str):
+        self.conn = psycopg2.connect(get_db_config().dsn)
+        self.conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.conn.cursor() as cur:
+            cur.execute(f'LISTEN "{channel}"')
+
+    def wait(self, timeout: float) -> List[int]:
+        """Id delle operazioni notificate entro timeout secondi ([] se nessuna)."""
+        if select.select([self.conn], [], [], timeout) == ([], [], []):
+            return []
+        self.conn.poll()
+        op_ids: List[int] = []
+        while self.conn.notifies:
+            notify = self.conn.notifies.pop(0)
+            op_ids.extend(int(x) for x in notify.payload.split(",") if x)
+        return op_ids
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class OperationNotifier:
+    """
+    Un solo LISTEN per processo condiviso da tutte le LogTail (es. una per
+    sessione della dashboard): un thread attende le notifiche e incrementa
+    `version`, chi aspetta si sveglia quando la versione cambia.
+    """
+
+    RECONNECT_DELAY = 5.0   # (s) attesa prima di riaprire il LISTEN dopo un errore
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.version = 0
+        self._cond = threading.Condition()
+        self._listener: Optional[_OperationListener] = None
+        self._thread: Optional[threading.Thread] = None
+        self._available: Optional[bool] = None
+
+    def start(self) -> bool:
+        """Apre il LISTEN al primo uso: False se il backend non notifica (si fa polling)."""
+        with self._cond:
+            if self._available is None:
+                try:
+                    self._listener = get_backend().listen_operations()
+                except Exception as e:
+                    print(f"[DB] LISTEN non disponibile, polling: {e}")
+                self._available = self._listener is not None
+                if self._available:
+                    self._thread = threading.Thread(target=self._run, name="db-notify", daemon=True)
+                    self._thread.start()
+            return self._available
+
+    def _run(self) -> None:
+        while True:
+            try:
+                if self._listener is None:
+                    self._listener = get_backend().listen_operations()
+                if self._listener.wait(self.RECONNECT_DELAY):
+                    with self._cond:
+                        self.version += 1
+                        self._cond.notify_all()
+            except Exception as e:
+                # connessione persa: nel frattempo chi aspetta ricade sul timeout
+                print(f"[DB] Listener interrotto: {e}")
+                if self._listener is not None:
+                    try:
+                        self._listener.close()
+                    except Exception:
+                        pass
+                    self._listener = None
+                time.sleep(self.RECONNECT_DELAY)
+
+    def wait(self, version: int, timeout: float) -> int:
+        """Attende che `version` cambi al massimo timeout secondi, restituisce la versione corrente."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+_notifier: Optional[OperationNotifier] = None
+_notifier_lock = threading.Lock()
+
+
+def get_operation_notifier() -> OperationNotifier:
+    """Notifier di processo (uno nuovo dopo un fork: il thread non sopravvive)."""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None or _notifier.pid != os.getpid():
+            _notifier = OperationNotifier()
+        return _notifier
+
+
+class LogTail:
+    """
+    Lettura incrementale di bot_operations per viste tipo `tail -f` (terminale
+    BarryV2): ogni poll trasferisce solo le righe nuove, `rows` tiene le ultime `limit`
+    in ordine (created_at, id).
+
+    created_at è assegnato al momento del log e la riga può arrivare dopo (coda
+    asincrona di un altro agente): ogni poll include le righe con id nuovo negli
+    ultimi `lookback` secondi prima del cursore e scarta gli id già visti.
+    Con DB_NOTIFY_CHANNEL su Postgres wait() si sveglia alla notifica invece di
+    attendere il timeout; il LISTEN è uno per processo (get_operation_notifier).
+    """
+
+    def __init__(self, limit: int = 200, lookback: float = LOG_TAIL_LOOKBACK):
+        self.limit = limit
+        self.lookback = lookback
+        self.rows: List[Dict[str, Any]] = []
+        self._keys: List[tuple] = []   # (created_at, id) di rows, per l'inserimento ordinato
+        self.cursor: Optional[tuple] = None
+        self._seen: Dict[int, datetime] = {}
+        self._version = 0   # versione del notifier letta all'ultimo poll
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """
+        Righe nuove dall'ultimo poll (in ordine crescente), già aggiunte a `rows`.
+        Se le righe nuove sono più di `limit` si salta alle ultime e `rows` viene ricostruita.
+        """
+        # letta prima della query: una notifica arrivata durante il poll sveglia subito wait()
+        self._version = get_operation_notifier().version
+        batch = get_logs_since(self.cursor, self.limit, self.lookback)
+        if self.cursor is not None and len(batch) == self.limit:
+            # più righe nuove di quante se ne mostrano: si riparte dalle ultime
+            batch = get_logs_since(None, self.limit)
+            self.rows.clear()
+            self._keys.clear()
+            self._seen.clear()
+        new = [row for row in batch if row["id"] not in self._seen]
+        for row in new:
+            self._seen[row["id"]] = row["created_at"]
+            # le righe arrivate in ritardo hanno created_at prima delle ultime mostrate
+            key = (row["created_at"], row["id"])
+            pos = bisect.bisect(self._keys, key)
+            self._keys.insert(pos, key)
+            self.rows.insert(pos, row)
+            if self.cursor is None or key > self.cursor:
+                self.cursor = key
+        if len(self.rows) > self.limit:
+            # si scartano le più vecchie per chiave, non le prime arrivate
+            del self.rows[:-self.limit]
+            del self._keys[:-self.limit]
+        if self.cursor is not None:
+            cutoff = self.cursor[0] - timedelta(seconds=self.lookback)
+            self._seen = {op_id: ts for op_id, ts in self._seen.items() if ts >= cutoff}
+        return new
+
+    def wait(self, timeout: float) -> bool:
+        """Attende nuove operazioni: True se notificate dal DB, False allo scadere del timeout."""
+        notifier = get_operation_notifier()
+        if not notifier.start():
+            time.sleep(timeout)
+            return False
+        return notifier.wait(self._version, timeout) != self._version
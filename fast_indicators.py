@@ -0,0 +1,190 @@
+"""
+Kernel NumPy per EMA / MACD / RSI / ATR, alternativi alla libreria `ta`.
+
+Tutte le funzioni accettano array float64 contigui:
+  - 1D (candles,): una singola serie, ricorsione su float Python (niente overhead pandas)
+  - 2D (coins, candles): un'intera universe in una sola chiamata, la ricorsione
+    scorre sulle candele ed è vettorizzata sulle coin
+
+I risultati replicano quelli dei wrapper `ta` usati da CryptoTechnicalAnalysisHL
+(stesso seed, stesso warm-up: NaN per EMA/RSI/MACD, 0.0 per ATR). Nelle matrici
+2D le righe più corte vanno riempite con NaN in testa: ogni riga parte dal suo
+primo valore valido.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+NAN = float("nan")
+
+
+def _as_array(data) -> np.ndarray:
+    arr = np.ascontiguousarray(data, dtype=np.float64)
+    if arr.ndim not in (1, 2):
+        raise ValueError("Attesi array 1D (candles) o 2D (coins x candles)")
+    return arr
+
+
+# ==============================
+#              EMA
+# ==============================
+def _ewm_1d(x: np.ndarray, alpha: float, min_periods: int) -> np.ndarray:
+    out = np.full(x.shape[0], NAN)
+    value = NAN
+    count = 0
+    for i, xi in enumerate(x.tolist()):
+        if xi != xi:  # NaN: stato invariato
+            if count >= min_periods:
+                out[i] = value
+            continue
+        value = xi if count == 0 else alpha * xi + (1.0 - alpha) * value
+        count += 1
+        if count >= min_periods:
+            out[i] = value
+    return out
+
+
+def _ewm_2d(x: np.ndarray, alpha: float, min_periods: int) -> np.ndarray:
+    rows, cols = x.shape
+    out = np.full((rows, cols), NAN)
+    value = np.full(rows, NAN)
+    count = np.zeros(rows, dtype=np.int64)
+    for t in range(cols):
+        xt = x[:, t]
+        valid = ~np.isnan(xt)
+        value = np.where(valid, np.where(count == 0, xt, alpha * xt + (1.0 - alpha) * value), value)
+        count += valid
+        out[:, t] = np.where(count >= min_periods, value, NAN)
+    return out
+
+
+def _ewm(x: np.ndarray, alpha: float, min_periods: int) -> np.ndarray:
+    """ewm(alpha, adjust=False, min_periods) di pandas sull'ultimo asse."""
+    if x.ndim == 1:
+        return _ewm_1d(x, alpha, min_periods)
+    return _ewm_2d(x, alpha, min_periods)
+
+
+def ema(close, period: int) -> np.ndarray:
+    """Come ta.trend.EMAIndicator(close, window=period).ema_indicator()."""
+    return _ewm(_as_array(close), 2.0 / (period + 1), period)
+
+
+# ==============================
+#              MACD
+# ==============================
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Come ta.trend.MACD: restituisce (macd, macd_signal, macd_diff)."""
+    x = _as_array(close)
+    macd_line = ema(x, fast) - ema(x, slow)
+    signal_line = ema(macd_line, signal)
+    return macd_line, signal_line, macd_line - signal_line
+
+
+# ==============================
+#              RSI
+# ==============================
+def _leading_diff(x: np.ndarray) -> np.ndarray:
+    # differenza sull'ultimo asse; il primo valore valido di ogni riga ha diff 0
+    # (ta trasforma il NaN iniziale di diff() in 0 con where)
+    diff = np.full(x.shape, NAN)
+    diff[..., 1:] = x[..., 1:] - x[..., :-1]
+    first = np.isnan(diff) & ~np.isnan(x)
+    diff[first] = 0.0
+    return diff
+
+
+def rsi(close, period: int = 14) -> np.ndarray:
+    """Come ta.momentum.RSIIndicator(close, window=period).rsi()."""
+    x = _as_array(close)
+    diff = _leading_diff(x)
+    up = np.where(diff > 0, diff, np.where(np.isnan(diff), NAN, 0.0))
+    down = np.where(diff < 0, -diff, np.where(np.isnan(diff), NAN, 0.0))
+    alpha = 1.0 / period
+    avg_up = _ewm(up, alpha, period)
+    avg_down = _ewm(down, alpha, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 - (100.0 / (1.0 + avg_up / avg_down))
+    return np.where(avg_down == 0, 100.0, out)
+
+
+# ==============================
+#              ATR
+# ==============================
+def true_range(high, low, close) -> np.ndarray:
+    """TR = max(high-low, |high-prev_close|, |low-prev_close|); alla prima candela high-low."""
+    h, l, c = _as_array(high), _as_array(low), _as_array(close)
+    prev_close = np.full(c.shape, NAN)
+    prev_close[..., 1:] = c[..., :-1]
+    hl = h - l
+    with np.errstate(invalid="ignore"):
+        tr = np.fmax(hl, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+    return np.where(np.isnan(c), NAN, tr)
+
+
+def _wilder_atr_1d(tr: np.ndarray, period: int) -> np.ndarray:
+    out = np.zeros(tr.shape[0])
+    values = tr.tolist()
+    start = next((i for i, v in enumerate(values) if v == v), len(values))
+    out[:start] = NAN
+    if len(values) - start < period:
+        return out
+    seed = start + period - 1
+    atr = sum(values[start:seed + 1]) / period
+    out[seed] = atr
+    for i in range(seed + 1, len(values)):
+        atr = (atr * (period - 1) + values[i]) / float(period)
+        out[i] = atr
+    return out
+
+
+def _wilder_atr_2d(tr: np.ndarray, period: int) -> np.ndarray:
+    rows, cols = tr.shape
+    out = np.zeros((rows, cols))
+    atr = np.zeros(rows)
+    tr_sum = np.zeros(rows)
+    count = np.zeros(rows, dtype=np.int64)
+    for t in range(cols):
+        trt = tr[:, t]
+        valid = ~np.isnan(trt)
+        count += valid
+        warming = valid & (count <= period)
+        tr_sum = np.where(warming, tr_sum + np.where(valid, trt, 0.0), tr_sum)
+        atr = np.where(
+            valid & (count == period),
+            tr_sum / period,
+            np.where(valid & (count > period), (atr * (period - 1) + trt) / float(period), atr),
+        )
+        out[:, t] = np.where(count == 0, NAN, np.where(count >= period, atr, 0.0))
+    return out
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """Come ta.volatility.AverageTrueRange(...).average_true_range() (0.0 durante il warm-up)."""
+    tr = true_range(high, low, close)
+    if tr.ndim == 1:
+        return _wilder_atr_1d(tr, period)
+    return _wilder_atr_2d(tr, period)
+
+
+# ==============================
+#          BATCH UNIVERSE
+# ==============================
+def compute_universe(high, low, close) -> Dict[str, np.ndarray]:
+    """
+    Calcola in un colpo tutti gli indicatori di get_complete_analysis su una
+    matrice (coins x candles). Ogni valore restituito ha la stessa forma di close.
+    """
+    c = _as_array(close)
+    macd_line, signal_line, macd_diff = macd(c)
+    return {
+        "ema_20": ema(c, 20),
+        "ema_50": ema(c, 50),
+        "macd": macd_diff,
+        "macd_line": macd_line,
+        "macd_signal": signal_line,
+        "rsi_7": rsi(c, 7),
+        "rsi_14": rsi(c, 14),
+        "atr_3": atr(high, low, c, 3),
+        "atr_14": atr(high, low, c, 14),
+    }
@@ -0,0 +1,276 @@
+"""
+Backend di forecast per HyperliquidForecaster.
+
+Ogni backend espone:
+  - predict(coin, interval, df, target_ds): forecast della candela target a partire
+    da un DataFrame ds/y (ultima riga = candela in formazione), restituisce un
+    DataFrame con FORECAST_COLUMNS (ds, yhat, yhat_lower, yhat_upper)
+  - forecast(y, horizon) (solo i backend NumPy, NumpyBackend): array 1D
+    (candles,) oppure 2D (coins, candles) con NaN in testa per le righe più
+    corte, come in fast_indicators; un'intera universe in una sola chiamata
+
+Le bande hanno la stessa ampiezza nominale di Prophet (interval_width=0.8).
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from fast_indicators import _as_array, _ewm
+
+FORECAST_COLUMNS = ["ds", "yhat", "yhat_lower", "yhat_upper"]
+
+# quantile normale al 90%: banda centrale all'80% come l'interval_width di Prophet
+INTERVAL_Z = 1.2815515655446004
+
+# periodo stagionale giornaliero in candele per intervallo
+SEASON_LENGTHS = {"15m": 96, "1h": 24}
+
+
+def _result(yhat: np.ndarray, sigma: np.ndarray, horizon: int) -> Dict[str, np.ndarray]:
+    band = INTERVAL_Z * sigma * np.sqrt(horizon)
+    return {"yhat": yhat, "yhat_lower": yhat - band, "yhat_upper": yhat + band}
+
+
+def _squeeze(out: Dict[str, np.ndarray], ndim: int) -> Dict[str, np.ndarray]:
+    # input 1D -> scalari numpy invece di array di una riga
+    return {k: v[0] for k, v in out.items()} if ndim == 1 else out
+
+
+def _last_valid(x: np.ndarray) -> np.ndarray:
+    """Ultimo valore non NaN di ogni riga di una matrice 2D."""
+    valid = ~np.isnan(x)
+    idx = x.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    out = x[np.arange(x.shape[0]), idx]
+    return np.where(valid.any(axis=1), out, np.nan)
+
+
+class ForecastBackend(ABC):
+    """Interfaccia comune dei backend."""
+
+    name = "base"
+    vectorized = False
+
+    @abstractmethod
+    def predict(self, coin: str, interval: str, df: pd.DataFrame, target_ds) -> pd.DataFrame:
+        ...
+
+
+class NumpyBackend(ForecastBackend):
+    """Backend NumPy: predict di una coin = forecast vettoriale su una riga."""
+
+    vectorized = True
+
+    def predict(self, coin: str, interval: str, df: pd.DataFrame, target_ds) -> pd.DataFrame:
+        # solo candele chiuse, come Prophet: la chiusura parziale della candela in
+        # formazione non entra nel forecast (che resta valido fino alla prossima
+        # chiusura); la target è quella dopo la candela in formazione = 2 passi
+        y = df["y"].iloc[:-1].to_numpy(dtype=np.float64)
+        out = self.forecast(y, horizon=2)
+        return pd.DataFrame({
+            "ds": [target_ds],
+            "yhat": [float(out["yhat"])],
+            "yhat_lower": [float(out["yhat_lower"])],
+            "yhat_upper": [float(out["yhat_upper"])],
+        })
+
+    @abstractmethod
+    def forecast(self, y, horizon: int = 1) -> Dict[str, np.ndarray]:
+        ...
+
+
+# ==============================
+#          EWMA DRIFT
+# ==============================
+class EWMADriftBackend(NumpyBackend):
+    """
+    Ultimo prezzo + drift medio esponenziale delle variazioni.
+    sigma = EWMA degli errori quadratici del forecast a un passo.
+    """
+
+    name = "ewma_drift"
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+
+    def forecast(self, y, horizon: int = 1) -> Dict[str, np.ndarray]:
+        x = _as_array(y)
+        x2 = np.atleast_2d(x)
+        diff = np.full(x2.shape, np.nan)
+        diff[:, 1:] = x2[:, 1:] - x2[:, :-1]
+        drift = _ewm(diff, self.alpha, 1)
+
+        # errore a un passo: y_t - (y_{t-1} + drift_{t-1})
+        err = np.full(x2.shape, np.nan)
+        err[:, 2:] = diff[:, 2:] - drift[:, 1:-1]
+        sigma = np.sqrt(_last_valid(_ewm(err * err, self.alpha, 1)))
+
+        yhat = _last_valid(x2) + horizon * _last_valid(drift)
+        out = _result(yhat, sigma, horizon)
+        return _squeeze(out, x.ndim)
+
+
+# ==============================
+#         HOLT-WINTERS
+# ==============================
+class HoltWintersBackend(NumpyBackend):
+    """
+    Holt-Winters additivo (livello + trend + stagionalità) con smoothing fisso.
+
+    L'indice stagionale è la posizione assoluta della candela (t % season_length):
+    le righe 2D sono allineate a destra sugli stessi timestamp, quindi tutte le
+    coin condividono la fase. season_length=None = Holt lineare senza stagionalità.
+    """
+
+    name = "holt_winters"
+
+    def __init__(self, alpha: float = 0.3, beta: float = 0.02, gamma: float = 0.1,
+                 season_length: Optional[int] = None):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.season_length = season_length
+
+    def forecast(self, y, horizon: int = 1) -> Dict[str, np.ndarray]:
+        x = _as_array(y)
+        x2 = np.atleast_2d(x)
+        rows, cols = x2.shape
+        m = self.season_length or 1
+        a, b = self.alpha, self.beta
+        g = self.gamma if self.season_length else 0.0
+
+        level = np.full(rows, np.nan)
+        trend = np.zeros(rows)
+        season = np.zeros((rows, m))
+        sse = np.zeros(rows)
+        count = np.zeros(rows, dtype=np.int64)
+        started = np.zeros(rows, dtype=bool)
+
+        for t in range(cols):
+            xt = x2[:, t]
+            valid = ~np.isnan(xt)
+            s = t % m
+            first = valid & ~started
+            update = valid & started
+
+            pred = level + trend + season[:, s]
+            err = np.where(update, xt - pred, 0.0)
+            sse = np.where(update, sse + err * err, sse)
+            count += update
+
+            new_level = a * (xt - season[:, s]) + (1 - a) * (level + trend)
+            new_trend = b * (new_level - level) + (1 - b) * trend
+            new_season = g * (xt - new_level) + (1 - g) * season[:, s]
+
+            level = np.where(first, xt, np.where(update, new_level, level))
+            trend = np.where(update, new_trend, trend)
+            season[:, s] = np.where(update, new_season, season[:, s])
+            started |= valid
+
+        sigma = np.sqrt(np.where(count > 0, sse / np.maximum(count, 1), np.nan))
+        target_season = season[:, (cols - 1 + horizon) % m]
+        yhat = level + horizon * trend + target_season
+        out = _result(yhat, sigma, horizon)
+        return _squeeze(out, x.ndim)
+
+
+# ==============================
+#             AR(p)
+# ==============================
+class ARBackend(NumpyBackend):
+    """
+    AR(p) con intercetta sulle variazioni di prezzo, stimato con minimi quadrati.
+    Nel caso 2D le equazioni normali di tutte le coin vengono risolte in batch.
+    """
+
+    name = "ar"
+
+    def __init__(self, p: int = 3, ridge: float = 1e-8):
+        self.p = p
+        self.ridge = ridge
+
+    def forecast(self, y, horizon: int = 1) -> Dict[str, np.ndarray]:
+        x = _as_array(y)
+        x2 = np.atleast_2d(x)
+        rows, cols = x2.shape
+        p = self.p
+        diff = np.full(x2.shape, np.nan)
+        diff[:, 1:] = x2[:, 1:] - x2[:, :-1]
+
+        # regressori: [1, d_{t-1}, ..., d_{t-p}] -> target d_t
+        n = cols - p
+        if n <= p + 1:
+            nan = np.full(rows, np.nan)
+            out = _result(nan, nan, horizon)
+            return _squeeze(out, x.ndim)
+        lags = np.stack([diff[:, p - i - 1:cols - i - 1] for i in range(p)], axis=2)
+        design = np.concatenate([np.ones((rows, n, 1)), lags], axis=2)
+        target = diff[:, p:]
+        mask = ~np.isnan(target) & ~np.isnan(lags).any(axis=2)
+        design = np.where(mask[..., None], design, 0.0)
+        target = np.where(mask, target, 0.0)
+
+        xtx = np.einsum("rni,rnj->rij", design, design)
+        xty = np.einsum("rni,rn->ri", design, target)
+        scale = np.trace(xtx, axis1=1, axis2=2)[:, None, None] / (p + 1)
+        xtx = xtx + (self.ridge * np.maximum(scale, 1e-12)) * np.eye(p + 1)
+        coef = np.linalg.solve(xtx, xty[..., None])[..., 0]
+
+        resid = np.where(mask, target - np.einsum("rni,ri->rn", design, coef), 0.0)
+        dof = np.maximum(mask.sum(axis=1) - (p + 1), 1)
+        sigma_d = np.sqrt((resid * resid).sum(axis=1) / dof)
+
+        # forecast iterativo delle variazioni a partire dalle ultime p
+        recent = [diff[:, cols - 1 - i] for i in range(p)]
+        yhat = _last_valid(x2)
+        for _ in range(horizon):
+            step = coef[:, 0] + sum(coef[:, i + 1] * recent[i] for i in range(p))
+            yhat = yhat + step
+            recent = [step] + recent[:-1]
+
+        out = _result(yhat, sigma_d, horizon)
+        return _squeeze(out, x.ndim)
+
+
+# ==============================
+#            PROPHET
+# ==============================
+def make_prophet():
+    from prophet import Prophet
+
+    return Prophet(daily_seasonality=True, weekly_seasonality=True)
+
+
+class ProphetBackend(ForecastBackend):
+    """Prophet con la cache dei modelli (warm-start, riuso finché non chiude una candela)."""
+
+    name = "prophet"
+    vectorized = False
+
+    def __init__(self, model_cache):
+        self.model_cache = model_cache
+
+    def predict(self, coin: str, interval: str, df: pd.DataFrame, target_ds) -> pd.DataFrame:
+        # Il fit usa solo le candele chiuse: finché non ne chiude una nuova
+        # il modello in cache resta valido e si fa solo il predict
+        history = df.iloc[:-1]
+        model = self.model_cache.get_model(coin, interval, history, make_prophet)
+        forecast = model.predict(pd.DataFrame({"ds": [target_ds]}))
+        return forecast.tail(1)[FORECAST_COLUMNS]
+
+
+FORECAST_BACKENDS = ("prophet", "holt_winters", "ewma_drift", "ar")
+
+
+def make_backend(name: str, interval: str, model_cache=None) -> ForecastBackend:
+    """Istanza di un backend con i parametri di default per l'intervallo."""
+    if name == "prophet":
+        return ProphetBackend(model_cache)
+    if name == "holt_winters":
+        return HoltWintersBackend(season_length=SEASON_LENGTHS.get(interval))
+    if name == "ewma_drift":
+        return EWMADriftBackend()
+    if name == "ar":
+        return ARBackend()
+    raise ValueError(f"backend deve essere uno tra {FORECAST_BACKENDS}")
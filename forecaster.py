@@ -1,18 +1,175 @@
 import pandas as pd
 from datetime import datetime, timezone, timedelta
-from prophet import Prophet
 from hyperliquid.info import Info
 from hyperliquid.utils import constants
+from typing import Dict, Optional, Union
+from candle_cache import INTERVAL_TO_MS, CandleCache, get_shared_cache
+from resampler import CandleResampler
+from prophet_cache import ProphetModelCache, fit_model, get_shared_model_cache, stan_init
+from forecast_backends import FORECAST_COLUMNS, ForecastBackend, ProphetBackend, make_backend, make_prophet
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import multiprocessing
+import numpy as np
+import os
+import threading
 import warnings
 warnings.filterwarnings('ignore')
 
+FORECAST_LIMITS = {"15m": 300, "1h": 500}
+# Backend per intervallo: "prophet", "holt_winters", "ewma_drift", "ar"
+DEFAULT_BACKENDS = {"15m": "prophet", "1h": "prophet"}
+
+
+class ForecastResultCache:
+    """
+    Ultimo forecast per (coin, interval, backend), valido finché non chiude una
+    nuova candela: il forecast dipende solo dalle candele chiuse, quindi fino
+    alla chiusura successiva viene restituito senza rifare fit/predict.
+    """
+
+    def __init__(self):
+        self._results: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, coin: str, interval: str, backend: str, last_closed: pd.Timestamp) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._results.get((coin, interval, backend))
+            if entry is not None and entry[0] == last_closed:
+                self.stats["hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, coin: str, interval: str, backend: str, last_closed: pd.Timestamp,
+            forecast_data: pd.DataFrame) -> None:
+        with self._lock:
+            self._results[(coin, interval, backend)] = (last_closed, forecast_data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+
+_SHARED_RESULT_CACHES: Dict[str, ForecastResultCache] = {}
+_SHARED_RESULT_GUARD = threading.Lock()
+
+
+def get_shared_result_cache(base_url: str) -> ForecastResultCache:
+    """Cache dei forecast condivisa tra le istanze, una per endpoint (mainnet/testnet)."""
+    with _SHARED_RESULT_GUARD:
+        if base_url not in _SHARED_RESULT_CACHES:
+            _SHARED_RESULT_CACHES[base_url] = ForecastResultCache()
+        return _SHARED_RESULT_CACHES[base_url]
+
+
+# Start method dei worker Prophet: main.py ha già thread attivi (writer dei log,
+# refresh di meta(), watchdog del book, pool DB) e un fork può ereditare un lock
+# preso da uno di questi. forkserver/spawn partono da un processo pulito.
+FORECAST_MP_START = os.getenv("FORECAST_MP_START", "forkserver")  # "forkserver", "spawn"
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS: Optional[int] = None
+_POOL_GUARD = threading.Lock()
+
+
+def get_forecast_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Pool di processi condiviso per i fit Prophet: main.py ricrea il forecaster
+    ad ogni ciclo e l'avvio dei worker (import di pandas/prophet) si paga una
+    volta sola. Ricreato se cambia max_workers; chiuso all'uscita.
+    """
+    global _POOL, _POOL_WORKERS
+    with _POOL_GUARD:
+        if _POOL is not None and _POOL_WORKERS != max_workers:
+            _POOL.shutdown(wait=True)
+            _POOL = None
+        if _POOL is None:
+            context = multiprocessing.get_context(FORECAST_MP_START)
+            if FORECAST_MP_START == "forkserver":
+                # il forkserver importa solo questo modulo, non __main__
+                context.set_forkserver_preload(["forecaster"])
+            _POOL = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+            _POOL_WORKERS = max_workers
+        return _POOL
+
+
+def _discard_forecast_pool(pool: ProcessPoolExecutor) -> None:
+    """Scarta un pool rotto (worker morto): il prossimo ciclo ne crea uno nuovo."""
+    global _POOL
+    with _POOL_GUARD:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def _shutdown_forecast_pool() -> None:
+    global _POOL
+    with _POOL_GUARD:
+        if _POOL is not None:
+            _POOL.shutdown(wait=True, cancel_futures=True)
+            _POOL = None
+
+
+def _fit_predict_job(ds, y, target_ds, init):
+    """
+    Eseguito in un processo worker: fit Prophet (warm-start da `init` se presente)
+    sulle candele chiuse e predict della candela target.
+    Restituisce (modello serializzato, riga del forecast, warm_start_riuscito).
+    """
+    from prophet.serialize import model_to_json
+
+    history = pd.DataFrame({"ds": ds, "y": y})
+    model, warm = fit_model(history, make_prophet, init)
+    row = model.predict(pd.DataFrame({"ds": [target_ds]})).iloc[0]
+    return model_to_json(model), {col: row[col] for col in FORECAST_COLUMNS}, warm
+
+
 class HyperliquidForecaster:
-    def __init__(self, testnet: bool = True):
+    def __init__(self, testnet: bool = True, use_cache: bool = True, candle_cache: Optional[CandleCache] = None,
+                 resample_from_1m: bool = False, info: Optional[Info] = None,
+                 model_cache: Optional[ProphetModelCache] = None,
+                 backends: Optional[Dict[str, Union[str, ForecastBackend]]] = None,
+                 result_cache: Optional[ForecastResultCache] = None):
         base_url = constants.TESTNET_API_URL if testnet else constants.MAINNET_API_URL
-        self.info = Info(base_url, skip_ws=True)
+        # info esterno: es. replay di fixture registrate nei benchmark
+        self.info = info if info is not None else Info(base_url, skip_ws=True)
         self.last_prices = {}  # Memorizza gli ultimi prezzi per calcolare la variazione
+        # Stessa cache incrementale usata da CryptoTechnicalAnalysisHL
+        if candle_cache is not None:
+            self.candle_cache = candle_cache
+        else:
+            self.candle_cache = get_shared_cache(base_url) if use_cache else None
+        # 15m ricavato dalla serie 1m; l'1h a 500 candele supera lo storico 1m
+        # disponibile e viene scaricato direttamente (vedi CandleResampler)
+        self.resampler = CandleResampler(self.candle_cache or CandleCache()) if resample_from_1m else None
+        # Modelli Prophet riusati tra i cicli (warm-start + persistenza su disco)
+        self.model_cache = model_cache if model_cache is not None else get_shared_model_cache(base_url)
+        # Backend selezionabile per intervallo (nome o istanza di ForecastBackend)
+        self.backends: Dict[str, ForecastBackend] = {}
+        for interval, backend in {**DEFAULT_BACKENDS, **(backends or {})}.items():
+            if isinstance(backend, str):
+                backend = make_backend(backend, interval, self.model_cache)
+            self.backends[interval] = backend
+        # Forecast già calcolati per l'ultima candela chiusa (condivisi tra istanze)
+        self.result_cache = result_cache if result_cache is not None else get_shared_result_cache(base_url)
 
     def _fetch_candles(self, coin: str, interval: str, limit: int) -> pd.DataFrame:
+        ohlcv = None
+        if self.resampler is not None:
+            ohlcv = self.resampler.fetch_ohlcv(self.info, coin, interval, limit)
+        elif self.candle_cache is not None:
+            ohlcv = self.candle_cache.get_ohlcv(self.info, coin, interval, limit)
+        if ohlcv is not None:
+            df = pd.DataFrame({
+                "ds": ohlcv["timestamp"].dt.tz_convert(None),
+                "y": ohlcv["close"],
+            })
+            return df.sort_values("ds").reset_index(drop=True)
+
         now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
         interval_ms = {"15m": 15*60_000, "1h": 60*60_000}[interval]
         start_ms = now_ms - limit * interval_ms
@@ -34,62 +191,224 @@ class HyperliquidForecaster:
         df = df[["ds", "y"]].sort_values("ds").reset_index(drop=True)
         return df
 
+    @staticmethod
+    def _normalize_interval(interval: str) -> str:
+        return "15m" if interval == "15m" else "1h"
+
+    def _history(self, coin: str, interval: str) -> tuple:
+        """Candele per il forecast: (intervallo normalizzato, DataFrame ds/y con la candela in formazione)."""
+        interval = self._normalize_interval(interval)
+        return interval, self._fetch_candles(coin, interval, limit=FORECAST_LIMITS[interval])
+
+    @staticmethod
+    def _target_ds(df: pd.DataFrame, interval: str) -> pd.Timestamp:
+        # stessa candela prevista di prima: quella dopo la candela in formazione
+        return df["ds"].iloc[-1] + pd.Timedelta(milliseconds=INTERVAL_TO_MS[interval])
+
     def forecast(self, coin: str, interval: str) -> tuple:
-        if interval == "15m":
-            df = self._fetch_candles(coin, "15m", limit=300)
-            freq = "15min"
-        else:
-            df = self._fetch_candles(coin, "1h", limit=500)
-            freq = "H"
+        interval, df = self._history(coin, interval)
 
         # Memorizza l'ultimo prezzo
         last_price = df["y"].iloc[-1]
 
-        model = Prophet(daily_seasonality=True, weekly_seasonality=True)
-        model.fit(df)
-
-        future = model.make_future_dataframe(periods=1, freq=freq)
-        forecast = model.predict(future)
+        backend = self.backends[interval]
+        last_closed = df["ds"].iloc[-2]
+        forecast_data = self.result_cache.get(coin, interval, backend.name, last_closed)
+        if forecast_data is None:
+            forecast_data = backend.predict(coin, interval, df, self._target_ds(df, interval))
+            self.result_cache.put(coin, interval, backend.name, last_closed, forecast_data)
 
         # Restituisce sia il forecast che l'ultimo prezzo
-        return forecast.tail(1)[["ds", "yhat", "yhat_lower", "yhat_upper"]], last_price
+        return forecast_data, last_price
 
-    def forecast_many(self, tickers: list, intervals=("15m", "1h")):
-        results = []
+    def _forecast_vectorized(self, tickers: list, interval: str) -> dict:
+        """
+        Forecast di tutte le coin di un intervallo con una sola chiamata a un
+        backend NumPy: le serie vengono allineate a destra in una matrice
+        (coins x candles) con NaN in testa per le più corte.
+        """
+        outcomes = {}
+        frames = {}
+        last_closed = {}
+        norm = self._normalize_interval(interval)
+        backend = self.backends[norm]
         for coin in tickers:
-            for interval in intervals:
-                try:
-                    forecast_data, last_price = self.forecast(coin, interval)
-                    fc = forecast_data.iloc[0]
-                    
-                    # Calcola la variazione percentuale
-                    variazione_pct = ((fc["yhat"] - last_price) / last_price) * 100
-                    
-                    # Determina il timeframe in italiano
-                    timeframe = "Prossimi 15 Minuti" if interval == "15m" else "Prossima Ora"
-                    
-                    results.append({
-                        "Ticker": coin,
-                        "Timeframe": timeframe,
-                        "Ultimo Prezzo": round(last_price, 2),
-                        "Previsione": round(fc["yhat"], 2),
-                        "Limite Inferiore": round(fc["yhat_lower"], 2),
-                        "Limite Superiore": round(fc["yhat_upper"], 2),
-                        "Variazione %": round(variazione_pct, 2),
-                        "Timestamp Previsione": fc["ds"]
-                    })
-                except Exception as e:
-                    results.append({
-                        "Ticker": coin,
-                        "Timeframe": "Prossimi 15 Minuti" if interval == "15m" else "Prossima Ora",
-                        "Ultimo Prezzo": None,
-                        "Previsione": None,
-                        "Limite Inferiore": None,
-                        "Limite Superiore": None,
-                        "Variazione %": None,
-                        "Timestamp Previsione": None,
-                        "error": str(e)
-                    })
+            try:
+                df = self._history(coin, interval)[1]
+                last_closed[coin] = df["ds"].iloc[-2]
+                cached = self.result_cache.get(coin, norm, backend.name, last_closed[coin])
+                if cached is not None:
+                    outcomes[(coin, interval)] = (cached, df["y"].iloc[-1])
+                else:
+                    frames[coin] = df
+            except Exception as e:
+                outcomes[(coin, interval)] = e
+        if not frames:
+            return outcomes
+
+        # solo candele chiuse (come ForecastBackend.predict): target a 2 passi,
+        # la candela dopo quella in formazione
+        width = max(len(df) for df in frames.values()) - 1
+        matrix = np.full((len(frames), width), np.nan)
+        for i, df in enumerate(frames.values()):
+            matrix[i, width - len(df) + 1:] = df["y"].iloc[:-1].to_numpy(dtype=np.float64)
+        out = backend.forecast(matrix, horizon=2)
+
+        for i, (coin, df) in enumerate(frames.items()):
+            forecast_data = pd.DataFrame({
+                "ds": [self._target_ds(df, norm)],
+                "yhat": [float(out["yhat"][i])],
+                "yhat_lower": [float(out["yhat_lower"][i])],
+                "yhat_upper": [float(out["yhat_upper"][i])],
+            })
+            self.result_cache.put(coin, norm, backend.name, last_closed[coin], forecast_data)
+            outcomes[(coin, interval)] = (forecast_data, df["y"].iloc[-1])
+        return outcomes
+
+    def _forecast_parallel(self, jobs: list, max_workers: Optional[int]) -> dict:
+        """
+        Esegue i job (coin, interval) sul pool di processi condiviso (get_forecast_pool).
+
+        Le candele vengono scaricate qui nel processo padre (cache condivisa) e
+        ai worker arrivano solo due array numpy; i job con un modello ancora
+        valido in cache non vengono inviati al pool. Restituisce
+        {job: (forecast_data, last_price)} oppure {job: eccezione}.
+        """
+        outcomes = {}
+        pending = {}
+        for job in jobs:
+            coin, interval = job
+            try:
+                interval, df = self._history(coin, interval)
+                history = df.iloc[:-1]
+                last_ds = history["ds"].iloc[-1]
+                target = pd.DataFrame({"ds": [self._target_ds(df, interval)]})
+                last_price = df["y"].iloc[-1]
+
+                cached = self.result_cache.get(coin, interval, ProphetBackend.name, last_ds)
+                if cached is not None:
+                    outcomes[job] = (cached, last_price)
+                    continue
+
+                model_cache = self.backends[interval].model_cache
+                model = model_cache.lookup(coin, interval, last_ds)
+                if model is not None:
+                    forecast_data = model.predict(target)[FORECAST_COLUMNS]
+                    self.result_cache.put(coin, interval, ProphetBackend.name, last_ds, forecast_data)
+                    outcomes[job] = (forecast_data, last_price)
+                    continue
+
+                previous = model_cache.previous(coin, interval)
+                init = stan_init(previous) if previous is not None else None
+                pending[job] = (interval, history, target, last_price, init)
+            except Exception as e:
+                outcomes[job] = e
+
+        if not pending:
+            return outcomes
+
+        from prophet.serialize import model_from_json
+
+        def submit_all(pool):
+            return {
+                job: pool.submit(
+                    _fit_predict_job,
+                    history["ds"].to_numpy(dtype="datetime64[ns]"),
+                    history["y"].to_numpy(dtype="float64"),
+                    target["ds"].iloc[0].to_datetime64(),
+                    init,
+                )
+                for job, (interval, history, target, last_price, init) in pending.items()
+            }
+
+        pool = get_forecast_pool(max_workers)
+        try:
+            futures = submit_all(pool)
+        except BrokenProcessPool:
+            # un worker è morto tra un ciclo e l'altro: pool nuovo e un secondo tentativo
+            _discard_forecast_pool(pool)
+            pool = get_forecast_pool(max_workers)
+            futures = submit_all(pool)
+        for job, future in futures.items():
+            interval, history, _, last_price, _ = pending[job]
+            try:
+                model_json, row, warm = future.result()
+                self.backends[interval].model_cache.store(
+                    job[0], interval, model_from_json(model_json), history["ds"].iloc[-1], warm=warm
+                )
+                forecast_data = pd.DataFrame([row])[FORECAST_COLUMNS]
+                self.result_cache.put(job[0], interval, ProphetBackend.name, history["ds"].iloc[-1], forecast_data)
+                outcomes[job] = (forecast_data, last_price)
+            except BrokenProcessPool as e:
+                _discard_forecast_pool(pool)
+                outcomes[job] = e
+            except Exception as e:
+                outcomes[job] = e
+        return outcomes
+
+    def forecast_many(self, tickers: list, intervals=("15m", "1h"), concurrent: bool = False,
+                      max_workers: Optional[int] = None):
+        """
+        Forecast per ogni (ticker, intervallo).
+
+        Args:
+            concurrent: se True i fit Prophet girano in parallelo su processi separati
+                (i backend NumPy sono già calcolati in batch su tutte le coin)
+            max_workers: numero di processi (default: numero di CPU)
+        """
+        jobs = [(coin, interval) for coin in tickers for interval in intervals]
+        outcomes = {}
+        # backend NumPy: tutte le coin dell'intervallo in una sola chiamata
+        for interval in intervals:
+            if self.backends[self._normalize_interval(interval)].vectorized:
+                outcomes.update(self._forecast_vectorized(tickers, interval))
+        if concurrent:
+            prophet_jobs = [
+                job for job in jobs
+                if job not in outcomes
+                and isinstance(self.backends[self._normalize_interval(job[1])], ProphetBackend)
+            ]
+            outcomes.update(self._forecast_parallel(prophet_jobs, max_workers))
+
+        results = []
+        for coin, interval in jobs:
+            try:
+                outcome = outcomes.get((coin, interval))
+                if outcome is None:
+                    outcome = self.forecast(coin, interval)
+                if isinstance(outcome, Exception):
+                    raise outcome
+                forecast_data, last_price = outcome
+                fc = forecast_data.iloc[0]
+                
+                # Calcola la variazione percentuale
+                variazione_pct = ((fc["yhat"] - last_price) / last_price) * 100
+                
+                # Determina il timeframe in italiano
+                timeframe = "Prossimi 15 Minuti" if interval == "15m" else "Prossima Ora"
+                
+                results.append({
+                    "Ticker": coin,
+                    "Timeframe": timeframe,
+                    "Ultimo Prezzo": round(last_price, 2),
+                    "Previsione": round(fc["yhat"], 2),
+                    "Limite Inferiore": round(fc["yhat_lower"], 2),
+                    "Limite Superiore": round(fc["yhat_upper"], 2),
+                    "Variazione %": round(variazione_pct, 2),
+                    "Timestamp Previsione": fc["ds"]
+                })
+            except Exception as e:
+                results.append({
+                    "Ticker": coin,
+                    "Timeframe": "Prossimi 15 Minuti" if interval == "15m" else "Prossima Ora",
+                    "Ultimo Prezzo": None,
+                    "Previsione": None,
+                    "Limite Inferiore": None,
+                    "Limite Superiore": None,
+                    "Variazione %": None,
+                    "Timestamp Previsione": None,
+                    "error": str(e)
+                })
         return results
 
     def get_predictions_summary(self) -> pd.DataFrame:
@@ -114,10 +433,14 @@ def get_hyperliquid_forecasts(tickers=['BTC', 'ETH', 'SOL'], testnet=True):
     forecaster = HyperliquidForecaster(testnet=testnet)
     return forecaster.get_crypto_forecasts(tickers)
 
-def get_crypto_forecasts(tickers=['BTC', 'ETH', 'SOL'], testnet=True):
+def get_crypto_forecasts(tickers=['BTC', 'ETH', 'SOL'], testnet=True, max_workers=None, backends=None):
     try:
-        forecaster = HyperliquidForecaster(testnet=True)
-        results = forecaster.forecast_many(["BTC", "ETH", "SOL"])
+        # backends: es. {"15m": "ewma_drift", "1h": "prophet"} (default DEFAULT_BACKENDS)
+        forecaster = HyperliquidForecaster(testnet=True, backends=backends)
+        # max_workers > 1: fit Prophet in parallelo su processi separati
+        results = forecaster.forecast_many(
+            ["BTC", "ETH", "SOL"], concurrent=bool(max_workers and max_workers > 1), max_workers=max_workers
+        )
         
         # Stampa il riepilogo come DataFrame
         df = pd.DataFrame(results)
@@ -112,7 +112,7 @@ def run_harrison():
                     "operation": "CLOSE", "symbol": TICKER, 
                     "reason": "Target 1% Hit (Victory)", "pnl": pnl_usd, "agent": AGENT_NAME
                 }
-                db_utils.log_bot_operation(payload)
+                db_utils.log_bot_operation_async(payload)
                 
                 center_price = None
                 highest_level_reached = 0
@@ -144,7 +144,7 @@ def run_harrison():
                         "reason": f"Trend Level {current_level_idx}", "agent": AGENT_NAME,
                         "target_portion_of_balance": 0.01
                     }
-                    db_utils.log_bot_operation(payload)
+                    db_utils.log_bot_operation_async(payload)
                     time.sleep(1)
 
             # --- AZIONE 3: TRAILING STOP (Il "Gradino Precedente") ---
@@ -172,7 +172,7 @@ def run_harrison():
                     "reason": f"Trailing Stop (Rev from Lvl {highest_level_reached})", 
                     "pnl": pnl_usd, "agent": AGENT_NAME
                 }
-                db_utils.log_bot_operation(payload)
+                db_utils.log_bot_operation_async(payload)
                 
                 center_price = None
                 highest_level_reached = 0
@@ -158,7 +158,7 @@ def run_scanner():
                     
                     # Log Alert
                     if op['score'] > 0.8: # Good setup
-                        db_utils.log_bot_operation({
+                        db_utils.log_bot_operation_async({
                             "operation": "GRID_ALERT",
                             "symbol": op['coin'],
                             "direction": "NEUTRAL",
@@ -70,7 +70,7 @@ def run_harvest():
                     
                     # Log to DB without executing trade
                     try:
-                        db_utils.log_bot_operation(payload)
+                        db_utils.log_bot_operation_async(payload)
                     except Exception as e:
                         print(f"DB Log Error: {e}")
 
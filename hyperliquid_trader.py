@@ -9,6 +9,10 @@ from hyperliquid.info import Info
 from hyperliquid.exchange import Exchange
 from hyperliquid.utils import constants
 
+from asset_specs import AssetSpec, get_shared_specs
+from candle_cache import INTERVAL_TO_MS, get_shared_cache
+from resampler import CandleResampler
+
 
 class HyperLiquidTrader:
     def __init__(
@@ -30,8 +34,18 @@ class HyperLiquidTrader:
         self.info = Info(base_url, skip_ws=skip_ws)
         self.exchange = Exchange(account, base_url, account_address=account_address)
 
-        # cache meta per tick-size e min-size
-        self.meta = self.info.meta()
+        # specifiche per asset (tick-size, min-size, leva...) da meta(), condivise
+        # tra le istanze e aggiornate in background
+        self.asset_specs = get_shared_specs(base_url, self.info.meta)
+
+        # candele: una sola serie 1m per coin, i timeframe superiori sono derivati
+        self.candle_cache = get_shared_cache(base_url)
+        self.resampler = CandleResampler(self.candle_cache)
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        """Ultima risposta grezza di meta()."""
+        return self.asset_specs.meta
 
     def _to_hl_size(self, size_decimal: Decimal) -> str:
         # HL accetta max 8 decimali
@@ -69,14 +83,20 @@ class HyperLiquidTrader:
     # ----------------------------------------------------------------------
     #                           MIN SIZE / TICK SIZE
     # ----------------------------------------------------------------------
+    def _get_asset_spec(self, symbol: str) -> AssetSpec:
+        spec = self.asset_specs.get(symbol)
+        if spec is None:
+            raise RuntimeError(f"Symbol {symbol} non trovato nella meta universe")
+        return spec
+
     def _get_min_tick_for_symbol(self, symbol: str) -> Decimal:
         """
-        Hyperliquid definisce per ogni asset un tick size.
-        Lo leggiamo da meta().
+        Hyperliquid definisce per ogni asset un tick size (10^-szDecimals).
+        Lo leggiamo dalla tabella costruita da meta().
         """
-        for perp in self.meta["universe"]:
-            if perp["name"] == symbol:
-                return Decimal(str(perp["szDecimals"]))
+        spec = self.asset_specs.get(symbol)
+        if spec is not None:
+            return spec.size_quantum
         return Decimal("0.00000001")  # fallback a 1e-8
 
     def _round_size(self, size: Decimal, decimals: int) -> float:
@@ -204,28 +224,19 @@ class HyperLiquidTrader:
         mark_px = Decimal(str(mids[symbol]))
         raw_size = notional / mark_px
 
-        # Ottieni info sul simbolo dalla meta
-        symbol_info = None
-        for perp in self.meta["universe"]:
-            if perp["name"] == symbol:
-                symbol_info = perp
-                break
-        
-        if not symbol_info:
-            raise RuntimeError(f"Symbol {symbol} non trovato nella meta universe")
+        # Ottieni info sul simbolo dalla tabella delle specifiche
+        spec = self._get_asset_spec(symbol)
 
         # IMPORTANTE: Ottieni il minimum order size (non szDecimals!)
-        min_size = Decimal(str(symbol_info.get("minSz", "0.001")))
-        sz_decimals = int(symbol_info.get("szDecimals", 8))
-        max_leverage = symbol_info.get("maxLeverage", 100)
+        min_size = spec.min_size
+        max_leverage = spec.max_leverage
 
         # Verifica che la leva richiesta non superi il massimo
         if leverage > max_leverage:
             print(f"⚠️ Leva richiesta ({leverage}) supera il massimo per {symbol} ({max_leverage})")
 
         # Arrotonda secondo i decimali permessi
-        quantizer = Decimal(10) ** -sz_decimals
-        size_decimal = raw_size.quantize(quantizer, rounding=ROUND_DOWN)
+        size_decimal = spec.round_size(raw_size)
 
         # Verifica che sia sopra il minimo
         if size_decimal < min_size:
@@ -236,6 +247,9 @@ class HyperLiquidTrader:
             # Usa direttamente il minimum size
             size_decimal = min_size
 
+        if size_decimal * mark_px < spec.min_notional:
+            print(f"⚠️ Valore ordine ({size_decimal * mark_px:.2f}$) < minimo Hyperliquid ({spec.min_notional}$)")
+
         # Converti a float per l'API
         size_float = float(size_decimal)
 
@@ -323,16 +337,20 @@ class HyperLiquidTrader:
         print("\n📊 LIMITI TRADING HYPERLIQUID")
         print("-" * 60)
         
-        for perp in self.meta["universe"]:
-            if symbol and perp["name"] != symbol:
-                continue
-                
-            print(f"\nSymbol: {perp['name']}")
-            print(f"  Min Size: {perp.get('minSz', 'N/A')}")
-            print(f"  Size Decimals: {perp.get('szDecimals', 'N/A')}")
-            print(f"  Price Decimals: {perp.get('pxDecimals', 'N/A')}")
-            print(f"  Max Leverage: {perp.get('maxLeverage', 'N/A')}")
-            print(f"  Only Isolated: {perp.get('onlyIsolated', False)}")
+        if symbol:
+            spec = self.asset_specs.get(symbol)
+            specs = [spec] if spec is not None else []
+        else:
+            specs = list(self.asset_specs)
+
+        for spec in specs:
+            print(f"\nSymbol: {spec.name} (asset {spec.asset})")
+            print(f"  Min Size: {spec.raw.get('minSz', 'N/A')}")
+            print(f"  Size Decimals: {spec.sz_decimals}")
+            print(f"  Price Decimals: {spec.px_decimals}")
+            print(f"  Min Notional: {spec.min_notional}")
+            print(f"  Max Leverage: {spec.max_leverage}")
+            print(f"  Only Isolated: {spec.only_isolated}")
 
     # --- Barry part ---
     # --- Parte per il bot ---
@@ -432,12 +450,26 @@ class HyperLiquidTrader:
         """
         Scarica le candele storiche per Barry.
         interval: '1m', '5m', '15m', '1h', '4h', '1d'
+
+        Gli intervalli di INTERVAL_TO_MS passano dal resampler: si scarica
+        (incrementalmente) solo la serie 1m e il resto viene aggregato in locale.
+        Le candele sono della stessa rete del trader (self.base_url): su testnet
+        anche i controlli di volatilità leggono i prezzi di testnet.
         """
-        import requests
-        import pandas as pd
         import time
-        
-        url = "https://api.hyperliquid.xyz/info"
+        import pandas as pd
+
+        if interval in INTERVAL_TO_MS:
+            try:
+                df = self.resampler.fetch_ohlcv(self.info, coin, interval, limit)
+                # timestamp in ms come nella risposta raw di candleSnapshot
+                df["timestamp"] = df["timestamp"].dt.as_unit("ms").astype("int64")
+                return df.tail(limit).reset_index(drop=True)
+            except Exception as e:
+                print(f"Eccezione get_candles: {e}")
+                return pd.DataFrame()
+
+        url = f"{self.base_url}/info"
         headers = {"Content-Type": "application/json"}
         
         data = {
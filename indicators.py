@@ -1,20 +1,22 @@
+import time
+import numpy as np
 import pandas as pd
-import ta
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from hyperliquid.info import Info
 from hyperliquid.utils import constants
 
+from candle_cache import INTERVAL_TO_MS, CandleCache, get_shared_cache
+from streaming_indicators import IndicatorEngine, get_shared_engine
+import fast_indicators
+from resampler import CandleResampler
+from orderbook_feed import OrderBookFeed
+from prompt_serializer import serialize_analyses
+from pivots import PivotPointProvider, classic_pivots, get_shared_pivot_provider
 
-INTERVAL_TO_MS = {
-    "1m": 60_000,
-    "5m": 5 * 60_000,
-    "15m": 15 * 60_000,
-    "1h": 60 * 60_000,
-    "4h": 4 * 60 * 60_000,
-    "1d": 24 * 60 * 60_000,
-}
+INDICATOR_BACKENDS = ("ta", "fast")
 
 
 class CryptoTechnicalAnalysisHL:
@@ -23,9 +25,49 @@ class CryptoTechnicalAnalysisHL:
     Tutti gli indicatori principali sono centrati sul timeframe 15 minuti.
     """
 
-    def __init__(self, testnet: bool = True):
+    def __init__(
+        self,
+        testnet: bool = True,
+        use_cache: bool = True,
+        candle_cache: Optional[CandleCache] = None,
+        streaming: bool = False,
+        indicator_engine: Optional[IndicatorEngine] = None,
+        indicator_backend: str = "ta",
+        resample_from_1m: bool = False,
+        book_feed: Optional[OrderBookFeed] = None,
+        pivot_provider: Optional[PivotPointProvider] = None,
+        info: Optional[Info] = None,
+    ):
+        if indicator_backend not in INDICATOR_BACKENDS:
+            raise ValueError(f"indicator_backend deve essere uno tra {INDICATOR_BACKENDS}")
+        # "ta" = wrapper della libreria ta, "fast" = kernel NumPy di fast_indicators
+        self.indicator_backend = indicator_backend
         base_url = constants.TESTNET_API_URL if testnet else constants.MAINNET_API_URL
-        self.info = Info(base_url, skip_ws=True)
+        # info esterno: es. replay di fixture registrate nei benchmark
+        self.info = info if info is not None else Info(base_url, skip_ws=True)
+        # Cache incrementale delle candele (condivisa tra istanze per endpoint)
+        if candle_cache is not None:
+            self.candle_cache = candle_cache
+        else:
+            self.candle_cache = get_shared_cache(base_url) if use_cache else None
+        # Timeframe superiori ricavati localmente dalla sola serie 1m
+        self.resampler = (
+            CandleResampler(self.candle_cache or CandleCache()) if resample_from_1m else None
+        )
+        # Book L2 live via websocket (se None si usa l2_snapshot via REST)
+        self.book_feed = book_feed
+        # Indicatori incrementali O(1) per candela invece del ricalcolo completo
+        if indicator_engine is not None:
+            self.indicator_engine = indicator_engine
+        else:
+            self.indicator_engine = get_shared_engine() if streaming else None
+        # Pivot giornalieri calcolati una volta per coin per giorno UTC
+        if pivot_provider is not None:
+            self.pivot_provider = pivot_provider
+        else:
+            self.pivot_provider = (
+                get_shared_pivot_provider(base_url) if use_cache else PivotPointProvider(cache_path=None)
+            )
 
     # ==============================
     #       FETCH OHLCV (HL)
@@ -34,10 +76,16 @@ class CryptoTechnicalAnalysisHL:
     def get_orderbook_volume(self, ticker: str) -> str:
         """
         Restituisce una stringa con i volumi totali di bid e ask per un ticker (es. 'btc-usd').
-        Usa Info.l2_snapshot() dal wrapper ufficiale Hyperliquid.
+        Usa il book live dell'OrderBookFeed se disponibile e fresco,
+        altrimenti Info.l2_snapshot() dal wrapper ufficiale Hyperliquid.
         """
         coin = ticker.split('-')[0].upper()  # es. "BTC" da "btc-usd"
 
+        if self.book_feed is not None:
+            volumes = self.book_feed.volumes(coin)
+            if volumes is not None:
+                return f"Bid Vol: {volumes[0]}, Ask Vol: {volumes[1]}"
+
         try:
             orderbook = self.info.l2_snapshot(coin)
         except Exception as e:
@@ -66,6 +114,11 @@ class CryptoTechnicalAnalysisHL:
         Returns:
             DataFrame con colonne: timestamp, open, high, low, close, volume
         """
+        if self.resampler is not None:
+            return self.resampler.fetch_ohlcv(self.info, coin, interval, limit)
+        if self.candle_cache is not None:
+            return self.candle_cache.get_ohlcv(self.info, coin, interval, limit)
+
         if interval not in INTERVAL_TO_MS:
             raise ValueError(f"Interval '{interval}' non supportato in INTERVAL_TO_MS")
 
@@ -112,31 +165,72 @@ class CryptoTechnicalAnalysisHL:
     #       INDICATORI TECNICI
     # ==============================
     def calculate_ema(self, data: pd.Series, period: int) -> pd.Series:
+        if self.indicator_backend == "fast":
+            return pd.Series(fast_indicators.ema(data.to_numpy(), period), index=data.index)
+        import ta
         return ta.trend.EMAIndicator(data, window=period).ema_indicator()
 
     def calculate_macd(self, data: pd.Series) -> Tuple[pd.Series, pd.Series, pd.Series]:
+        if self.indicator_backend == "fast":
+            macd_line, signal_line, macd_diff = fast_indicators.macd(data.to_numpy())
+            return (
+                pd.Series(macd_line, index=data.index),
+                pd.Series(signal_line, index=data.index),
+                pd.Series(macd_diff, index=data.index),
+            )
+        import ta
         macd = ta.trend.MACD(data)
         return macd.macd(), macd.macd_signal(), macd.macd_diff()
 
     def calculate_rsi(self, data: pd.Series, period: int) -> pd.Series:
+        if self.indicator_backend == "fast":
+            return pd.Series(fast_indicators.rsi(data.to_numpy(), period), index=data.index)
+        import ta
         return ta.momentum.RSIIndicator(data, window=period).rsi()
 
     def calculate_atr(
         self, high: pd.Series, low: pd.Series, close: pd.Series, period: int
     ) -> pd.Series:
+        if self.indicator_backend == "fast":
+            values = fast_indicators.atr(
+                high.to_numpy(), low.to_numpy(), close.to_numpy(), period
+            )
+            return pd.Series(values, index=close.index)
+        import ta
         return ta.volatility.AverageTrueRange(
             high, low, close, window=period
         ).average_true_range()
 
+    @staticmethod
+    def _align_tail(history: List[float], length: int) -> np.ndarray:
+        """Allinea la storia di un indicatore streaming alle ultime righe del DataFrame."""
+        out = np.full(length, np.nan)
+        n = min(len(history), length)
+        if n:
+            out[length - n:] = history[-n:]
+        return out
+
     def calculate_pivot_points(
         self, high: float, low: float, close: float
     ) -> Dict[str, float]:
-        pp = (high + low + close) / 3.0
-        s1 = (2 * pp) - high
-        s2 = pp - (high - low)
-        r1 = (2 * pp) - low
-        r2 = pp + (high - low)
-        return {"pp": pp, "s1": s1, "s2": s2, "r1": r1, "r2": r2}
+        return classic_pivots(float(high), float(low), float(close))
+
+    def _fetch_prev_day(self, coin: str) -> Optional[Tuple[float, float, float, str]]:
+        """High/low/close della candela 1d di ieri e relativo giorno UTC."""
+        df_daily = self.fetch_ohlcv(coin, "1d", limit=2)
+        if len(df_daily) < 2:
+            return None
+        prev_day = df_daily.iloc[-2]
+        return (
+            float(prev_day["high"]),
+            float(prev_day["low"]),
+            float(prev_day["close"]),
+            prev_day["timestamp"].strftime("%Y-%m-%d"),
+        )
+
+    def get_daily_pivots(self, coin: str) -> Optional[Dict]:
+        """Pivot classic/Fibonacci/Camarilla del giorno; la candela 1d viene scaricata una volta al giorno."""
+        return self.pivot_provider.get(coin, self._fetch_prev_day)
 
     # ==============================
     #   FUNDING / OI (placeholder)
@@ -164,11 +258,17 @@ class CryptoTechnicalAnalysisHL:
         # 1) DATI 15 MINUTI (intraday principale)
         df_15m = self.fetch_ohlcv(coin, "15m", limit=200)
 
-        df_15m["ema_20"] = self.calculate_ema(df_15m["close"], 20)
-        macd_line, signal_line, macd_diff = self.calculate_macd(df_15m["close"])
-        df_15m["macd"] = macd_diff
-        df_15m["rsi_7"] = self.calculate_rsi(df_15m["close"], 7)
-        df_15m["rsi_14"] = self.calculate_rsi(df_15m["close"], 14)
+        if self.indicator_engine is not None:
+            # avanza solo sulle candele chiuse nuove + peek su quella in formazione
+            snapshot = self.indicator_engine.sync(coin, "15m", df_15m)
+            for name in ("ema_20", "macd", "rsi_7", "rsi_14"):
+                df_15m[name] = self._align_tail(snapshot[name]["history"], len(df_15m))
+        else:
+            df_15m["ema_20"] = self.calculate_ema(df_15m["close"], 20)
+            macd_line, signal_line, macd_diff = self.calculate_macd(df_15m["close"])
+            df_15m["macd"] = macd_diff
+            df_15m["rsi_7"] = self.calculate_rsi(df_15m["close"], 7)
+            df_15m["rsi_14"] = self.calculate_rsi(df_15m["close"], 14)
 
         last_10_15m = df_15m.tail(10)
 
@@ -192,17 +292,19 @@ class CryptoTechnicalAnalysisHL:
         last_10_longer = longer_term.tail(10)
 
         # 3) PIVOT POINTS daily
-        df_daily = self.fetch_ohlcv(coin, "1d", limit=2)
-        if len(df_daily) >= 2:
-            prev_day = df_daily.iloc[-2]
-            pivot_points = self.calculate_pivot_points(
-                prev_day["high"], prev_day["low"], prev_day["close"]
-            )
+        daily_pivots = self.get_daily_pivots(coin)
+        if daily_pivots is not None:
+            pivot_points = daily_pivots["classic"]
+            extended_pivots = {
+                "fibonacci": daily_pivots["fibonacci"],
+                "camarilla": daily_pivots["camarilla"],
+            }
         else:
             last = df_15m.iloc[-1]
             pivot_points = self.calculate_pivot_points(
                 last["high"], last["low"], last["close"]
             )
+            extended_pivots = {}
 
         oi_data = self.get_open_interest(coin)
         funding_rate = self.get_funding_rate(coin)
@@ -222,6 +324,7 @@ class CryptoTechnicalAnalysisHL:
             },
             "volume": self.get_orderbook_volume(ticker),
             "pivot_points": pivot_points,
+            "pivot_points_extended": extended_pivots,
 
             "derivatives": {
                 "open_interest_latest": oi_data["latest"],
@@ -308,18 +411,98 @@ class CryptoTechnicalAnalysisHL:
         return output
 
 
-def analyze_multiple_tickers(tickers: List[str], testnet: bool = True) -> str:
-    analyzer = CryptoTechnicalAnalysisHL(testnet=testnet)
-    full_output = ""
+def _timed_analysis(analyzer: CryptoTechnicalAnalysisHL, ticker: str) -> Dict:
+    """
+    Esegue get_complete_analysis per un singolo ticker misurando il tempo.
+    Non solleva mai: l'eventuale errore viene riportato nel dict.
+    """
+    start = time.perf_counter()
+    try:
+        data = analyzer.get_complete_analysis(ticker)
+        error = None
+    except Exception as e:
+        data = None
+        error = str(e)
+    return {
+        "ticker": ticker,
+        "data": data,
+        "elapsed_s": time.perf_counter() - start,
+        "error": error,
+    }
+
+
+def analyze_tickers_concurrent(
+    analyzer: CryptoTechnicalAnalysisHL,
+    tickers: List[str],
+    max_workers: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Lancia l'analisi di tutti i ticker in parallelo (thread pool): le chiamate
+    Info sono I/O bound, quindi la latenza dello stage diventa quella del
+    ticker più lento invece della somma.
+
+    Args:
+        analyzer: istanza condivisa di CryptoTechnicalAnalysisHL
+        tickers: lista di ticker, l'ordine viene preservato nell'output
+        max_workers: limite di concorrenza (default: un thread per ticker)
+
+    Returns:
+        Lista (stesso ordine di tickers) di dict con chiavi
+        ticker, data, elapsed_s, error
+    """
+    if not tickers:
+        return []
+    workers = max(1, min(max_workers or len(tickers), len(tickers)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="indicators") as pool:
+        # map() restituisce i risultati nell'ordine di input
+        return list(pool.map(lambda t: _timed_analysis(analyzer, t), tickers))
+
+
+def analyze_multiple_tickers(
+    tickers: List[str],
+    testnet: bool = True,
+    concurrent: bool = False,
+    max_workers: Optional[int] = None,
+    book_feed: Optional[OrderBookFeed] = None,
+    prompt_format: str = "text",
+    token_budget: Optional[int] = None,
+) -> str:
+    """
+    Analizza i ticker e restituisce (testo per il prompt, lista di analisi).
+
+    prompt_format: "text" (format_output, default) oppure un formato compatto
+    di prompt_serializer ("table", "jsonl"), eventualmente entro token_budget.
+    """
+    analyzer = CryptoTechnicalAnalysisHL(testnet=testnet, book_feed=book_feed)
     datas = []
-    data = None
-    for ticker in tickers:
-        try:
-            data = analyzer.get_complete_analysis(ticker)
-            datas.append(data)
-            full_output += analyzer.format_output(data)
-        except Exception as e:
-            print(f"Errore durante l'analisi di {ticker}: {e}")
+
+    if concurrent:
+        stage_start = time.perf_counter()
+        reports = analyze_tickers_concurrent(analyzer, tickers, max_workers=max_workers)
+        for report in reports:
+            if report["error"] is not None:
+                print(
+                    f"Errore durante l'analisi di {report['ticker']} "
+                    f"({report['elapsed_s']:.2f}s): {report['error']}"
+                )
+                continue
+            print(f"[Indicators] {report['ticker']} analizzato in {report['elapsed_s']:.2f}s")
+            datas.append(report["data"])
+        print(f"[Indicators] Stage completato in {time.perf_counter() - stage_start:.2f}s")
+    else:
+        for ticker in tickers:
+            try:
+                datas.append(analyzer.get_complete_analysis(ticker))
+            except Exception as e:
+                print(f"Errore durante l'analisi di {ticker}: {e}")
+
+    if prompt_format != "text":
+        serialized = serialize_analyses(datas, fmt=prompt_format, token_budget=token_budget)
+        dropped = f" (eliminate: {', '.join(serialized.dropped)})" if serialized.dropped else ""
+        print(f"[Indicators] Prompt {serialized.fmt}: ~{serialized.tokens} token{dropped}")
+        return serialized.text, datas
+
+    full_output = "".join(analyzer.format_output(data) for data in datas)
     return full_output, datas
 
 
@@ -0,0 +1,233 @@
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from hyperliquid.websocket_manager import WebsocketManager
+
+
+@dataclass(frozen=True)
+class BookSnapshot:
+    """
+    Book L2 di una coin come ricevuto dal canale l2Book, già pronto per le letture:
+    prezzi e size come float e size cumulative per livello (best → worst).
+    """
+    coin: str
+    exchange_time_ms: int
+    received_at: float  # time.monotonic() alla ricezione
+    bid_px: Tuple[float, ...]
+    bid_cum_sz: Tuple[float, ...]
+    ask_px: Tuple[float, ...]
+    ask_cum_sz: Tuple[float, ...]
+    bid_volume: float
+    ask_volume: float
+
+    @property
+    def mid(self) -> Optional[float]:
+        if not self.bid_px or not self.ask_px:
+            return None
+        return (self.bid_px[0] + self.ask_px[0]) / 2.0
+
+    def depth_bps(self, bps: float) -> Tuple[float, float]:
+        """Size cumulata su bid e ask entro `bps` basis point dal mid."""
+        mid = self.mid
+        if mid is None:
+            return 0.0, 0.0
+        band = mid * bps / 10_000.0
+        # bid decrescenti: contiamo i livelli con px >= mid - band
+        n_bid = bisect_right(self.bid_px, -(mid - band), key=lambda px: -px)
+        n_ask = bisect_right(self.ask_px, mid + band)
+        bid = self.bid_cum_sz[n_bid - 1] if n_bid else 0.0
+        ask = self.ask_cum_sz[n_ask - 1] if n_ask else 0.0
+        return bid, ask
+
+    def imbalance(self, bps: Optional[float] = None) -> float:
+        """(bid - ask) / (bid + ask) sull'intero book o entro `bps` dal mid. Range [-1, 1]."""
+        bid, ask = self.depth_bps(bps) if bps is not None else (self.bid_volume, self.ask_volume)
+        total = bid + ask
+        return (bid - ask) / total if total > 0 else 0.0
+
+
+def parse_l2_book(data: dict, received_at: Optional[float] = None) -> BookSnapshot:
+    """Converte il payload di l2Book / l2_snapshot in un BookSnapshot."""
+    bids, asks = data["levels"][0], data["levels"][1]
+    bid_sz = [float(level["sz"]) for level in bids]
+    ask_sz = [float(level["sz"]) for level in asks]
+    bid_cum = tuple(accumulate(bid_sz))
+    ask_cum = tuple(accumulate(ask_sz))
+    return BookSnapshot(
+        coin=data["coin"],
+        exchange_time_ms=int(data.get("time", 0)),
+        received_at=time.monotonic() if received_at is None else received_at,
+        bid_px=tuple(float(level["px"]) for level in bids),
+        bid_cum_sz=bid_cum,
+        ask_px=tuple(float(level["px"]) for level in asks),
+        ask_cum_sz=ask_cum,
+        bid_volume=sum(bid_sz),
+        ask_volume=sum(ask_sz),
+    )
+
+
+class OrderBookFeed:
+    """
+    Book L2 live per un insieme di coin tramite il websocket dell'SDK (canale l2Book).
+
+    Le letture (volumi, depth entro N bps, imbalance) sono in memoria, senza
+    chiamate di rete. Un thread watchdog controlla la freschezza dei book:
+    se una coin non si aggiorna da `stale_after` secondi viene risottoscritta,
+    se cade il websocket la connessione viene ricreata con tutte le sottoscrizioni.
+
+    Esempio:
+        feed = OrderBookFeed(constants.MAINNET_API_URL, ["BTC", "ETH", "SOL"])
+        feed.start()
+        feed.volumes("BTC")        # (bid_volume, ask_volume) oppure None se stale
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        coins: Iterable[str],
+        stale_after: float = 30.0,
+        check_every: float = 5.0,
+    ):
+        self.base_url = base_url
+        self.coins: List[str] = [c.upper() for c in coins]
+        self.stale_after = stale_after
+        self.check_every = check_every
+
+        self._books: Dict[str, BookSnapshot] = {}
+        self._subscription_ids: Dict[str, int] = {}
+        self._subscribed_at: Dict[str, float] = {}
+        self._manager: Optional[WebsocketManager] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+        self.reconnects = 0
+        self.resubscriptions = 0
+
+    # ------------------------------------------------------------------
+    #                         CICLO DI VITA
+    # ------------------------------------------------------------------
+    def start(self) -> "OrderBookFeed":
+        self._stop.clear()
+        self._connect()
+        self._watchdog = threading.Thread(target=self._watch, name="orderbook-watchdog", daemon=True)
+        self._watchdog.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._disconnect()
+        if self._watchdog is not None and self._watchdog.is_alive():
+            self._watchdog.join(timeout=self.check_every + 1)
+
+    def _connect(self) -> None:
+        manager = WebsocketManager(self.base_url)
+        # thread daemon: il feed non deve impedire l'uscita del processo
+        manager.daemon = True
+        manager.ping_sender.daemon = True
+        manager.start()
+        with self._lock:
+            self._manager = manager
+            self._subscription_ids.clear()
+        for coin in self.coins:
+            self._subscribe(coin)
+
+    def _disconnect(self) -> None:
+        with self._lock:
+            manager, self._manager = self._manager, None
+        if manager is not None:
+            try:
+                manager.stop()
+            except Exception as e:
+                print(f"[OrderBookFeed] Errore chiudendo il websocket: {e}")
+
+    def _subscribe(self, coin: str) -> None:
+        manager = self._manager
+        if manager is None:
+            return
+        sub_id = manager.subscribe({"type": "l2Book", "coin": coin}, self._on_book)
+        with self._lock:
+            self._subscription_ids[coin] = sub_id
+            self._subscribed_at[coin] = time.monotonic()
+
+    def _resubscribe(self, coin: str) -> None:
+        manager = self._manager
+        sub_id = self._subscription_ids.get(coin)
+        if manager is not None and sub_id is not None:
+            try:
+                manager.unsubscribe({"type": "l2Book", "coin": coin}, sub_id)
+            except Exception:
+                pass
+        self._subscribe(coin)
+        self.resubscriptions += 1
+
+    def _on_book(self, ws_msg: dict) -> None:
+        data = ws_msg.get("data")
+        if not data or "levels" not in data:
+            return
+        snapshot = parse_l2_book(data)
+        with self._lock:
+            self._books[snapshot.coin.upper()] = snapshot
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.check_every):
+            try:
+                manager = self._manager
+                if manager is None or not manager.is_alive():
+                    print("[OrderBookFeed] Websocket caduto, riconnessione...")
+                    self._disconnect()
+                    self._connect()
+                    self.reconnects += 1
+                    continue
+                if not manager.ws_ready:
+                    continue
+                now = time.monotonic()
+                stale = [
+                    coin for coin in self.coins
+                    if self.is_stale(coin, now)
+                    and now - self._subscribed_at.get(coin, 0.0) > self.stale_after
+                ]
+                if stale and len(stale) == len(self.coins):
+                    # nessun book si aggiorna: connessione probabilmente muta
+                    print("[OrderBookFeed] Tutti i book stale, riconnessione...")
+                    self._disconnect()
+                    self._connect()
+                    self.reconnects += 1
+                    continue
+                for coin in stale:
+                    print(f"[OrderBookFeed] Book {coin} stale, risottoscrizione")
+                    self._resubscribe(coin)
+            except Exception as e:
+                print(f"[OrderBookFeed] Errore watchdog: {e}")
+
+    # ------------------------------------------------------------------
+    #                            LETTURE
+    # ------------------------------------------------------------------
+    def is_stale(self, coin: str, now: Optional[float] = None) -> bool:
+        book = self._books.get(coin.upper())
+        if book is None:
+            return True
+        now = time.monotonic() if now is None else now
+        return now - book.received_at > self.stale_after
+
+    def get(self, coin: str) -> Optional[BookSnapshot]:
+        """Ultimo book della coin, oppure None se assente o più vecchio di stale_after."""
+        coin = coin.upper()
+        if self.is_stale(coin):
+            return None
+        return self._books.get(coin)
+
+    def volumes(self, coin: str) -> Optional[Tuple[float, float]]:
+        book = self.get(coin)
+        return (book.bid_volume, book.ask_volume) if book else None
+
+    def depth_bps(self, coin: str, bps: float) -> Optional[Tuple[float, float]]:
+        book = self.get(coin)
+        return book.depth_bps(bps) if book else None
+
+    def imbalance(self, coin: str, bps: Optional[float] = None) -> Optional[float]:
+        book = self.get(coin)
+        return book.imbalance(bps) if book else None
@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+PIVOT_CACHE_PATH = os.getenv("PIVOT_CACHE_PATH", os.path.join(".cache", "pivots.json"))
+
+
+# ==============================
+#         FORMULE PIVOT
+# ==============================
+def classic_pivots(high: float, low: float, close: float) -> Dict[str, float]:
+    pp = (high + low + close) / 3.0
+    return {
+        "pp": pp,
+        "s1": (2 * pp) - high,
+        "s2": pp - (high - low),
+        "r1": (2 * pp) - low,
+        "r2": pp + (high - low),
+    }
+
+
+def fibonacci_pivots(high: float, low: float, close: float) -> Dict[str, float]:
+    pp = (high + low + close) / 3.0
+    rng = high - low
+    return {
+        "pp": pp,
+        "r1": pp + 0.382 * rng,
+        "r2": pp + 0.618 * rng,
+        "r3": pp + 1.000 * rng,
+        "s1": pp - 0.382 * rng,
+        "s2": pp - 0.618 * rng,
+        "s3": pp - 1.000 * rng,
+    }
+
+
+def camarilla_pivots(high: float, low: float, close: float) -> Dict[str, float]:
+    rng = high - low
+    return {
+        "r1": close + rng * 1.1 / 12,
+        "r2": close + rng * 1.1 / 6,
+        "r3": close + rng * 1.1 / 4,
+        "r4": close + rng * 1.1 / 2,
+        "s1": close - rng * 1.1 / 12,
+        "s2": close - rng * 1.1 / 6,
+        "s3": close - rng * 1.1 / 4,
+        "s4": close - rng * 1.1 / 2,
+    }
+
+
+def compute_all_pivots(high: float, low: float, close: float) -> Dict[str, Dict[str, float]]:
+    high, low, close = float(high), float(low), float(close)
+    return {
+        "classic": classic_pivots(high, low, close),
+        "fibonacci": fibonacci_pivots(high, low, close),
+        "camarilla": camarilla_pivots(high, low, close),
+    }
+
+
+# ==============================
+#          PROVIDER
+# ==============================
+# fetch_prev_day(coin) -> (high, low, close, giorno UTC della candela 'YYYY-MM-DD')
+PrevDayFetcher = Callable[[str], Optional[Tuple[float, float, float, str]]]
+
+
+class PivotPointProvider:
+    """
+    Pivot giornalieri (classic, Fibonacci, Camarilla) calcolati una volta per
+    coin per giorno UTC.
+
+    High/low/close del giorno precedente cambiano solo a mezzanotte UTC: il
+    risultato resta in memoria fino al cambio di giorno e viene salvato su un
+    file JSON, così anche dopo un riavvio non serve riscaricare la candela 1d.
+    """
+
+    def __init__(self, cache_path: Optional[str] = PIVOT_CACHE_PATH):
+        self.cache_path = cache_path
+        self._memory: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._disk_loaded = False
+        self._from_disk: set = set()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "fetches": 0}
+
+    @staticmethod
+    def today_utc(now: Optional[datetime] = None) -> str:
+        now = now or datetime.now(timezone.utc)
+        return now.strftime("%Y-%m-%d")
+
+    def _load_disk(self) -> None:
+        if self._disk_loaded or not self.cache_path:
+            return
+        self._disk_loaded = True
+        try:
+            with open(self.cache_path, "r") as f:
+                stored = json.load(f)
+            for coin, entry in stored.items():
+                if coin not in self._memory:
+                    self._memory[coin] = entry
+                    self._from_disk.add(coin)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[Pivots] Cache su disco illeggibile ({self.cache_path}): {e}")
+
+    def _save_disk(self) -> None:
+        if not self.cache_path:
+            return
+        try:
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._memory, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"[Pivots] Impossibile salvare la cache su disco: {e}")
+
+    def get(self, coin: str, fetch_prev_day: PrevDayFetcher, now: Optional[datetime] = None) -> Optional[Dict]:
+        """
+        Restituisce {"day", "source_day", "classic", "fibonacci", "camarilla"} per la coin.
+
+        Il fetch viene eseguito solo al primo accesso del giorno UTC. Se non ci
+        sono dati restituisce None; se la candela ricevuta non è quella di ieri
+        (giorno appena cambiato) i pivot vengono restituiti ma non salvati, così
+        il ciclo successivo riprova.
+        """
+        today = self.today_utc(now)
+        with self._lock:
+            self._load_disk()
+            entry = self._memory.get(coin)
+            if entry is not None and entry.get("day") == today:
+                hit = "disk_hits" if coin in self._from_disk else "memory_hits"
+                self._from_disk.discard(coin)
+                self.stats[hit] += 1
+                return entry
+
+        prev_day = fetch_prev_day(coin)
+        self.stats["fetches"] += 1
+        if prev_day is None:
+            return None
+        high, low, close, source_day = prev_day
+        expected = self.today_utc((now or datetime.now(timezone.utc)) - timedelta(days=1))
+        entry = {"day": today, "source_day": source_day, **compute_all_pivots(high, low, close)}
+
+        if source_day != expected:
+            # candela di ieri non ancora disponibile: usala ma non salvarla
+            return entry
+
+        with self._lock:
+            self._memory[coin] = entry
+            self._save_disk()
+        return entry
+
+    def invalidate(self, coin: Optional[str] = None) -> None:
+        with self._lock:
+            if coin is None:
+                self._memory.clear()
+                self._from_disk.clear()
+            else:
+                self._memory.pop(coin, None)
+                self._from_disk.discard(coin)
+            self._save_disk()
+
+
+_SHARED_PROVIDERS: Dict[str, PivotPointProvider] = {}
+_SHARED_GUARD = threading.Lock()
+
+
+def network_cache_path(base_url: str, cache_path: Optional[str] = PIVOT_CACHE_PATH) -> Optional[str]:
+    """File di cache per endpoint (es. .cache/pivots_api.hyperliquid-testnet.xyz.json)."""
+    if not cache_path:
+        return cache_path
+    root, ext = os.path.splitext(cache_path)
+    return f"{root}_{urlparse(base_url).netloc or base_url.replace('/', '_')}{ext}"
+
+
+def get_shared_pivot_provider(base_url: str) -> PivotPointProvider:
+    """
+    Provider condiviso a livello di processo per un endpoint (mainnet/testnet):
+    gli analyzer vengono ricreati ad ogni ciclo. Le candele 1d delle due reti
+    sono diverse, quindi memoria e file su disco sono separati per rete.
+    """
+    with _SHARED_GUARD:
+        if base_url not in _SHARED_PROVIDERS:
+            _SHARED_PROVIDERS[base_url] = PivotPointProvider(network_cache_path(base_url))
+        return _SHARED_PROVIDERS[base_url]
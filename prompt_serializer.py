@@ -0,0 +1,248 @@
+"""
+Serializzazione compatta delle analisi di CryptoTechnicalAnalysisHL per il prompt.
+
+format_output produce frasi in inglese e liste Python complete per ogni serie;
+qui gli stessi dati vengono resi come:
+  - "table": un blocco CSV-like per ticker (valori correnti + serie in colonne)
+  - "jsonl": un oggetto JSON compatto per riga, uno per ticker
+
+Con un token_budget le serie meno utili vengono eliminate (su tutti i ticker)
+finché il testo stimato rientra nel budget. I valori sono arrotondati in base
+alla scala del prezzo (BTC senza decimali, DOGE con 5).
+"""
+import json
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+FORMATS = ("table", "jsonl")
+
+# Ordine di eliminazione sotto budget: prima i placeholder e le serie ridondanti.
+# "current" non viene mai eliminato.
+DROP_ORDER = [
+    "derivatives",
+    "longer_term.rsi_14_series",
+    "longer_term.macd_series",
+    "intraday.rsi_14",
+    "intraday.ema_20",
+    "longer_term.levels",
+    "intraday.macd",
+    "pivot_points",
+    "volume",
+    "intraday.rsi_7",
+    "intraday.mid_prices",
+]
+
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Stima dei token BPE senza dipendenze: parole ~4 caratteri per token,
+    numeri ~3 cifre per token, ogni simbolo/punteggiatura un token.
+    """
+    tokens = 0
+    for piece in _TOKEN_RE.findall(text):
+        if piece[0].isalpha():
+            tokens += max(1, math.ceil(len(piece) / 4))
+        elif piece[0].isdigit():
+            tokens += max(1, math.ceil(len(piece) / 3))
+        else:
+            tokens += 1
+    return tokens
+
+
+def price_decimals(price: float, significant: int = 5) -> int:
+    """Decimali necessari per ~`significant` cifre significative (0..8)."""
+    if not price or not math.isfinite(price):
+        return 2
+    magnitude = math.floor(math.log10(abs(price)))
+    return max(0, min(8, significant - 1 - magnitude))
+
+
+def _fmt(value, decimals: int) -> str:
+    if value is None:
+        return ""
+    value = float(value)
+    if not math.isfinite(value):
+        return ""
+    text = f"{value:.{decimals}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text in ("-0", "") else text
+
+
+def _as_json_number(text: str):
+    """Stringa già arrotondata da _fmt -> numero JSON (None se vuota)."""
+    if text == "":
+        return None
+    try:
+        value = float(text)
+    except ValueError:
+        return text
+    return int(value) if value.is_integer() and "e" not in text else value
+
+
+def _parse_volume(volume) -> Optional[Dict[str, float]]:
+    # get_orderbook_volume restituisce "Bid Vol: x, Ask Vol: y"
+    match = re.search(r"Bid Vol:\s*([\d.eE+-]+),\s*Ask Vol:\s*([\d.eE+-]+)", str(volume))
+    if not match:
+        return None
+    return {"bid": float(match.group(1)), "ask": float(match.group(2))}
+
+
+@dataclass
+class SerializedPrompt:
+    text: str
+    tokens: int
+    fmt: str
+    dropped: List[str] = field(default_factory=list)
+
+
+class _TickerView:
+    """Valori di un'analisi già arrotondati secondo la scala del prezzo."""
+
+    def __init__(self, data: Dict):
+        self.data = data
+        self.px_dec = price_decimals(data["current"]["price"])
+        # oscillatori in unità di prezzo (MACD/ATR): una cifra significativa in più
+        self.osc_dec = min(8, self.px_dec + 1)
+
+    def sections(self, dropped: set) -> Dict:
+        d, px, osc = self.data, self.px_dec, self.osc_dec
+        cur = d["current"]
+        out = {
+            "ticker": d["ticker"],
+            "ts": d["timestamp"],
+            "current": {
+                "px": _fmt(cur["price"], px),
+                "ema20": _fmt(cur["ema20"], px),
+                "macd": _fmt(cur["macd"], osc),
+                "rsi7": _fmt(cur["rsi_7"], 1),
+            },
+        }
+        if "volume" not in dropped:
+            vol = _parse_volume(d.get("volume"))
+            if vol:
+                out["volume"] = {"bid": _fmt(vol["bid"], 2), "ask": _fmt(vol["ask"], 2)}
+        if "pivot_points" not in dropped:
+            pv = d["pivot_points"]
+            out["pivot_points"] = {k: _fmt(pv[k], px) for k in ("r2", "r1", "pp", "s1", "s2")}
+        if "derivatives" not in dropped:
+            der = d["derivatives"]
+            out["derivatives"] = {
+                "oi": _fmt(der["open_interest_latest"], 2),
+                "oi_avg": _fmt(der["open_interest_average"], 2),
+                "funding": f"{float(der['funding_rate']):.2e}",
+            }
+        lt = d["longer_term_15m"]
+        if "longer_term.levels" not in dropped:
+            out["longer_term"] = {
+                "ema20": _fmt(lt["ema_20_current"], px),
+                "ema50": _fmt(lt["ema_50_current"], px),
+                "atr3": _fmt(lt["atr_3_current"], osc),
+                "atr14": _fmt(lt["atr_14_current"], osc),
+                "vol": _fmt(lt["volume_current"], 2),
+                "vol_avg": _fmt(lt["volume_average"], 2),
+            }
+
+        intra = d["intraday"]
+        series = {}
+        for key, col, dec in (
+            ("intraday.mid_prices", "px", px),
+            ("intraday.ema_20", "ema20", px),
+            ("intraday.macd", "macd", osc),
+            ("intraday.rsi_7", "rsi7", 1),
+            ("intraday.rsi_14", "rsi14", 1),
+        ):
+            if key not in dropped:
+                series[col] = [_fmt(v, dec) for v in intra[key.split(".")[1]]]
+        out["intraday"] = series
+
+        lt_series = {}
+        if "longer_term.macd_series" not in dropped:
+            lt_series["macd"] = [_fmt(v, osc) for v in lt["macd_series"]]
+        if "longer_term.rsi_14_series" not in dropped:
+            lt_series["rsi14"] = [_fmt(v, 1) for v in lt["rsi_14_series"]]
+        out["longer_term_series"] = lt_series
+        return out
+
+
+def _render_table(view: Dict) -> str:
+    lines = [f"#{view['ticker']} {view['ts']}UTC 15m"]
+
+    def kv(label: str, values: Dict) -> None:
+        lines.append(label + " " + " ".join(f"{k}={v}" for k, v in values.items()))
+
+    kv("cur", view["current"])
+    for label, key in (("vol", "volume"), ("piv", "pivot_points"), ("der", "derivatives"), ("lt", "longer_term")):
+        if key in view:
+            kv(label, view[key])
+
+    for label, series in (("intraday", view["intraday"]), ("lt_series", view["longer_term_series"])):
+        if not series:
+            continue
+        columns = list(series)
+        lines.append(f"{label} " + ",".join(columns))
+        for row in zip(*(series[c] for c in columns)):
+            lines.append(",".join(row))
+    return "\n".join(lines)
+
+
+def _render_jsonl(view: Dict) -> str:
+    def numeric(value):
+        if isinstance(value, dict):
+            return {k: numeric(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [numeric(v) for v in value]
+        return _as_json_number(value)
+
+    compact = {k: (v if k in ("ticker", "ts") else numeric(v)) for k, v in view.items() if v}
+    return json.dumps(compact, separators=(",", ":"), ensure_ascii=False)
+
+
+_LEGEND = {
+    "table": "# Hyperliquid 15m data per ticker. cur/vol/piv/der/lt = current values; intraday and lt_series = CSV blocks, oldest → latest",
+    "jsonl": "# Hyperliquid 15m data, one JSON object per ticker; series are oldest → latest",
+}
+
+
+def serialize_analyses(
+    datas: List[Dict],
+    fmt: str = "table",
+    token_budget: Optional[int] = None,
+) -> SerializedPrompt:
+    """
+    Serializza le analisi di get_complete_analysis in forma compatta.
+
+    Args:
+        datas: lista di dict restituiti da get_complete_analysis
+        fmt: "table" o "jsonl"
+        token_budget: se impostato, elimina le serie in DROP_ORDER finché
+            la stima dei token rientra nel budget
+
+    Returns:
+        SerializedPrompt con testo, token stimati e sezioni eliminate
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt deve essere uno tra {FORMATS}")
+    render = _render_table if fmt == "table" else _render_jsonl
+    views = [_TickerView(d) for d in datas]
+
+    dropped: List[str] = []
+
+    def build() -> str:
+        body = [render(v.sections(set(dropped))) for v in views]
+        return "\n".join([_LEGEND[fmt]] + body) + "\n"
+
+    text = build()
+    tokens = estimate_tokens(text)
+    for section in DROP_ORDER:
+        if token_budget is None or tokens <= token_budget:
+            break
+        dropped.append(section)
+        text = build()
+        tokens = estimate_tokens(text)
+
+    return SerializedPrompt(text=text, tokens=tokens, fmt=fmt, dropped=dropped)
@@ -0,0 +1,174 @@
+import json
+import os
+import threading
+from urllib.parse import urlparse
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+PROPHET_CACHE_DIR = os.getenv("PROPHET_CACHE_DIR", os.path.join(".cache", "prophet"))
+
+
+def stan_init(model) -> Dict:
+    """
+    Parametri di un modello Prophet già fittato nel formato `init` di fit():
+    il nuovo fit parte dall'ottimo precedente invece che da zero.
+    """
+    params = {}
+    for name in ("k", "m", "sigma_obs"):
+        params[name] = float(model.params[name][0][0])
+    for name in ("delta", "beta"):
+        params[name] = model.params[name][0].tolist()
+    return params
+
+
+def fit_model(history: pd.DataFrame, make_model: Callable, init: Optional[Dict] = None):
+    """
+    Fit con warm-start da `init` se presente; se i parametri non sono
+    compatibili (es. configurazione cambiata) ripiega su un fit a freddo.
+    Restituisce (modello, warm_start_riuscito).
+    """
+    if init is not None:
+        model = make_model()
+        try:
+            model.fit(history, init=init)
+            return model, True
+        except Exception as e:
+            print(f"[ProphetCache] Warm-start fallito, fit a freddo: {e}")
+    model = make_model()
+    model.fit(history)
+    return model, False
+
+
+class ProphetModelCache:
+    """
+    Modelli Prophet fittati per (coin, interval), in memoria e su disco.
+
+    - nessuna nuova candela chiusa dall'ultimo fit: il modello viene riusato
+      così com'è (solo predict)
+    - nuova candela chiusa: refit con warm-start dai parametri del fit precedente
+    - ogni fit viene salvato con prophet.serialize, così dopo un riavvio si
+      riparte dal modello su disco invece che da un fit a freddo
+    """
+
+    def __init__(self, cache_dir: Optional[str] = PROPHET_CACHE_DIR):
+        self.cache_dir = cache_dir
+        # (coin, interval) -> (modello, ds dell'ultima candela chiusa usata nel fit)
+        self._models: Dict[Tuple[str, str], Tuple[object, pd.Timestamp]] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.stats = {"reused": 0, "warm_fits": 0, "cold_fits": 0, "disk_loads": 0}
+
+    def _lock_for(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def _path(self, coin: str, interval: str) -> str:
+        return os.path.join(self.cache_dir, f"{coin}_{interval}.json")
+
+    def _load_disk(self, coin: str, interval: str) -> Optional[Tuple[object, pd.Timestamp]]:
+        if not self.cache_dir:
+            return None
+        path = self._path(coin, interval)
+        if not os.path.exists(path):
+            return None
+        try:
+            from prophet.serialize import model_from_json
+
+            with open(path, "r") as f:
+                stored = json.load(f)
+            self.stats["disk_loads"] += 1
+            return model_from_json(stored["model"]), pd.Timestamp(stored["last_ds"])
+        except Exception as e:
+            print(f"[ProphetCache] Modello su disco illeggibile ({path}): {e}")
+            return None
+
+    def _save_disk(self, coin: str, interval: str, model, last_ds: pd.Timestamp) -> None:
+        if not self.cache_dir:
+            return
+        try:
+            from prophet.serialize import model_to_json
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(coin, interval)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"last_ds": last_ds.isoformat(), "model": model_to_json(model)}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[ProphetCache] Impossibile salvare il modello {coin} {interval}: {e}")
+
+    def lookup(self, coin: str, interval: str, last_ds: pd.Timestamp):
+        """Modello già fittato fino a last_ds (ultima candela chiusa), altrimenti None."""
+        key = (coin, interval)
+        with self._lock_for(key):
+            entry = self._models.get(key) or self._load_disk(coin, interval)
+            if entry is None:
+                return None
+            self._models[key] = entry
+            if entry[1] != pd.Timestamp(last_ds):
+                return None
+            self.stats["reused"] += 1
+            return entry[0]
+
+    def previous(self, coin: str, interval: str):
+        """Ultimo modello fittato (anche se vecchio), da usare per il warm-start."""
+        entry = self._models.get((coin, interval))
+        return entry[0] if entry is not None else None
+
+    def store(self, coin: str, interval: str, model, last_ds: pd.Timestamp, warm: bool = False) -> None:
+        last_ds = pd.Timestamp(last_ds)
+        with self._lock_for((coin, interval)):
+            self._models[(coin, interval)] = (model, last_ds)
+            self.stats["warm_fits" if warm else "cold_fits"] += 1
+            self._save_disk(coin, interval, model, last_ds)
+
+    def get_model(self, coin: str, interval: str, history: pd.DataFrame, make_model: Callable):
+        """
+        Restituisce un modello fittato su `history` (colonne ds, y; solo candele chiuse).
+
+        Args:
+            make_model: factory di un Prophet non fittato (stessa configurazione ad ogni chiamata)
+        """
+        last_ds = pd.Timestamp(history["ds"].iloc[-1])
+        model = self.lookup(coin, interval, last_ds)
+        if model is not None:
+            return model
+        previous = self.previous(coin, interval)
+        model, warm = fit_model(
+            history, make_model, stan_init(previous) if previous is not None else None
+        )
+        self.store(coin, interval, model, last_ds, warm=warm)
+        return model
+
+    def clear(self, coin: Optional[str] = None, interval: Optional[str] = None) -> None:
+        """Svuota la cache in memoria (i file su disco restano)."""
+        with self._locks_guard:
+            for key in list(self._models):
+                if (coin is None or key[0] == coin) and (interval is None or key[1] == interval):
+                    del self._models[key]
+
+
+_SHARED_MODEL_CACHES: Dict[str, ProphetModelCache] = {}
+_SHARED_GUARD = threading.Lock()
+
+
+def network_cache_dir(base_url: str, cache_dir: Optional[str] = PROPHET_CACHE_DIR) -> Optional[str]:
+    """Sottocartella per endpoint (es. .cache/prophet/api.hyperliquid-testnet.xyz)."""
+    if not cache_dir:
+        return cache_dir
+    return os.path.join(cache_dir, urlparse(base_url).netloc or base_url.replace("/", "_"))
+
+
+def get_shared_model_cache(base_url: str) -> ProphetModelCache:
+    """
+    Cache condivisa a livello di processo per un endpoint (mainnet/testnet):
+    get_crypto_forecasts ricrea il forecaster ad ogni ciclo. Modelli e file su
+    disco sono separati per rete, così testnet e mainnet non si sovrascrivono.
+    """
+    with _SHARED_GUARD:
+        if base_url not in _SHARED_MODEL_CACHES:
+            _SHARED_MODEL_CACHES[base_url] = ProphetModelCache(network_cache_dir(base_url))
+        return _SHARED_MODEL_CACHES[base_url]
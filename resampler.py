@@ -0,0 +1,99 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from candle_cache import INTERVAL_TO_MS, MAX_CANDLES, OHLCV_COLUMNS, CandleCache
+
+BASE_INTERVAL = "1m"
+BASE_STEP_MS = INTERVAL_TO_MS[BASE_INTERVAL]
+
+
+def resample_ohlcv(df: pd.DataFrame, interval: str, drop_partial_head: bool = True) -> pd.DataFrame:
+    """
+    Aggrega candele 1m (timestamp, open, high, low, close, volume) in un
+    timeframe superiore. I bucket sono allineati all'epoch UTC come quelli di
+    Hyperliquid (1d a mezzanotte UTC, 4h alle 00/04/08/... UTC).
+
+    Args:
+        df: candele 1m ordinate per timestamp
+        interval: chiave di INTERVAL_TO_MS
+        drop_partial_head: scarta il primo bucket se la serie base inizia a metà
+    """
+    if interval not in INTERVAL_TO_MS:
+        raise ValueError(f"Interval '{interval}' non supportato in INTERVAL_TO_MS")
+    if df.empty:
+        return df[OHLCV_COLUMNS].copy()
+
+    step_ms = INTERVAL_TO_MS[interval]
+    t = pd.to_datetime(df["timestamp"], utc=True).dt.as_unit("ms").astype("int64").to_numpy()
+    buckets = t - (t % step_ms)
+
+    # indici di inizio di ogni bucket (la serie è ordinata)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(t)] - 1
+
+    high = df["high"].to_numpy(dtype=np.float64)
+    low = df["low"].to_numpy(dtype=np.float64)
+    volume = df["volume"].to_numpy(dtype=np.float64)
+
+    out = pd.DataFrame({
+        "t": buckets[starts],
+        "open": df["open"].to_numpy(dtype=np.float64)[starts],
+        "high": np.maximum.reduceat(high, starts),
+        "low": np.minimum.reduceat(low, starts),
+        "close": df["close"].to_numpy(dtype=np.float64)[ends],
+        "volume": np.add.reduceat(volume, starts),
+    })
+    if drop_partial_head and t[0] != buckets[0]:
+        out = out.iloc[1:]
+    out["timestamp"] = pd.to_datetime(out["t"], unit="ms", utc=True)
+    return out[OHLCV_COLUMNS].reset_index(drop=True)
+
+
+class CandleResampler:
+    """
+    Deriva 5m/15m/1h/4h/1d da un'unica serie base 1m per coin, tenuta nella
+    CandleCache: dall'exchange viene scaricata (incrementalmente) solo la 1m.
+
+    Hyperliquid conserva al massimo MAX_CANDLES candele per intervallo, cioè
+    circa 3.5 giorni di 1m: le finestre più lunghe (es. 500 candele 1h) non sono
+    ricostruibili dalla base e vengono scaricate direttamente, sempre via cache.
+    """
+
+    def __init__(self, candle_cache: CandleCache, max_base_candles: int = MAX_CANDLES):
+        self.candle_cache = candle_cache
+        self.max_base_candles = max_base_candles
+
+    def base_candles_needed(self, interval: str, limit: int) -> int:
+        # un bucket in più per coprire quello parziale in testa alla finestra
+        return (limit + 1) * (INTERVAL_TO_MS[interval] // BASE_STEP_MS)
+
+    def can_derive(self, interval: str, limit: int) -> bool:
+        return self.base_candles_needed(interval, limit) <= self.max_base_candles
+
+    def fetch_ohlcv(self, info, coin: str, interval: str, limit: int = 500,
+                    now_ms: Optional[int] = None) -> pd.DataFrame:
+        """
+        Stessa interfaccia e stesso output di CandleCache.get_ohlcv, ma per i
+        timeframe > 1m le candele sono ricavate localmente dalla base 1m.
+        """
+        if interval not in INTERVAL_TO_MS:
+            raise ValueError(f"Interval '{interval}' non supportato in INTERVAL_TO_MS")
+        if interval == BASE_INTERVAL:
+            return self.candle_cache.get_ohlcv(info, coin, BASE_INTERVAL, limit)
+        if not self.can_derive(interval, limit):
+            return self.candle_cache.get_ohlcv(info, coin, interval, limit)
+
+        base = self.candle_cache.get_ohlcv(
+            info, coin, BASE_INTERVAL, self.base_candles_needed(interval, limit)
+        )
+        derived = resample_ohlcv(base, interval)
+
+        step_ms = INTERVAL_TO_MS[interval]
+        if now_ms is None:
+            now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        start_ms = now_ms - limit * step_ms
+        t = derived["timestamp"].dt.as_unit("ms").astype("int64")
+        return derived[t > start_ms - step_ms].reset_index(drop=True)
@@ -0,0 +1,300 @@
+import math
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+import pandas as pd
+
+from candle_cache import INTERVAL_TO_MS
+
+NAN = float("nan")
+
+
+# ==============================
+#     INDICATORI INCREMENTALI
+# ==============================
+# Ogni indicatore espone:
+#   update(...) -> valore dopo la chiusura di una candela (O(1), muta lo stato)
+#   peek(...)   -> valore se la candela in formazione chiudesse ora (non muta)
+# Le ricorrenze replicano i metodi calculate_* basati su `ta` (stessa
+# inizializzazione e stesso warm-up: NaN per EMA/RSI/MACD, 0 per ATR): sulla
+# stessa storia i valori coincidono. Vedi IndicatorEngine per la differenza
+# rispetto a `ta` ricalcolato su una finestra scorrevole.
+
+
+class StreamingEMA:
+    """EMA come ta.trend.EMAIndicator: ewm(span=period, adjust=False, min_periods=period)."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.value = NAN
+        self.count = 0
+
+    def _next(self, x: float) -> Tuple[float, int]:
+        if self.count == 0:
+            return x, 1
+        return self.alpha * x + (1.0 - self.alpha) * self.value, self.count + 1
+
+    def _output(self, value: float, count: int) -> float:
+        return value if count >= self.period else NAN
+
+    def update(self, close: float) -> float:
+        self.value, self.count = self._next(close)
+        return self._output(self.value, self.count)
+
+    def peek(self, close: float) -> float:
+        return self._output(*self._next(close))
+
+    @property
+    def current(self) -> float:
+        return self._output(self.value, self.count)
+
+
+class StreamingRSI:
+    """RSI come ta.momentum.RSIIndicator (medie di Wilder, alpha = 1/period)."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 1.0 / period
+        self.prev_close: Optional[float] = None
+        self.avg_up = 0.0
+        self.avg_down = 0.0
+        self.count = 0
+
+    def _next(self, close: float) -> Tuple[float, float, int]:
+        if self.prev_close is None:
+            # la prima differenza è NaN e ta la tratta come 0
+            return 0.0, 0.0, 1
+        diff = close - self.prev_close
+        up = diff if diff > 0 else 0.0
+        down = -diff if diff < 0 else 0.0
+        return (
+            self.alpha * up + (1.0 - self.alpha) * self.avg_up,
+            self.alpha * down + (1.0 - self.alpha) * self.avg_down,
+            self.count + 1,
+        )
+
+    def _output(self, avg_up: float, avg_down: float, count: int) -> float:
+        if count < self.period:
+            return NAN
+        if avg_down == 0:
+            return 100.0
+        return 100.0 - (100.0 / (1.0 + avg_up / avg_down))
+
+    def update(self, close: float) -> float:
+        self.avg_up, self.avg_down, self.count = self._next(close)
+        self.prev_close = close
+        return self._output(self.avg_up, self.avg_down, self.count)
+
+    def peek(self, close: float) -> float:
+        return self._output(*self._next(close))
+
+    @property
+    def current(self) -> float:
+        return self._output(self.avg_up, self.avg_down, self.count)
+
+
+class StreamingMACD:
+    """
+    MACD come ta.trend.MACD (12, 26, 9). Restituisce (macd, signal, diff);
+    get_complete_analysis usa diff come "macd".
+    """
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal)
+
+    @staticmethod
+    def _combine(fast: float, slow: float, signal_ema: StreamingEMA, mutate: bool):
+        macd = fast - slow
+        if math.isnan(macd):
+            # la signal parte dal primo valore valido di macd (come ewm)
+            return NAN, NAN, NAN
+        signal = signal_ema.update(macd) if mutate else signal_ema.peek(macd)
+        return macd, signal, macd - signal
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        return self._combine(self.fast.update(close), self.slow.update(close), self.signal, True)
+
+    def peek(self, close: float) -> Tuple[float, float, float]:
+        return self._combine(self.fast.peek(close), self.slow.peek(close), self.signal, False)
+
+    @property
+    def current(self) -> Tuple[float, float, float]:
+        macd = self.fast.current - self.slow.current
+        if math.isnan(macd):
+            return NAN, NAN, NAN
+        signal = self.signal.current
+        return macd, signal, macd - signal
+
+
+class StreamingATR:
+    """ATR come ta.volatility.AverageTrueRange: media semplice dei primi TR, poi Wilder."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.prev_close: Optional[float] = None
+        self.tr_sum = 0.0
+        self.value = 0.0
+        self.count = 0
+
+    def _true_range(self, high: float, low: float) -> float:
+        if self.prev_close is None:
+            return high - low
+        return max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+    def _next(self, high: float, low: float) -> Tuple[float, float, int]:
+        tr = self._true_range(high, low)
+        count = self.count + 1
+        if count < self.period:
+            return self.tr_sum + tr, 0.0, count
+        if count == self.period:
+            tr_sum = self.tr_sum + tr
+            return tr_sum, tr_sum / self.period, count
+        return self.tr_sum, (self.value * (self.period - 1) + tr) / float(self.period), count
+
+    def update(self, high: float, low: float, close: float) -> float:
+        self.tr_sum, self.value, self.count = self._next(high, low)
+        self.prev_close = close
+        return self.value
+
+    def peek(self, high: float, low: float, close: float) -> float:
+        return self._next(high, low)[1]
+
+    @property
+    def current(self) -> float:
+        return self.value
+
+
+# Indicatori di get_complete_analysis: nome -> (factory, input)
+DEFAULT_INDICATORS: Dict[str, Tuple[Callable[[], object], str]] = {
+    "ema_20": (lambda: StreamingEMA(20), "close"),
+    "ema_50": (lambda: StreamingEMA(50), "close"),
+    "macd": (lambda: StreamingMACD(), "close"),
+    "rsi_7": (lambda: StreamingRSI(7), "close"),
+    "rsi_14": (lambda: StreamingRSI(14), "close"),
+    "atr_3": (lambda: StreamingATR(3), "hlc"),
+    "atr_14": (lambda: StreamingATR(14), "hlc"),
+}
+
+
+def _scalar(value) -> float:
+    # per il MACD il valore riportato è l'istogramma (macd - signal)
+    return value[2] if isinstance(value, tuple) else value
+
+
+class IndicatorEngine:
+    """
+    Motore di indicatori incrementali con uno stato per (coin, interval, indicatore).
+
+    sync() riceve il DataFrame OHLCV più recente (ad es. dalla CandleCache),
+    fa avanzare gli indicatori solo sulle candele chiuse non ancora viste e
+    calcola il valore "peek" sulla candela in formazione. Se la storia non è
+    contigua a quella già processata gli indicatori vengono ricostruiti.
+
+    Al primo sync i valori coincidono con calculate_* sullo stesso DataFrame.
+    Dopo non sono identici: calculate_* riparte ad ogni ciclo dall'inizio della
+    finestra (200 candele in get_complete_analysis), lo stato qui porta avanti
+    tutta la storia. La differenza è lo stato iniziale diverso smorzato di
+    (1 - alpha) ad ogni candela della finestra: sul replay di 200 candele 15m
+    (benchmarks/bench_fast_indicators.py) ~1e-8 per EMA20, ~1e-7 per MACD e
+    ATR14, ~1e-5 per RSI14 e ~1e-3 per EMA50 su un prezzo ~100. Lo scarto è di
+    `ta`, che dipende da dove inizia la finestra; lo stato qui no.
+    """
+
+    def __init__(self, indicators: Optional[Dict[str, Tuple[Callable[[], object], str]]] = None, history: int = 50):
+        self.indicators = indicators or DEFAULT_INDICATORS
+        self.history = history
+        self._states: Dict[Tuple[str, str, str], object] = {}
+        self._histories: Dict[Tuple[str, str, str], Deque[float]] = {}
+        self._last_closed: Dict[Tuple[str, str], int] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def reset(self, coin: str, interval: str) -> None:
+        for name, (factory, _) in self.indicators.items():
+            self._states[(coin, interval, name)] = factory()
+            self._histories[(coin, interval, name)] = deque(maxlen=self.history)
+        self._last_closed.pop((coin, interval), None)
+
+    def _feed(self, coin: str, interval: str, row, peek: bool) -> Dict[str, float]:
+        out = {}
+        for name, (_, source) in self.indicators.items():
+            state = self._states[(coin, interval, name)]
+            args = (row.high, row.low, row.close) if source == "hlc" else (row.close,)
+            out[name] = _scalar(state.peek(*args) if peek else state.update(*args))
+        return out
+
+    def sync(self, coin: str, interval: str, df: pd.DataFrame, now_ms: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        Allinea gli indicatori di (coin, interval) al DataFrame OHLCV.
+
+        Args:
+            df: colonne timestamp, open, high, low, close (ordinate, UTC)
+            now_ms: istante di riferimento per capire se l'ultima candela è chiusa
+
+        Returns:
+            nome indicatore -> {"current": valore sull'ultima candela,
+                                "history": valori delle ultime candele (oldest → latest)}
+        """
+        step_ms = INTERVAL_TO_MS[interval]
+        if now_ms is None:
+            now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+
+        # pandas può usare risoluzione ms/us/ns: normalizziamo a ms
+        ts = pd.to_datetime(df["timestamp"], utc=True).dt.as_unit("ms").astype("int64").to_numpy()
+        closed_mask = ts + step_ms <= now_ms
+        key = (coin, interval)
+
+        with self._lock_for(key):
+            last_closed = self._last_closed.get(key)
+            closed_ts = ts[closed_mask]
+            if (
+                last_closed is None
+                or len(closed_ts) == 0
+                or closed_ts[0] > last_closed + step_ms
+                or closed_ts[-1] < last_closed
+            ):
+                # primo sync o buco nella storia: ricostruisce da zero
+                self.reset(coin, interval)
+                last_closed = None
+
+            for row, t in zip(df[closed_mask].itertuples(index=False), closed_ts):
+                if last_closed is not None and t <= last_closed:
+                    continue
+                values = self._feed(coin, interval, row, peek=False)
+                for name, value in values.items():
+                    self._histories[(coin, interval, name)].append(value)
+                last_closed = int(t)
+            if last_closed is not None:
+                self._last_closed[key] = last_closed
+
+            forming = df[~closed_mask]
+            result = {}
+            peeked = self._feed(coin, interval, forming.iloc[-1], peek=True) if not forming.empty else None
+            for name in self.indicators:
+                history = list(self._histories[(coin, interval, name)])
+                if peeked is not None:
+                    history.append(peeked[name])
+                result[name] = {
+                    "current": history[-1] if history else NAN,
+                    "history": history,
+                }
+            return result
+
+
+_SHARED_ENGINE = IndicatorEngine()
+
+
+def get_shared_engine() -> IndicatorEngine:
+    """Motore condiviso a livello di processo (gli analyzer vengono ricreati ad ogni ciclo)."""
+    return _SHARED_ENGINE
@@ -79,7 +79,7 @@ def run_wally():
                     print(f"💀 [FLUSH] Chiudo tutto su {TICKER} per sicurezza.")
                     bot.close_position(TICKER)
                     payload = {"operation": "CLOSE", "symbol": TICKER, "reason": "Gatekeeper Flush", "pnl": pnl_usd, "agent": AGENT_NAME}
-                    db_utils.log_bot_operation(payload)
+                    db_utils.log_bot_operation_async(payload)
                 
                 print(f"⏳ Dormo per {PAUSE_DURATION/60} minuti.")
                 time.sleep(PAUSE_DURATION)
@@ -111,7 +111,7 @@ def run_wally():
                     print(f"💀 [STOP LOSS] Prezzo fuori range. CHIUDO TUTTO.")
                     bot.close_position(TICKER)
                     payload = {"operation": "CLOSE", "symbol": TICKER, "reason": "Grid Range Broken", "pnl": pnl_usd, "agent": AGENT_NAME}
-                    db_utils.log_bot_operation(payload)
+                    db_utils.log_bot_operation_async(payload)
                 center_price = None; triggered_levels = set(); time.sleep(5); continue
 
             # --- AZIONE 2: ESECUZIONE GRIGLIA ---
@@ -138,7 +138,7 @@ def run_wally():
                 
                 if direction:
                     payload = {"operation": "OPEN", "symbol": TICKER, "direction": direction, "reason": f"Grid Line {current_level_index}", "agent": AGENT_NAME, "target_portion_of_balance": 0.01}
-                    db_utils.log_bot_operation(payload)
+                    db_utils.log_bot_operation_async(payload)
 
             # B) CHIUSURA LIVELLI (Take Profit / Yo-Yo) - FIXATO
             levels_to_remove = []
@@ -168,7 +168,7 @@ def run_wally():
                     
                     step_profit = bullet_size_usd * STEP_PCT
                     payload = {"operation": "CLOSE_PARTIAL", "symbol": TICKER, "agent": AGENT_NAME, "reason": f"Grid Return Lvl {lvl}", "pnl": step_profit}
-                    db_utils.log_bot_operation(payload)
+                    db_utils.log_bot_operation_async(payload)
                     time.sleep(1)
 
             for lvl in levels_to_remove: